@@ -0,0 +1,86 @@
+"""
+Compare the time taken to count matching rows (as for xgrep -c) with the
+time taken to build the output DataFrame and take its length (which is how
+counting was done before Match.count existed).
+
+Run with, e.g.,
+
+    $ uv run python benchmarks/count.py --rows 200000 --cols 20
+"""
+
+import click
+import random
+from io import StringIO
+from timeit import repeat
+
+from xgrep.grid import grid_reader
+from xgrep.match import Match
+
+
+def make_csv(rows: int, cols: int, density: float, seed: int) -> str:
+    """
+    Make CSV text in which (approximately) a fraction 'density' of the cells
+    contain the string 'MATCH'.
+    """
+    rng = random.Random(seed)
+    lines = [",".join(f"col{col}" for col in range(cols))]
+    for row in range(rows):
+        lines.append(
+            ",".join(
+                "MATCH" if rng.random() < density else f"value-{row}-{col}"
+                for col in range(cols)
+            )
+        )
+    return "\n".join(lines) + "\n"
+
+
+@click.command()
+@click.option("--rows", type=int, default=100_000, help="The number of rows.")
+@click.option("--cols", type=int, default=20, help="The number of columns.")
+@click.option(
+    "--density",
+    type=float,
+    default=0.01,
+    help="The fraction of cells that match.",
+)
+@click.option("--repeat", "repeat_", type=int, default=5, help="Timing repeats.")
+@click.option("--seed", type=int, default=0, help="The random seed.")
+def main(rows: int, cols: int, density: float, repeat_: int, seed: int) -> None:
+    """
+    Time counting matches with and without building the output DataFrame.
+    """
+    (grid,) = grid_reader(
+        StringIO(make_csv(rows, cols, density, seed)), filename="bench.csv"
+    )
+
+    for invert in False, True:
+        match = Match(grid, "MATCH", invert)
+
+        def count() -> str | None:
+            return match.format(count=True)
+
+        def dataframe_len() -> int:
+            return len(
+                match.polars_df(
+                    row_numbers=False,
+                    col_numbers=False,
+                    filenames=False,
+                    color="green",
+                    unmatched=None,
+                    only_matching_cols=False,
+                    excel_cols=False,
+                )
+            )
+
+        assert int(count() or "") == dataframe_len()
+
+        for name, function in ("count", count), ("DataFrame length", dataframe_len):
+            best = min(repeat(function, number=1, repeat=repeat_))
+            print(
+                f"{'-c -v' if invert else '-c'}: {name:>16}: {best * 1000:10.2f} ms "
+                f"({rows} rows, {cols} cols)"
+            )
+
+
+if __name__ == "__main__":
+    main()
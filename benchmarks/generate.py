@@ -0,0 +1,113 @@
+"""
+Generate synthetic CSV, TSV, and Excel files for benchmarking xgrep.
+
+Cells hold random lower case text of a given length, and (approximately) a
+fraction 'density' of them also contain the string 'MATCH' (so the pattern
+'MATCH' matches them). The same arguments (including the seed) always give
+the same files.
+
+Run with, e.g.,
+
+    $ uv run python benchmarks/generate.py --rows 100000 --sheets 3 big.xlsx
+"""
+
+import click
+import random
+import string
+import polars as pl
+import xlsxwriter
+from pathlib import Path
+
+# The string that is put into matching cells.
+MATCH = "MATCH"
+
+
+def make_df(
+    rows: int, cols: int, density: float, cell_length: int, seed: int
+) -> pl.DataFrame:
+    """
+    Make a DataFrame of String columns (named col1, col2, ...) holding random
+    text, in which a fraction 'density' of the cells contain MATCH.
+    """
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    length = max(cell_length, len(MATCH))
+
+    def cell() -> str:
+        text = "".join(rng.choices(letters, k=length))
+        if rng.random() < density:
+            start = rng.randint(0, length - len(MATCH))
+            text = text[:start] + MATCH + text[start + len(MATCH) :]
+        return text
+
+    return pl.DataFrame(
+        {f"col{col + 1}": [cell() for _ in range(rows)] for col in range(cols)}
+    )
+
+
+def write_grid(
+    path: Path,
+    rows: int,
+    cols: int,
+    sheets: int = 1,
+    density: float = 0.01,
+    cell_length: int = 12,
+    seed: int = 0,
+) -> Path:
+    """
+    Write a synthetic grid to a CSV, TSV, or Excel file (as given by the
+    suffix of 'path'). An Excel file is given 'sheets' sheets, each with
+    'rows' rows.
+    """
+    match suffix := path.suffix.lower():
+        case ".csv" | ".tsv":
+            make_df(rows, cols, density, cell_length, seed).write_csv(
+                path, separator="," if suffix == ".csv" else "\t"
+            )
+        case ".xlsx":
+            with xlsxwriter.Workbook(path) as workbook:
+                for sheet in range(sheets):
+                    make_df(rows, cols, density, cell_length, seed + sheet).write_excel(
+                        workbook, worksheet=f"sheet{sheet + 1}"
+                    )
+        case _:
+            raise ValueError(f"Unknown file suffix: {suffix!r}")
+
+    return path
+
+
+@click.command()
+@click.option("--rows", type=int, default=100_000, help="The number of rows.")
+@click.option("--cols", type=int, default=20, help="The number of columns.")
+@click.option(
+    "--sheets", type=int, default=1, help="The number of sheets (Excel only)."
+)
+@click.option(
+    "--density",
+    type=float,
+    default=0.01,
+    help=f"The fraction of cells that contain {MATCH!r}.",
+)
+@click.option(
+    "--cell-length", type=int, default=12, help="The length of each cell value."
+)
+@click.option("--seed", type=int, default=0, help="The random seed.")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(path_type=Path))
+def main(
+    rows: int,
+    cols: int,
+    sheets: int,
+    density: float,
+    cell_length: int,
+    seed: int,
+    paths: tuple[Path, ...],
+) -> None:
+    """
+    Write synthetic CSV (.csv), TSV (.tsv), or Excel (.xlsx) files.
+    """
+    for path in paths:
+        write_grid(path, rows, cols, sheets, density, cell_length, seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Time the stages of an xgrep search (reading grids, matching, building the
+output DataFrame, making a rich Table, and writing each output format) on
+synthetic CSV, TSV, and Excel files (see generate.py).
+
+Each stage is timed in a new process, so the peak memory reported for it
+(the maximum resident set size of the process) is not affected by the
+others. The peak memory of the Python objects allocated while the stage runs
+(as found by tracemalloc, which does not see the memory Polars allocates) is
+also given. Inputs are generated from a seed, so runs are reproducible.
+
+Run with, e.g.,
+
+    $ uv run python benchmarks/suite.py --rows 50000 --json results.json
+
+or with nox (which runs offline, using the locked dependencies):
+
+    $ nox -s benchmark -- --rows 50000
+"""
+
+import os
+import sys
+import json
+import click
+import platform
+import resource
+import statistics
+import tempfile
+import tracemalloc
+import multiprocessing
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable
+from rich.console import Console
+
+from xgrep.excel import ExcelWriter
+from xgrep.grid import grid_reader
+from xgrep.match import Match
+from xgrep.output import Output
+
+from generate import MATCH, write_grid
+
+SUFFIXES = ("csv", "tsv", "xlsx")
+
+# The stages that are timed. Those after 'rich_table' are output formats.
+STAGES = (
+    "read",
+    "match",
+    "polars_df",
+    "rich_table",
+    "csv",
+    "tsv",
+    "rich",
+    "excel",
+    "excel-constant-memory",
+)
+
+# The output options used for all stages.
+FORMAT_OPTIONS = dict(
+    row_numbers=True,
+    col_numbers=False,
+    filenames=True,
+    color="green",
+    unmatched=None,
+    only_matching_cols=False,
+    excel_cols=False,
+)
+
+
+def max_rss() -> int:
+    """
+    Get the maximum resident set size of this process so far, in bytes.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The size is in bytes on macOS, but in kilobytes on Linux.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def prepare(path: Path, stage: str, directory: Path) -> Callable[[], Any]:
+    """
+    Do the work that precedes a stage, and return a function that runs the
+    stage itself.
+    """
+
+    def read() -> list:
+        return list(grid_reader(path, sheet_id=0))
+
+    if stage == "read":
+        return read
+
+    matches = [Match(grid, MATCH) for grid in read()]
+
+    if stage == "match":
+        grids = [match.grid for match in matches]
+        return lambda: [Match(grid, MATCH) for grid in grids]
+
+    if stage == "polars_df":
+        return lambda: [match.polars_df(**FORMAT_OPTIONS) for match in matches]
+
+    if stage == "rich_table":
+        dfs = [match.polars_df(**FORMAT_OPTIONS) for match in matches]
+        return lambda: [
+            match.rich_table(df) for match, df in zip(matches, dfs, strict=True)
+        ]
+
+    format_options = dict(FORMAT_OPTIONS)
+    filenames = format_options.pop("filenames")
+
+    if stage in ("csv", "tsv", "rich"):
+
+        def write_text() -> None:
+            with open(os.devnull, "w") as fp:
+                output = Output(
+                    Console(file=fp, highlight=False),
+                    None,
+                    format_=stage,
+                    count=False,
+                    only_filename=False,
+                    width=None,
+                    filenames=filenames,
+                    **format_options,
+                )
+                for match in matches:
+                    output.add(match)
+                output.flush()
+
+        return write_text
+
+    out = directory / f"{path.name}-{stage}.xlsx"
+
+    def write_excel() -> None:
+        excel_writer = ExcelWriter(
+            out,
+            save_empty_output=False,
+            sheet_separator=":",
+            drop_filenames=True,
+            quiet=True,
+            constant_memory=stage == "excel-constant-memory",
+        )
+        output = Output(
+            None,
+            excel_writer,
+            format_="excel",
+            count=False,
+            only_filename=False,
+            width=None,
+            filenames=filenames,
+            out=out,
+            **format_options,
+        )
+        for match in matches:
+            output.add(match)
+        output.flush()
+        excel_writer.close()
+
+    return write_excel
+
+
+def run_stage(path: Path, stage: str, directory: Path, repeat: int) -> dict:
+    """
+    Time a stage (in a worker process), returning its times (in seconds) and
+    its peak memory use (in bytes).
+    """
+    function = prepare(path, stage, directory)
+    rss_before = max_rss()
+    times = []
+    tracemalloc.start()
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict(
+        times=times,
+        peak_rss=max_rss(),
+        rss_growth=max_rss() - rss_before,
+        python_peak=python_peak,
+    )
+
+
+def environment() -> dict[str, str]:
+    """
+    Get the versions of the software the benchmarks ran with.
+    """
+    return dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        xgrep=version("xgrep"),
+        polars=pl.__version__,
+        xlsxwriter=version("xlsxwriter"),
+    )
+
+
+@click.command()
+@click.option("--rows", type=int, default=20_000, help="The number of rows.")
+@click.option("--cols", type=int, default=10, help="The number of columns.")
+@click.option(
+    "--sheets", type=int, default=2, help="The number of sheets in Excel files."
+)
+@click.option(
+    "--density",
+    type=float,
+    default=0.01,
+    help="The fraction of cells that match.",
+)
+@click.option(
+    "--cell-length", type=int, default=12, help="The length of each cell value."
+)
+@click.option("--seed", type=int, default=0, help="The random seed.")
+@click.option("--repeat", type=int, default=3, help="The number of timing repeats.")
+@click.option(
+    "--suffix",
+    "suffixes",
+    type=click.Choice(SUFFIXES),
+    multiple=True,
+    help="The input file type(s) to time. May be repeated. Default: all.",
+)
+@click.option(
+    "--stage",
+    "stages",
+    type=click.Choice(STAGES),
+    multiple=True,
+    help="The stage(s) to time. May be repeated. Default: all.",
+)
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="A file to write the results (and the benchmark settings) to, as JSON.",
+)
+def main(
+    rows: int,
+    cols: int,
+    sheets: int,
+    density: float,
+    cell_length: int,
+    seed: int,
+    repeat: int,
+    suffixes: tuple[str, ...],
+    stages: tuple[str, ...],
+    json_path: Path | None,
+) -> None:
+    """
+    Time the stages of an xgrep search on synthetic input files.
+    """
+    settings = dict(
+        rows=rows,
+        cols=cols,
+        sheets=sheets,
+        density=density,
+        cell_length=cell_length,
+        seed=seed,
+        repeat=repeat,
+    )
+    results = []
+
+    print(
+        f"{'input':>5} {'stage':>21} {'best (ms)':>10} {'median (ms)':>12} "
+        f"{'rows/s':>11} {'peak RSS (MB)':>14} {'Python peak (MB)':>17}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for suffix in suffixes or SUFFIXES:
+            path = write_grid(
+                directory / f"bench.{suffix}",
+                rows,
+                cols,
+                sheets if suffix == "xlsx" else 1,
+                density,
+                cell_length,
+                seed,
+            )
+            total_rows = rows * (sheets if suffix == "xlsx" else 1)
+
+            for stage in stages or STAGES:
+                # Each stage is run in a new process.
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    result = executor.submit(
+                        run_stage, path, stage, directory, repeat
+                    ).result()
+                best = min(result["times"])
+                result.update(
+                    input=suffix,
+                    stage=stage,
+                    input_bytes=path.stat().st_size,
+                    rows_per_second=total_rows / best,
+                )
+                results.append(result)
+                print(
+                    f"{suffix:>5} {stage:>21} {best * 1000:10.1f} "
+                    f"{statistics.median(result['times']) * 1000:12.1f} "
+                    f"{result['rows_per_second']:11.0f} "
+                    f"{result['peak_rss'] / 1e6:14.1f} "
+                    f"{result['python_peak'] / 1e6:17.1f}"
+                )
+
+    if json_path is not None:
+        with open(json_path, "w") as fp:
+            json.dump(
+                dict(settings=settings, environment=environment(), results=results),
+                fp,
+                indent=2,
+            )
+            print(file=fp)
+
+
+if __name__ == "__main__":
+    main()
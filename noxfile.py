@@ -18,3 +18,20 @@ def test(session: nox.Session, python: str) -> None:
         env={"UV_PROJECT_ENVIRONMENT": session.virtualenv.location},
     )
     session.run("pytest", *session.posargs)
+
+
+@nox.session(venv_backend="uv")
+def benchmark(session: nox.Session) -> None:
+    """
+    Run the benchmark suite (see benchmarks/suite.py for its options, which
+    can be given after '--'). Only the locked dependencies are installed, and
+    the uv cache is used, so no network access is needed.
+    """
+    session.run_install(
+        "uv",
+        "sync",
+        "--offline",
+        "--frozen",
+        env={"UV_PROJECT_ENVIRONMENT": session.virtualenv.location},
+    )
+    session.run("python", "benchmarks/suite.py", *session.posargs)
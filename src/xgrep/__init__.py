@@ -0,0 +1,13 @@
+from typing import Any
+
+__all__ = ["MatchRecord", "search"]
+
+
+def __getattr__(name: str) -> Any:
+    # The library API (which imports Polars) is only imported when it is
+    # used, so that importing xgrep.cli (e.g., for 'xgrep --help') is fast.
+    if name in __all__:
+        from xgrep import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module 'xgrep' has no attribute {name!r}")
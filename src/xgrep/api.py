@@ -0,0 +1,109 @@
+import re
+import polars as pl
+from io import BytesIO, StringIO
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+from xgrep.grid import Grid, grid_reader
+from xgrep.match import Match
+
+# A file to search: a path, or a (filename, buffer) pair for in-memory data
+# (a StringIO for CSV/TSV, a BytesIO for Excel), whose filename gives its type.
+Source = str | Path | tuple[str, StringIO | BytesIO]
+
+
+class MatchRecord(NamedTuple):
+    """
+    A matching cell (or, when inverting, a row with no matching cell).
+    """
+
+    # The name of the file the cell is in.
+    file: str
+    # The name of the Excel sheet the cell is in (None for CSV/TSV files).
+    sheet: str | None
+    # The (1-based) row number of the cell in the input, as given by
+    # --row-numbers.
+    row: int
+    # The (1-based) number of the cell's column in the input (None when
+    # inverting).
+    column: int | None
+    # The name of the cell's column (None if the input has no header, or when
+    # inverting).
+    name: str | None
+    # The start and end offsets of the first match in the cell's (string)
+    # value (None when inverting).
+    span: tuple[int, int] | None
+    # The start and end offsets of every match in the cell's value, which do
+    # not overlap (None when inverting).
+    spans: tuple[tuple[int, int], ...] | None
+
+
+def _grids(source: Source, options: dict[str, Any]) -> Iterator[Grid]:
+    if isinstance(source, tuple):
+        filename, buffer = source
+        return grid_reader(buffer, filename=filename, **options)
+    return grid_reader(Path(source), **options)
+
+
+def search(
+    pattern: str | re.Pattern,
+    *sources: Source,
+    invert: bool = False,
+    max_count: int | None = None,
+    dataframes: bool = False,
+    **options: Any,
+) -> Iterator[MatchRecord] | Iterator[pl.DataFrame]:
+    """
+    Search files (or in-memory data) for a pattern, without printing anything,
+    and yield a MatchRecord for each matching cell, in file, sheet, and row
+    order. If 'dataframes' is true, instead yield a DataFrame for each file
+    (or Excel sheet) with selected rows, holding those rows (with "File" and
+    "Row" columns), as --format csv would output them.
+
+    Other keyword arguments (e.g., 'header', 'sheet_name', 'batch_size', or
+    'columns') are passed to grid_reader. As with --max-count, 'max_count'
+    limits the number of rows found in each file.
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+
+    for source in sources:
+        remaining = max_count
+        if remaining == 0:
+            continue
+
+        for grid in _grids(source, options):
+            match = Match(grid, pattern, invert, max_count=remaining)
+
+            if dataframes:
+                if match.count():
+                    yield match.polars_df(
+                        row_numbers=True,
+                        col_numbers=False,
+                        filenames=True,
+                        color=None,
+                        unmatched=None,
+                        only_matching_cols=False,
+                        excel_cols=False,
+                    )
+            else:
+                file = grid.source or grid.filename
+                for row, col, start, end, spans in match.cells().iter_rows():
+                    yield MatchRecord(
+                        file,
+                        grid.sheet,
+                        row,
+                        None if col is None else grid.col_index(col) + 1,
+                        None if col is None or not grid.header else grid.col_names[col],
+                        None if start is None else (start, end),
+                        (
+                            None
+                            if spans is None
+                            else tuple((span["start"], span["end"]) for span in spans)
+                        ),
+                    )
+
+            if remaining is not None:
+                remaining -= match.count()
+                if not remaining:
+                    break
@@ -0,0 +1,372 @@
+import os
+import json
+import hashlib
+import polars as pl
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterator
+
+# The suffixes of the files holding sheet DataFrames (in Arrow IPC format) and
+# the lists of the sheet names in workbooks.
+_SHEET_SUFFIX = ".arrow"
+_NAMES_SUFFIX = ".json"
+
+
+def parse_size(size: str) -> int:
+    """
+    Convert a size such as '500M' or '2G' (or a plain number of bytes) to an
+    integer number of bytes.
+    """
+    multipliers = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    size = size.strip().upper().removesuffix("B")
+    multiplier = multipliers.get(size[-1:], 1)
+    if multiplier != 1:
+        size = size[:-1]
+    try:
+        result = int(float(size) * multiplier)
+    except ValueError:
+        raise ValueError(f"Could not parse size {size!r}.")
+    if result < 0:
+        raise ValueError("A size cannot be negative.")
+    return result
+
+
+def format_size(size: int) -> str:
+    """
+    Format a number of bytes for people to read.
+    """
+    if size < 1024:
+        return f"{size}B"
+    value = float(size)
+    for unit in "KMGT":
+        value /= 1024
+        if value < 1024 or unit == "T":
+            break
+    return f"{value:.1f}{unit}"
+
+
+class GridCache:
+    """
+    An on-disk cache of the DataFrames read from the sheets of Excel files, so
+    that files that have not changed need not be parsed again.
+
+    Entries are keyed by the file's (resolved) path, size, and modification
+    time (and, optionally, a hash of its content), and by the options the sheet
+    was read with. Sheets are stored in uncompressed Arrow IPC format, so they
+    can be memory-mapped when read. The modification time of each entry file is
+    updated when it is used, so that when the cache exceeds its maximum size the
+    least recently used entries can be removed.
+    """
+
+    def __init__(
+        self, directory: Path, max_size: int | None = None, hash_content: bool = False
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hash_content = hash_content
+        self.hits = self.misses = 0
+        # The size of the cache, as far as we know: found when entries are
+        # evicted, and then added to as entries are stored (see _store).
+        self._size: int | None = None
+
+    def _fingerprint(self, path: Path) -> dict[str, Any]:
+        stat = path.stat()
+        fingerprint: dict[str, Any] = dict(
+            path=str(path.resolve()),
+            size=stat.st_size,
+            mtime=stat.st_mtime_ns,
+        )
+        if self.hash_content:
+            digest = hashlib.sha256()
+            with open(path, "rb") as fp:
+                while chunk := fp.read(1 << 20):
+                    digest.update(chunk)
+            fingerprint["sha256"] = digest.hexdigest()
+        return fingerprint
+
+    def _entry(self, fingerprint: dict[str, Any], suffix: str, **options: Any) -> Path:
+        key = json.dumps(dict(fingerprint, **options), sort_keys=True)
+        return self.directory / (hashlib.sha256(key.encode()).hexdigest() + suffix)
+
+    def _use(self, entry: Path) -> bool:
+        """
+        Mark an entry as recently used. Return False if it does not exist.
+        """
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _store(self, entry: Path, data: pl.DataFrame | list[str]) -> None:
+        """
+        Write an entry atomically (so a concurrent reader never sees part of
+        one), then evict old entries if the cache has grown too large.
+
+        The cache directory is only scanned (by evict) when the first entry is
+        stored, and then whenever the size of the cache (found by that scan,
+        plus the sizes of the entries stored since) exceeds the maximum. So
+        entries stored by other processes in the meantime are only noticed at
+        the next scan.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        try:
+            if isinstance(data, pl.DataFrame):
+                data.write_ipc(tmp, compression="uncompressed")
+            else:
+                tmp.write_text(json.dumps(data))
+            os.replace(tmp, entry)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        if self.max_size is not None:
+            if self._size is not None:
+                self._size += entry.stat().st_size
+            if self._size is None or self._size > self.max_size:
+                self.evict(self.max_size, keep=entry)
+
+    def workbook(self, path: Path) -> "CachedWorkbook":
+        """
+        Get the cache entries for an Excel file.
+        """
+        return CachedWorkbook(self, path, self._fingerprint(path))
+
+    def entries(self) -> Iterator[os.DirEntry]:
+        """
+        Yield the entries in the cache directory.
+        """
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(
+                        (_SHEET_SUFFIX, _NAMES_SUFFIX)
+                    ):
+                        yield entry
+        except FileNotFoundError:
+            return
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the number of sheets and workbooks in the cache, and its total size.
+        """
+        sheets = workbooks = size = 0
+        for entry in self.entries():
+            if entry.name.endswith(_SHEET_SUFFIX):
+                sheets += 1
+            else:
+                workbooks += 1
+            size += entry.stat().st_size
+        return dict(sheets=sheets, workbooks=workbooks, size=size)
+
+    def evict(self, max_size: int, keep: Path | None = None) -> int:
+        """
+        Remove the least recently used entries until the cache is no larger than
+        'max_size' bytes. The 'keep' entry is not removed. Return the number of
+        entries removed.
+        """
+        entries = []
+        total = 0
+        for entry in self.entries():
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_size:
+                break
+            if keep is not None and path == str(keep):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Another process removed it.
+                pass
+            total -= size
+            removed += 1
+
+        self._size = total
+        return removed
+
+    def clear(self) -> int:
+        """
+        Remove all entries. Return the number removed.
+        """
+        return self.evict(0)
+
+
+class CachedWorkbook:
+    """
+    The cache entries for one Excel file.
+    """
+
+    def __init__(
+        self, cache: GridCache, path: Path, fingerprint: dict[str, Any]
+    ) -> None:
+        self.cache = cache
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def _names_entry(self) -> Path:
+        return self.cache._entry(self.fingerprint, _NAMES_SUFFIX)
+
+    def _sheet_entry(self, sheet_name: str, header: bool, skip: int) -> Path:
+        return self.cache._entry(
+            self.fingerprint, _SHEET_SUFFIX, sheet=sheet_name, header=header, skip=skip
+        )
+
+    def sheet_names(self) -> list[str] | None:
+        """
+        Get the names of the workbook's sheets, or None if they are not cached.
+        """
+        entry = self._names_entry()
+        if self.cache._use(entry):
+            try:
+                return json.loads(entry.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+        return None
+
+    def set_sheet_names(self, sheet_names: list[str]) -> None:
+        self.cache._store(self._names_entry(), sheet_names)
+
+    def sheet(self, sheet_name: str, header: bool, skip: int) -> pl.DataFrame | None:
+        """
+        Get a (memory-mapped) DataFrame for a sheet, or None if the sheet is not
+        cached.
+        """
+        entry = self._sheet_entry(sheet_name, header, skip)
+        if self.cache._use(entry):
+            try:
+                df = pl.read_ipc(entry, memory_map=True)
+            except (FileNotFoundError, pl.exceptions.ComputeError):
+                # Removed (or being replaced) by another process.
+                pass
+            else:
+                self.cache.hits += 1
+                return df
+        self.cache.misses += 1
+        return None
+
+    def set_sheet(
+        self, sheet_name: str, header: bool, skip: int, df: pl.DataFrame
+    ) -> None:
+        self.cache._store(self._sheet_entry(sheet_name, header, skip), df)
+
+
+class MemoryCache:
+    """
+    An in-memory cache of the DataFrames read from the sheets of Excel files
+    (and of the names of their sheets), for a long-running server (see
+    xgrep.server). It can be used wherever a GridCache can.
+
+    Entries for a file are dropped when its size or modification time changes.
+    When the DataFrames held exceed 'max_size' bytes (as estimated by Polars),
+    the least recently used are dropped.
+    """
+
+    def __init__(self, max_size: int | None = None) -> None:
+        self.max_size = max_size
+        self.hits = self.misses = 0
+        # The size of the DataFrames held.
+        self.size = 0
+        # Entries, from least to most recently used, keyed by (resolved) path
+        # and the options a sheet was read with (or None, for sheet names),
+        # holding the file's fingerprint and the cached value.
+        self._entries: OrderedDict[tuple, tuple[tuple[int, int], Any]] = OrderedDict()
+
+    def __reduce__(self) -> tuple:
+        # Worker processes (see xgrep.parallel) are given an empty cache, not
+        # a copy of all the cached DataFrames.
+        return MemoryCache, (self.max_size,)
+
+    def workbook(self, path: Path) -> "MemoryCachedWorkbook":
+        """
+        Get the cache entries for an Excel file.
+        """
+        stat = path.stat()
+        return MemoryCachedWorkbook(
+            self, str(path.resolve()), (stat.st_size, stat.st_mtime_ns)
+        )
+
+    def get(self, key: tuple, fingerprint: tuple[int, int]) -> Any:
+        """
+        Get a cached value, or None if it is not cached (or its file has
+        changed).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != fingerprint:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: tuple, fingerprint: tuple[int, int], value: Any) -> None:
+        """
+        Cache a value, then drop the least recently used DataFrames if the cache
+        has grown too large.
+        """
+        self._remove(key)
+        self._entries[key] = (fingerprint, value)
+        if isinstance(value, pl.DataFrame):
+            self.size += value.estimated_size()
+
+        if self.max_size is not None:
+            for old_key in list(self._entries):
+                if self.size <= self.max_size:
+                    break
+                if old_key != key:
+                    self._remove(old_key)
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and isinstance(entry[1], pl.DataFrame):
+            self.size -= entry[1].estimated_size()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the number of sheets and workbooks in the cache, and its size.
+        """
+        sheets = sum(key[1] is not None for key in self._entries)
+        return dict(
+            sheets=sheets,
+            workbooks=len(self._entries) - sheets,
+            size=self.size,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+class MemoryCachedWorkbook:
+    """
+    The MemoryCache entries for one Excel file.
+    """
+
+    def __init__(
+        self, cache: MemoryCache, path: str, fingerprint: tuple[int, int]
+    ) -> None:
+        self.cache = cache
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def sheet_names(self) -> list[str] | None:
+        return self.cache.get((self.path, None), self.fingerprint)
+
+    def set_sheet_names(self, sheet_names: list[str]) -> None:
+        self.cache.set((self.path, None), self.fingerprint, sheet_names)
+
+    def sheet(self, sheet_name: str, header: bool, skip: int) -> pl.DataFrame | None:
+        df = self.cache.get((self.path, sheet_name, header, skip), self.fingerprint)
+        if df is None:
+            self.cache.misses += 1
+        else:
+            self.cache.hits += 1
+        return df
+
+    def set_sheet(
+        self, sheet_name: str, header: bool, skip: int, df: pl.DataFrame
+    ) -> None:
+        self.cache.set((self.path, sheet_name, header, skip), self.fingerprint, df)
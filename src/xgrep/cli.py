@@ -3,11 +3,18 @@ import click
 from click_option_group import optgroup, MutuallyExclusiveOptionGroup
 import re
 from pathlib import Path
-from rich.console import Console
+from typing import TYPE_CHECKING, Any, Iterable, TextIO
 
-from xgrep.excel import ExcelWriter
-from xgrep.grid import grid_reader
-from xgrep.match import Match
+# The xgrep modules (which import Polars, and may import rich or xlsxwriter)
+# are only imported where they are needed, so that, e.g., 'xgrep --help'
+# starts quickly, and output that does not need rich or xlsxwriter does not
+# import them (see TestImports in test/test_cli.py).
+if TYPE_CHECKING:
+    from xgrep.index import TrigramIndex
+    from xgrep.output import Output
+
+# The type of the input filename arguments.
+FILENAME = click.Path(exists=True, path_type=Path)
 
 
 def check_args(
@@ -15,10 +22,57 @@ def check_args(
     out: Path | None,
     sheet_id: tuple[int, ...] | int | None,
     sheet_name: tuple[str, ...] | str | None,
+    batch_size: int | None,
+    only_matching_cols: bool,
+    only_matching: bool,
+    invert: bool,
+    filenames: tuple[Path, ...],
+    recursive: bool,
 ) -> None:
     """
     Make sure the command-line args are sane.
     """
+    from xgrep.frames import FRAME_FORMATS
+
+    if not recursive:
+        for path in filenames:
+            if path.is_dir():
+                click.echo(
+                    f"{str(path)!r} is a directory. Use --recursive (-r) to "
+                    "search directories.",
+                    err=True,
+                )
+                sys.exit(-1)
+
+    if batch_size is not None and only_matching_cols:
+        # The matching columns cannot be known until all batches are read.
+        click.echo(
+            "You cannot use both --batch-size and --only-matching-cols.", err=True
+        )
+        sys.exit(-1)
+
+    if only_matching and invert:
+        # Rows that do not match have no matched parts to show.
+        click.echo("You cannot use both --only-matching and --invert.", err=True)
+        sys.exit(-1)
+
+    if format_ in FRAME_FORMATS and out is None:
+        click.echo(
+            f"For {format_} output you must use --out to give a filename.", err=True
+        )
+        sys.exit(-1)
+
+    if format_ in ("arrow", "parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            click.echo(
+                f"Writing {format_} output needs the pyarrow package (pip install "
+                "'xgrep[arrow]').",
+                err=True,
+            )
+            sys.exit(-1)
+
     if format_ == "excel":
         if out is None:
             click.echo(
@@ -35,10 +89,109 @@ def check_args(
             sys.exit(-1)
 
 
-def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
+def size_option(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> int | None:
+    """
+    Convert a size given on the command line to a number of bytes.
+    """
+    from xgrep.cache import parse_size
+
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def regex_option(
+    ctx: click.Context, param: click.Parameter, value: tuple[str, ...]
+) -> tuple[re.Pattern, ...]:
+    """
+    Compile regexes given on the command line.
+    """
+    try:
+        return tuple(re.compile(pattern) for pattern in value)
+    except re.PatternError:
+        raise click.BadParameter("must be a valid regular expression.")
+
+
+def column_letters_option(
+    ctx: click.Context, param: click.Parameter, value: tuple[str, ...]
+) -> frozenset[int]:
+    """
+    Convert Excel column labels and ranges given on the command line to
+    (1-based) column numbers.
+    """
+    from xgrep.excel import excel_column_numbers
+
+    numbers: set[int] = set()
+    try:
+        for spec in value:
+            numbers.update(excel_column_numbers(spec))
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return frozenset(numbers)
+
+
+def get_patterns(
+    ctx: click.Context,
+    pattern: str | None,
+    filenames: tuple[Path, ...],
+    regexps: tuple[str, ...],
+    pattern_files: tuple[TextIO, ...],
+) -> tuple[list[str], tuple[Path, ...]]:
+    """
+    Get the patterns to search for and the files to search. As with grep, the
+    first argument is only the pattern if no -e or -f option is given.
+    """
+    params = {param.name: param for param in ctx.command.params}
+
+    if regexps or pattern_files:
+        patterns = list(regexps)
+        for fp in pattern_files:
+            patterns.extend(fp.read().splitlines())
+        if pattern is not None:
+            # The first argument is actually a filename.
+            path = FILENAME.convert(pattern, params["filenames"], ctx)
+            filenames = (path,) + filenames
+    elif pattern is None:
+        raise click.MissingParameter(ctx=ctx, param=params["pattern"])
+    else:
+        patterns = [pattern]
+
+    if not filenames:
+        raise click.MissingParameter(ctx=ctx, param=params["filenames"])
+
+    return patterns, filenames
+
+
+def get_regex(
+    patterns: list[str], ignore_case: bool, fixed_strings: bool = False
+) -> re.Pattern:
     """
-    Compile the regular expression pattern.
+    Compile the regular expression pattern(s) into one regex, which matches
+    wherever any of them does.
     """
+    from xgrep.engine import literal_strings
+
+    if fixed_strings:
+        patterns = [re.escape(pattern) for pattern in patterns]
+
+    if not patterns:
+        # E.g., an empty -f file, which (as with grep) matches nothing.
+        pattern = "(?!)"
+    elif len(patterns) == 1:
+        pattern = patterns[0]
+    else:
+        # Sets of literal strings are kept as a simple alternation, so they
+        # can be matched with an Aho-Corasick automaton (see literal_set in
+        # engine.py).
+        pattern = "|".join(
+            p if literal_strings(p) is not None else f"(?:{p})" for p in patterns
+        )
+
     try:
         return re.compile(pattern, re.I if ignore_case else 0)
     except re.PatternError:
@@ -48,17 +201,88 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
         )
 
 
+def search_file(
+    path: Path,
+    output: "Output",
+    regex: re.Pattern,
+    invert: bool,
+    quiet: bool,
+    reader_options: dict[str, Any],
+    max_count: int | None = None,
+) -> bool:
+    """
+    Search a file and add its matches to the output. Return True if there was
+    a match. If 'max_count' is given, stop reading the file once that many
+    rows have been selected for output (as for grep -m).
+    """
+    any_match = False
+
+    if max_count == 0:
+        # As with grep -m 0, the file is not read at all.
+        return False
+
+    from xgrep.grid import grid_reader
+    from xgrep.match import Match, grid_matches
+    from xgrep.stats import timed
+
+    try:
+        grids = grid_reader(path, **reader_options)
+    except BaseException as e:
+        click.echo(f"Could not read {str(path)!r}: {e}.", err=True)
+        sys.exit(-1)
+
+    stats = output.stats
+    if stats is not None:
+        grids = stats.read(grids)
+
+    for grid in grids:
+        if stats is not None:
+            stats.scanned(grid)
+
+        if quiet or (output.only_filename and not output.count):
+            # We only need to know whether there is a match, and once we know
+            # that there is, we do not need to read the rest of the file (or
+            # its other Excel sheets).
+            with timed(stats, "match", grid):
+                matched = grid_matches(grid, regex, invert=invert)
+            if matched:
+                if not quiet:
+                    output.print(grid.source or grid.filename)
+                return True
+            continue
+
+        with timed(stats, "match", grid):
+            match = Match(grid, regex, invert, max_count=max_count)
+
+        if match.count():
+            any_match = True
+
+        output.add(match)
+
+        if max_count is not None:
+            max_count -= match.count()
+            if not max_count:
+                # There is no need to read the rest of the file (or its other
+                # Excel sheets).
+                break
+
+    output.flush()
+
+    return any_match
+
+
 @click.command()
 @click.argument(
     "pattern",
     nargs=1,
-    required=True,
+    required=False,
+    metavar="PATTERN",
 )
 @click.argument(
     "filenames",
-    type=click.Path(exists=True, dir_okay=False, path_type=Path),
-    required=True,
+    type=FILENAME,
     nargs=-1,
+    metavar="FILENAMES...",
 )
 @click.option(
     "-o",
@@ -70,6 +294,43 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
         "to the output file."
     ),
 )
+@click.option(
+    "-r",
+    "--recursive",
+    is_flag=True,
+    help=(
+        "Search the CSV, TSV, and Excel files in directories given as "
+        "arguments, and in their subdirectories (like grep -r). Symbolic links "
+        "to directories are not followed. Files are searched as they are found."
+    ),
+)
+@click.option(
+    "--include",
+    multiple=True,
+    metavar="GLOB",
+    help=(
+        "With --recursive, only search files whose names match this glob "
+        "(e.g., '*.xlsx'). May be repeated."
+    ),
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help=(
+        "With --recursive, do not search files (or directories) whose names "
+        "match this glob. May be repeated."
+    ),
+)
+@click.option(
+    "--ignore-file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help=(
+        "With --recursive, a file of rules (in the format of a .gitignore "
+        "file) giving the files and directories not to search. Paths are "
+        "matched relative to each directory given as an argument."
+    ),
+)
 @click.option(
     "--header/--no-header",
     default=True,
@@ -84,14 +345,39 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
     default=0,
     help="Skip this many rows at the start of the input file(s).",
 )
+@click.option(
+    "--batch-size",
+    type=click.IntRange(1),
+    help=(
+        "Read CSV and TSV input files in batches of this many rows, and output "
+        "the matches in each batch as they are found. This limits the memory "
+        "needed to search large files. With --format rich, a table is shown for "
+        "each batch that has matches. Cannot be used with --only-matching-cols."
+    ),
+)
 @click.option(
     "--format",
     "format_",
-    type=click.Choice(["csv", "excel", "rich", "tsv"], case_sensitive=False),
+    type=click.Choice(
+        ["arrow", "csv", "excel", "ndjson", "parquet", "rich", "tsv"],
+        case_sensitive=False,
+    ),
     default="rich",
     help=(
         "The output format. The 'rich' format produces a rich Table (see "
-        "https://rich.readthedocs.io/en/stable/tables.html)."
+        "https://rich.readthedocs.io/en/stable/tables.html). The 'parquet', "
+        "'arrow' (IPC), and 'ndjson' formats write the matching rows of all "
+        "files, with a File column, to the single --out file. Their columns keep "
+        "the types they have in Excel sheets, unless --unmatched is given."
+    ),
+)
+@click.option(
+    "--constant-memory",
+    is_flag=True,
+    help=(
+        "With --format excel, write the output workbook in xlsxwriter's constant "
+        "memory mode, so memory use does not grow with the number of matching rows. "
+        "Matching rows are written as plain cells, not as a formatted Excel table."
     ),
 )
 @click.option(
@@ -100,7 +386,118 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
     is_flag=True,
     help="Only print the number of matching lines (like grep -c).",
 )
+@click.option(
+    "-m",
+    "--max-count",
+    type=click.IntRange(0),
+    help=(
+        "Stop searching a file after this many matching rows (or, with "
+        "--invert, non-matching rows) have been found, like grep -m. The "
+        "count is for the whole file, over all its Excel sheets. The rest of "
+        "the file is not matched, and (with --batch-size, or for later Excel "
+        "sheets) is not read."
+    ),
+)
 @click.option("--width", type=int, help="The width to use for --format rich tables.")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(1),
+    default=1,
+    help=(
+        "The number of processes to use to search multiple input files in "
+        "parallel. Output is the same as for a serial search (files are "
+        "output in the order they are given)."
+    ),
+)
+@click.option(
+    "--parallel-sheets",
+    "--ps",
+    is_flag=True,
+    help=(
+        "With --jobs, search each sheet of an Excel input file as a separate "
+        "parallel task, so the sheets of a large workbook are searched in "
+        "parallel. Without this, each file is a single task."
+    ),
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    envvar="XGREP_CACHE_DIR",
+    help=(
+        "A directory in which to cache the sheets read from Excel input files, "
+        "so that files that have not changed are not parsed again. May also be "
+        "given in the XGREP_CACHE_DIR environment variable. See 'xgrep cache "
+        "--help' for commands to show cache statistics and clear the cache."
+    ),
+)
+@click.option(
+    "--cache-size",
+    default="1G",
+    envvar="XGREP_CACHE_SIZE",
+    callback=size_option,
+    show_default=True,
+    help=(
+        "The maximum size of the --cache-dir cache (e.g., 500M or 2G). The "
+        "least recently used entries are removed when it grows larger."
+    ),
+)
+@click.option(
+    "--cache-hash",
+    is_flag=True,
+    help=(
+        "Also use a hash of the content of Excel input files to identify them "
+        "in the --cache-dir cache (rather than just their path, size, and "
+        "modification time). This is slower, but safe if files may be changed "
+        "without their size or modification time changing."
+    ),
+)
+@click.option(
+    "--index",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    envvar="XGREP_INDEX",
+    help=(
+        "A trigram index (made with 'xgrep index build') to use to avoid "
+        "reading files (and Excel sheets) that cannot contain a match. Files "
+        "that are not in the index, or that have changed since they were "
+        "indexed, are always read. The output is the same as without an index. "
+        "May also be given in the XGREP_INDEX environment variable."
+    ),
+)
+@click.option(
+    "--server",
+    is_flag=True,
+    help=(
+        "Have a running 'xgrep server start' do the search, so it can use the "
+        "Excel sheets it has cached in memory. The output is the same as for a "
+        "search without --server. The server's socket may be given in the "
+        "XGREP_SOCKET environment variable. If no server is running, the "
+        "search is done as usual."
+    ),
+)
+@click.option(
+    "--stats",
+    "stats_path",
+    metavar="[=PATH]",
+    is_flag=False,
+    flag_value="-",
+    help=(
+        "Write a JSON report of where the time went to PATH (or, if no PATH is "
+        "given, to standard error): the wall and CPU time spent reading, "
+        "matching, formatting, and writing each file (and Excel sheet), the "
+        "numbers of rows and cells scanned, cells scanned per second, and peak "
+        "memory use. Give a PATH as --stats=PATH."
+    ),
+)
+@click.option(
+    "--stats-memory",
+    is_flag=True,
+    help=(
+        "With --stats, also report the peak memory used by Python objects "
+        "(traced with tracemalloc). Tracing slows the search, so the times "
+        "reported are longer than they would otherwise be."
+    ),
+)
 @click.option(
     "-v",
     "--invert",
@@ -133,6 +530,88 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
     is_flag=True,
     help="Only show columns that have a matching cell.",
 )
+@click.option(
+    "--only-matching",
+    "--om",
+    is_flag=True,
+    help=(
+        "Only show the matched parts of cells, each on its own row (like grep -o). "
+        "Use --row-numbers and --col-numbers (or --excel-cols) to show where each "
+        "match is. Cannot be used with --invert."
+    ),
+)
+@click.option(
+    "--columns",
+    "--cols",
+    "column_names",
+    multiple=True,
+    metavar="NAME",
+    help=(
+        "Only match cells in the column with this name. May be repeated. Unless "
+        "--show-all-cols is used, only the selected columns (see also "
+        "--column-regex and --column-letters) are read and shown. For CSV and "
+        "TSV files, the other columns are not even parsed."
+    ),
+)
+@click.option(
+    "--column-regex",
+    "--cr",
+    multiple=True,
+    metavar="REGEX",
+    callback=regex_option,
+    help="Only match cells in columns whose names match this regex. May be repeated.",
+)
+@click.option(
+    "--column-letters",
+    "--cl",
+    multiple=True,
+    metavar="LETTERS",
+    callback=column_letters_option,
+    help=(
+        "Only match cells in the columns with these Excel column labels, given "
+        "as a comma-separated list of labels and ranges (e.g., 'A,C:E'). May be "
+        "repeated."
+    ),
+)
+@click.option(
+    "--show-all-cols",
+    "--sac",
+    is_flag=True,
+    help=(
+        "When columns are selected (with --columns, --column-regex, or "
+        "--column-letters), still read and show all the columns of matching "
+        "rows. Only the selected columns are matched."
+    ),
+)
+@click.option(
+    "-e",
+    "--regexp",
+    "regexps",
+    multiple=True,
+    help=(
+        "A pattern to search for. May be repeated, in which case cells matching "
+        "any of the patterns are matched (like grep -e). If -e or -f is given, "
+        "all arguments are filenames."
+    ),
+)
+@click.option(
+    "-f",
+    "--file",
+    "pattern_files",
+    type=click.File("r"),
+    multiple=True,
+    help=(
+        "A file of patterns to search for, one per line (like grep -f). May be "
+        "repeated, and combined with -e. A large set of literal strings (see "
+        "--fixed-strings) is matched efficiently, with an Aho-Corasick automaton."
+    ),
+)
+@click.option(
+    "-F",
+    "--fixed-strings",
+    is_flag=True,
+    help="Treat patterns as literal strings, not regexes (like grep -F).",
+)
 @click.option(
     "-i",
     "--ignore-case",
@@ -251,18 +730,42 @@ def get_regex(pattern: str, ignore_case: bool) -> re.Pattern:
 )
 @click.version_option()
 def cli(
-    pattern: str,
-    filenames: list[Path],
+    pattern: str | None,
+    filenames: tuple[Path, ...],
     out: Path | None,
+    recursive: bool,
+    include: tuple[str, ...],
+    exclude: tuple[str, ...],
+    ignore_file: Path | None,
     header: bool,
     skip: int,
+    batch_size: int | None,
     format_: str,
+    constant_memory: bool,
     count: bool,
+    max_count: int | None,
     width: int,
+    jobs: int,
+    parallel_sheets: bool,
+    cache_dir: Path | None,
+    cache_size: int,
+    cache_hash: bool,
+    index: Path | None,
+    server: bool,
+    stats_path: str | None,
+    stats_memory: bool,
     invert: bool,
     quiet: bool,
     ignore_missing_sheets: bool,
     only_matching_cols: bool,
+    only_matching: bool,
+    column_names: tuple[str, ...],
+    column_regex: tuple[re.Pattern, ...],
+    column_letters: frozenset[int],
+    show_all_cols: bool,
+    regexps: tuple[str, ...],
+    pattern_files: tuple[TextIO, ...],
+    fixed_strings: bool,
     ignore_case: bool,
     color: str,
     unmatched: str | None,
@@ -281,7 +784,35 @@ def cli(
     """
     Command-line interface.
     """
-    check_args(format_, out, sheet_id, sheet_name)
+    from xgrep.cache import GridCache
+    from xgrep.excel import ExcelWriter
+    from xgrep.frames import FRAME_FORMATS, FrameWriter
+    from xgrep.grid import ColumnSelector
+    from xgrep.output import Output, make_console
+    from xgrep.stats import Stats, timed
+    from xgrep.walk import IgnoreRules, prefetch, walk
+
+    patterns, filenames = get_patterns(
+        click.get_current_context(), pattern, filenames, regexps, pattern_files
+    )
+    check_args(
+        format_,
+        out,
+        sheet_id,
+        sheet_name,
+        batch_size,
+        only_matching_cols,
+        only_matching,
+        invert,
+        filenames,
+        recursive,
+    )
+
+    # Whether more than one file may be searched. The files found in a
+    # directory are not known until it has been searched.
+    several = len(filenames) > 1 or (
+        recursive and any(path.is_dir() for path in filenames)
+    )
 
     # Set empty sheet-specifying tuples to be None to avoid an error from pl.read_excel.
     sheet_name = sheet_name or None
@@ -291,86 +822,428 @@ def cli(
     if (sheet_name is None and sheet_id is None) or sheet_id == (0,):
         sheet_id = 0
 
-    regex = get_regex(pattern, ignore_case)
+    regex = get_regex(patterns, ignore_case, fixed_strings)
     any_match = False
 
-    out_fp = excel_writer = None
+    out_fp = writer = None
     if out is None:
         out_fp = sys.stdout
     else:
-        if format_ == "excel":
-            excel_writer = ExcelWriter(
+        if format_ in FRAME_FORMATS:
+            writer = FrameWriter(out, format_, save_empty_output, quiet)
+        elif format_ == "excel":
+            writer = ExcelWriter(
                 out,
                 save_empty_output,
                 sheet_separator,
-                drop_filenames=len(filenames) == 1,
+                drop_filenames=not several,
                 quiet=quiet,
+                constant_memory=constant_memory,
             )
         else:
             out_fp = open(out, "w")
 
-    for path in filenames:
-        try:
-            grids = grid_reader(
-                path,
-                header,
-                basename,
-                skip,
-                sheet_name,
-                sheet_id,
-                sheet_separator,
-                ignore_missing_sheets,
-                quiet,
-                None,
+    print_filenames = not no_filename
+    if not several and format_ not in FRAME_FORMATS:
+        # The rows of a Parquet (etc.) file always say which file (and Excel
+        # sheet) they are from, unless --no-filename is given.
+        print_filenames = print_filenames and filenames_always
+
+    stats = None if stats_path is None else Stats(trace_memory=stats_memory)
+
+    output = Output(
+        (
+            None
+            if out_fp is None
+            else make_console(
+                out_fp,
+                width,
+                tables=format_ == "rich" and not (count or only_filename or quiet),
             )
-        except BaseException as e:
-            click.echo(f"Could not read {str(path)!r}: {e}.", err=True)
-            sys.exit(-1)
+        ),
+        writer,
+        format_=format_,
+        count=count,
+        only_filename=only_filename,
+        width=width,
+        filenames=print_filenames,
+        stats=stats,
+        only_matching_cols=only_matching_cols,
+        only_matching=only_matching,
+        unmatched=unmatched,
+        color=color,
+        row_numbers=row_numbers,
+        col_numbers=col_numbers,
+        excel_cols=excel_cols,
+        out=out,
+    )
 
-        for grid in grids:
-            if match := Match(grid, regex, invert):
-                any_match = True
+    reader_options = dict(
+        header=header,
+        basename=basename,
+        skip=skip,
+        sheet_name=sheet_name,
+        sheet_id=sheet_id,
+        sheet_separator=sheet_separator,
+        ignore_missing_sheets=ignore_missing_sheets,
+        quiet=quiet,
+        batch_size=batch_size,
+        cache=(
+            # A server (see xgrep.server) caches Excel sheets in memory.
+            (click.get_current_context().obj or {}).get("cache")
+            if cache_dir is None
+            else GridCache(cache_dir, max_size=cache_size, hash_content=cache_hash)
+        ),
+        columns=(
+            ColumnSelector(frozenset(column_names), column_regex, column_letters)
+            if column_names or column_regex or column_letters
+            else None
+        ),
+        all_cols=show_all_cols,
+    )
+
+    paths: Iterable[Path] = filenames
+    if recursive:
+        # Directories are walked in a separate thread, so searching starts
+        # with the first file found.
+        paths = prefetch(
+            walk(
+                filenames,
+                include,
+                exclude,
+                None if ignore_file is None else IgnoreRules.from_file(ignore_file),
+            )
+        )
+
+    tasks: Iterable[tuple[Path, dict[str, Any]]] = (
+        (path, reader_options) for path in paths
+    )
 
+    # An index cannot tell us which files have non-matching rows (for
+    # --invert), or which files would have empty output saved.
+    trigram_index = None
+    if index is not None and not (invert or save_empty_output):
+        from xgrep.index import TrigramIndex
+
+        trigram_index = TrigramIndex(index)
+        tasks = trigram_index.filter(paths, regex, reader_options)
+
+    if not recursive:
+        # All the files are known, so they can be searched in parallel in
+        # order of size (see search_parallel).
+        tasks = list(tasks)
+
+    if jobs > 1 and (several or parallel_sheets):
+        from xgrep.parallel import search_parallel
+
+        any_match = search_parallel(
+            tasks,
+            jobs,
+            output,
+            regex,
+            invert,
+            quiet,
+            max_count,
+            # A file's matching rows are counted over all its sheets.
+            sheets=parallel_sheets and max_count is None,
+        )
+    else:
+        for path, options in tasks:
+            if search_file(path, output, regex, invert, quiet, options, max_count):
+                any_match = True
                 if quiet:
                     # No need to process any more files. The exit status will
-                    # be 0 since a match exists in this file.
+                    # be 0 since there was a match.
                     break
 
-                print_filenames = not no_filename
-                if len(filenames) == 1:
-                    print_filenames = print_filenames and filenames_always
-
-                result = match.format(
-                    format_=format_,
-                    only_filename=only_filename,
-                    count=count,
-                    width=width,
-                    only_matching_cols=only_matching_cols,
-                    filenames=print_filenames,
-                    unmatched=unmatched,
-                    color=color,
-                    row_numbers=row_numbers,
-                    col_numbers=col_numbers,
-                    excel_cols=excel_cols,
-                    out=out,
-                    excel_writer=excel_writer,
-                )
-
-                if excel_writer is None:
-                    # Unless the Excel writer has taken care of saving the
-                    # match, there must be some kind of result, since 'match'
-                    # is true, above.
-                    assert result
-                    assert out_fp
-                    console = Console(file=out_fp, width=width, highlight=False)
-                    console.print(result)
+    if trigram_index is not None:
+        trigram_index.close()
 
     if out is not None:
         if out_fp is None:
-            assert excel_writer
-            excel_writer.close()
+            assert writer
+            # Writing the last sheet, and saving the workbook (or closing the
+            # Parquet, etc., file).
+            with timed(stats, "write"):
+                writer.close()
         else:
-            assert excel_writer is None
+            assert writer is None
             out_fp.close()
 
+    if stats is not None:
+        stats.write(stats_path)
+
     sys.exit(int(not any_match))
+
+
+cache_dir_option = click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    envvar="XGREP_CACHE_DIR",
+    required=True,
+    help="The cache directory (see 'xgrep --help').",
+)
+
+
+@click.group()
+def cache() -> None:
+    """
+    Manage the cache of Excel sheets (see --cache-dir in 'xgrep --help').
+    """
+
+
+@cache.command()
+@cache_dir_option
+def stats(cache_dir: Path) -> None:
+    """
+    Show the number of cached sheets and workbooks, and the cache size.
+    """
+    from xgrep.cache import GridCache, format_size
+
+    result = GridCache(cache_dir).stats()
+    click.echo(f"Directory: {cache_dir}")
+    click.echo(f"Sheets: {result['sheets']}")
+    click.echo(f"Workbooks: {result['workbooks']}")
+    click.echo(f"Size: {format_size(result['size'])}")
+
+
+@cache.command()
+@cache_dir_option
+@click.option(
+    "--max-size",
+    callback=size_option,
+    help=(
+        "Only remove the least recently used entries, until the cache is no "
+        "larger than this (e.g., 500M or 2G)."
+    ),
+)
+def clear(cache_dir: Path, max_size: int | None) -> None:
+    """
+    Remove entries from the cache.
+    """
+    from xgrep.cache import GridCache
+
+    removed = GridCache(cache_dir).evict(0 if max_size is None else max_size)
+    click.echo(f"Removed {removed} cache entr{'y' if removed == 1 else 'ies'}.")
+
+
+index_option = click.option(
+    "--index",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="XGREP_INDEX",
+    required=True,
+    help="The index file (see 'xgrep --help').",
+)
+
+
+@click.group()
+def index() -> None:
+    """
+    Manage a trigram index of files (see --index in 'xgrep --help').
+    """
+
+
+def index_files(trigram_index: "TrigramIndex", paths: Iterable[Path]) -> int:
+    """
+    Add files to an index, reporting (and skipping) any that cannot be read.
+    Return the number of files indexed.
+    """
+    count = 0
+    for path in paths:
+        try:
+            trigram_index.add(path)
+        except Exception as e:
+            click.echo(f"Could not index {str(path)!r}: {e}.", err=True)
+        else:
+            count += 1
+    return count
+
+
+@index.command()
+@index_option
+@click.option(
+    "--header/--no-header",
+    default=True,
+    help=(
+        "Whether input files have a header line. The index is only used for "
+        "searches with the same setting."
+    ),
+)
+@click.option(
+    "--skip",
+    type=click.IntRange(0),
+    default=0,
+    help=(
+        "Skip this many rows at the start of the input file(s). The index is "
+        "only used for searches with the same setting."
+    ),
+)
+@click.argument(
+    "filenames",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=True,
+    nargs=-1,
+)
+def build(index: Path, header: bool, skip: int, filenames: list[Path]) -> None:
+    """
+    Make a new index of files.
+    """
+    from xgrep.index import TrigramIndex
+
+    trigram_index = TrigramIndex(index, create=True)
+    trigram_index.options = dict(header=header, skip=skip)
+    count = index_files(trigram_index, filenames)
+    trigram_index.close()
+    click.echo(f"Indexed {count} file{'' if count == 1 else 's'}.")
+
+
+@index.command()
+@index_option
+@click.argument(
+    "filenames",
+    type=click.Path(dir_okay=False, path_type=Path),
+    nargs=-1,
+)
+def update(index: Path, filenames: list[Path]) -> None:
+    """
+    Update an index. Files (by default, all those in the index) that are new,
+    or have changed since they were indexed, are (re-)indexed, and files that
+    no longer exist are removed from the index.
+    """
+    from xgrep.index import TrigramIndex
+
+    try:
+        trigram_index = TrigramIndex(index)
+    except FileNotFoundError as e:
+        raise click.BadParameter(str(e), param_hint="--index")
+
+    paths = filenames or trigram_index.paths()
+    removed = sum(trigram_index.remove(path) for path in paths if not path.exists())
+    count = index_files(
+        trigram_index,
+        (
+            path
+            for path in paths
+            if path.exists() and not trigram_index.up_to_date(path)
+        ),
+    )
+    trigram_index.close()
+    click.echo(f"Indexed {count} file{'' if count == 1 else 's'}, removed {removed}.")
+
+
+socket_option = click.option(
+    "--socket",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="XGREP_SOCKET",
+    help="The server's socket. Default: xgrep-USER.sock in $XDG_RUNTIME_DIR or /tmp.",
+)
+
+
+@click.group()
+def server() -> None:
+    """
+    Run a server that searches files for 'xgrep --server', with everything it
+    needs already imported and with the Excel sheets it reads cached in memory.
+    """
+
+
+@server.command()
+@socket_option
+@click.option(
+    "--max-size",
+    default="1G",
+    callback=size_option,
+    show_default=True,
+    help=(
+        "The maximum size of the Excel sheets held in memory (e.g., 500M or "
+        "2G). The least recently used are dropped when there are more."
+    ),
+)
+def start(socket: Path | None, max_size: int) -> None:
+    """
+    Start a server, which runs (one at a time) the searches sent to it until it
+    is stopped. Cached sheets are re-read if their file changes.
+    """
+    from xgrep.server import serve, socket_path
+
+    try:
+        serve(socket or socket_path(), max_size)
+    except FileExistsError as e:
+        raise click.BadParameter(str(e), param_hint="--socket")
+
+
+@server.command()
+@socket_option
+def stop(socket: Path | None) -> None:
+    """
+    Stop a server.
+    """
+    from xgrep.server import request, socket_path
+
+    try:
+        request(socket or socket_path(), "stop")
+    except OSError:
+        click.echo("No server is running.", err=True)
+        sys.exit(1)
+
+
+@server.command()
+@socket_option
+def status(socket: Path | None) -> None:
+    """
+    Show a server's process id, and what it has cached.
+    """
+    from xgrep.cache import format_size
+    from xgrep.server import request, socket_path
+
+    try:
+        result = request(socket or socket_path(), "status")["status"]
+    except OSError:
+        click.echo("No server is running.", err=True)
+        sys.exit(1)
+    click.echo(f"Process: {result['pid']}")
+    click.echo(f"Sheets: {result['sheets']}")
+    click.echo(f"Workbooks: {result['workbooks']}")
+    click.echo(f"Size: {format_size(result['size'])}")
+    click.echo(f"Hits: {result['hits']}")
+    click.echo(f"Misses: {result['misses']}")
+
+
+# Commands that are run as 'xgrep COMMAND ...'.
+COMMANDS: dict[str, click.Group] = {"cache": cache, "index": index, "server": server}
+
+
+def main(**extra: Any) -> None:
+    """
+    Run a command (e.g., 'xgrep cache stats') or, by default, search files.
+    Keyword arguments (e.g., a context 'obj', see xgrep.server) are passed to
+    click.
+
+    An argument is only taken to be a command if it is followed by one of that
+    command's subcommands (or --help, or nothing), so a search for a pattern
+    with the same name as a command is still possible.
+    """
+    args = sys.argv[1:]
+    end = args.index("--") if "--" in args else len(args)
+
+    if "--server" in args[:end]:
+        from xgrep.server import run_remotely, socket_path
+
+        args.remove("--server")
+        try:
+            sys.exit(run_remotely(socket_path(), args))
+        except (FileNotFoundError, ConnectionRefusedError):
+            # No server is running.
+            sys.argv[1:] = args
+            end -= 1
+
+    if args and (group := COMMANDS.get(args[0])):
+        if len(args) == 1 or args[1] == "--help" or args[1] in group.commands:
+            group(args[1:], prog_name=f"xgrep {args[0]}", **extra)
+
+    # A --stats option without a path must not take the argument after it
+    # (e.g., the pattern) as its path. A path must be given as --stats=PATH.
+    sys.argv[1 : end + 1] = [
+        "--stats=-" if arg == "--stats" else arg for arg in args[:end]
+    ]
+    cli(**extra)
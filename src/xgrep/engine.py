@@ -0,0 +1,558 @@
+import re
+import sys
+import polars as pl
+from functools import cache
+from typing import Callable, NamedTuple
+
+try:
+    # The parser of Python's re module, which knows the shortest match of a
+    # pattern (see can_match_empty).
+    from re import _parser as _sre_parse  # type: ignore[attr-defined]
+except ImportError:
+    # Python < 3.11.
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+# Python regex flags that have an inline equivalent in the Rust regex crate
+# used by Polars.
+_INLINE_FLAGS = {
+    re.IGNORECASE: "i",
+    re.MULTILINE: "m",
+    re.DOTALL: "s",
+}
+
+# The non-ASCII characters that Python's re.IGNORECASE treats as equal to an
+# ASCII letter (ignoring case).
+ASCII_CASE_FOLDS = {"İ": "i", "ı": "i", "ſ": "s", "K": "k"}
+
+# A group with scoped inline flags (e.g., '(?i:...)' or '(?-i:...)').
+_SCOPED_FLAGS = re.compile(r"\(\?(?:[a-zA-Z]+-?|-)[a-zA-Z]*:")
+
+# Escapes that can give a non-ASCII character.
+_NON_ASCII_ESCAPES = re.compile(r"\\[xuUN]")
+
+# Characters with a special meaning in a regex (outside a character class).
+_SPECIAL = frozenset(".^$*+?{}[]()")
+
+# A column is matched one distinct value at a time if a sample of (about)
+# this many of its values has at most this fraction of distinct values (see
+# low_cardinality).
+CARDINALITY_SAMPLE_SIZE = 1_000
+MAX_DISTINCT_FRACTION = 0.2
+
+# The type of the (character) offsets of a match (see match_spans).
+SPAN = pl.Struct({"start": pl.Int64, "end": pl.Int64})
+
+# The characters that Python's '\s' matches (those for which str.isspace is
+# true), which Rust's '\s' does not all match (e.g., '\x1c').
+_PYTHON_SPACE = (
+    r"\t-\r\x1c-\x20\x85\xa0\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}"
+    r"\x{202f}\x{205f}\x{3000}"
+)
+
+# Python's '$' (without re.MULTILINE) also matches just before a final newline.
+# This is the nearest Rust equivalent (it also consumes that newline).
+_PYTHON_DOLLAR = r"(?:\n?\z)"
+
+
+@cache
+def _python_word() -> str:
+    """
+    The characters that Python's '\\w' matches, as the contents of a Rust
+    character class. Rust's '\\w' is not the same (e.g., it also matches
+    combining marks such as U+0301).
+    """
+    ranges: list[list[int]] = []
+    for code in range(sys.maxunicode + 1):
+        char = chr(code)
+        if char.isalnum() or char == "_":
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+
+    return "".join(
+        f"\\x{{{start:x}}}" if start == end else f"\\x{{{start:x}}}-\\x{{{end:x}}}"
+        for start, end in ranges
+    )
+
+
+def _python_class(escape: str, in_class: bool, ignore_case: bool) -> str | None:
+    """
+    Translate one of Python's '\\w', '\\W', '\\s' and '\\S' into a Rust character
+    class that matches the same characters (or into the contents of one, if the
+    escape is inside a class). Return None if that is not possible.
+    """
+    letter = escape[1]
+    if letter in "wW":
+        if in_class and ignore_case:
+            # Rust would also match the case folds of the characters, and
+            # there is no way to turn that off within a class.
+            return None
+        characters = _python_word()
+    else:
+        characters = _PYTHON_SPACE
+
+    if letter.isupper():
+        # A nested class, if inside a class.
+        translated = f"[^{characters}]"
+    elif in_class:
+        return characters
+    else:
+        translated = f"[{characters}]"
+
+    if not in_class and ignore_case and letter in "wW":
+        translated = f"(?-i:{translated})"
+    return translated
+
+
+def _translate(pattern: str, multiline: bool, ignore_case: bool = False) -> str | None:
+    """
+    Translate Python regex syntax into Rust regex syntax, or return None if the
+    pattern uses syntax that both engines accept but interpret differently.
+
+    Syntax that Rust does not support at all (backreferences, lookaround, etc.)
+    is left alone, and is caught when Polars tries to compile the result.
+    """
+    result = []
+    in_class = False
+    class_start = 0
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == "\\":
+            escape = pattern[i : i + 2]
+            if not in_class and escape in (r"\<", r"\>"):
+                # Word boundaries in Rust, literal '<' and '>' in Python.
+                return None
+            if not in_class and escape in (r"\b", r"\B"):
+                # Rust's word boundaries use its own '\w', and its '\B' matches
+                # an empty value (Python's does not). Rust has no lookaround to
+                # build Python's from.
+                return None
+            if escape in (r"\w", r"\W", r"\s", r"\S"):
+                # Unicode classes that are not the same in Rust.
+                translated = _python_class(escape, in_class, ignore_case)
+                if translated is None:
+                    return None
+                result.append(translated)
+                i += 2
+                continue
+            result.append(escape)
+            i += 2
+            continue
+
+        if in_class:
+            if char == "]" and i > class_start:
+                in_class = False
+            elif char == "[" or pattern[i : i + 2] in ("&&", "--", "~~"):
+                # Nested classes and set operations in Rust, literals in Python.
+                return None
+        elif char == "[":
+            in_class = True
+            class_start = i + 1
+            if pattern[class_start : class_start + 1] == "^":
+                class_start += 1
+            # Note that a ']' immediately after the opening '[' (or '[^') is a
+            # literal in both engines.
+            class_start += 1
+        elif char == "$" and not multiline:
+            if pattern[i + 1 : i + 2] not in ("", "|", ")"):
+                return None
+            result.append(_PYTHON_DOLLAR)
+            i += 1
+            continue
+
+        result.append(char)
+        i += 1
+
+    return "".join(result)
+
+
+def polars_pattern(pattern: re.Pattern) -> str | None:
+    """
+    Convert a compiled Python regex into a pattern string that Polars can use
+    to match the same values, or return None if that is not possible (in which
+    case the caller must fall back to matching with Python's re module).
+    """
+    if not isinstance(pattern.pattern, str):
+        return None
+
+    flags = pattern.flags & ~re.UNICODE
+    inline = ""
+    for flag, letter in _INLINE_FLAGS.items():
+        if flags & flag:
+            inline += letter
+            flags &= ~flag
+
+    if flags:
+        # E.g., re.ASCII or re.VERBOSE.
+        return None
+
+    if pattern.flags & re.IGNORECASE:
+        # Python (but not Rust) takes 'İ' and 'ı' to be equal to 'i' when
+        # ignoring case, so they are replaced in the values (see fold_case).
+        # That is only right if the pattern has no non-ASCII characters
+        # (written or escaped) of its own, and ignores case throughout.
+        if (
+            not pattern.pattern.isascii()
+            or _NON_ASCII_ESCAPES.search(pattern.pattern)
+            or _SCOPED_FLAGS.search(pattern.pattern)
+        ):
+            return None
+    elif _SCOPED_FLAGS.search(pattern.pattern):
+        # Part of the pattern may ignore case.
+        return None
+
+    translated = _translate(
+        pattern.pattern,
+        bool(pattern.flags & re.MULTILINE),
+        bool(pattern.flags & re.IGNORECASE),
+    )
+    if translated is None:
+        return None
+
+    if inline:
+        translated = f"(?{inline}){translated}"
+
+    try:
+        pl.Series([""]).str.contains(translated)
+    except pl.exceptions.ComputeError:
+        return None
+
+    return translated
+
+
+class Literals(NamedTuple):
+    """
+    A set of literal strings, any of which may be found in a value to match it.
+    """
+
+    strings: list[str]
+    ignore_case: bool
+
+
+def literal_strings(pattern: str) -> list[str] | None:
+    """
+    If a regex pattern is an alternation of literal strings (e.g., 'cat|d\\.g'),
+    return the strings. Otherwise return None.
+    """
+    strings = []
+    current: list[str] = []
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            escaped = pattern[i + 1 : i + 2]
+            if not escaped or escaped.isalnum():
+                # E.g., '\d' or '\1'.
+                return None
+            current.append(escaped)
+            i += 2
+            continue
+        if char in _SPECIAL:
+            return None
+        if char == "|":
+            strings.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+        i += 1
+
+    strings.append("".join(current))
+    return strings
+
+
+def literal_set(pattern: re.Pattern) -> Literals | None:
+    """
+    If a compiled Python regex only matches a set of literal strings, return
+    them so they can be matched with an Aho-Corasick automaton (which, unlike
+    a regex, stays fast as the number of strings grows). Otherwise return None.
+    """
+    if not isinstance(pattern.pattern, str):
+        return None
+
+    flags = pattern.flags & ~re.UNICODE
+    if flags & ~re.IGNORECASE:
+        return None
+
+    strings = literal_strings(pattern.pattern)
+    if strings is None:
+        return None
+
+    ignore_case = bool(flags)
+    if ignore_case and not all(string.isascii() for string in strings):
+        # Polars can only ignore the case of ASCII letters.
+        return None
+
+    return Literals(strings, ignore_case)
+
+
+def ignores_case(pattern: str | Literals) -> bool:
+    """
+    Does a (Polars) pattern from polars_pattern, or a set of literal strings,
+    ignore case?
+    """
+    if isinstance(pattern, Literals):
+        return pattern.ignore_case
+    flags = re.match(r"\(\?([ims]+)\)", pattern)
+    return flags is not None and "i" in flags.group(1)
+
+
+def fold_case(values: pl.Series) -> pl.Series:
+    """
+    Replace the non-ASCII characters that Python's re.IGNORECASE (but not
+    Polars) treats as equal to an ASCII letter with that letter. Each is
+    replaced by a single character, so offsets into the values are not
+    changed.
+    """
+    return values.str.replace_many(
+        list(ASCII_CASE_FOLDS), list(ASCII_CASE_FOLDS.values())
+    )
+
+
+def stringify(series: pl.Series) -> pl.Series:
+    """
+    Get a String Series holding exactly what str() gives for each value in a
+    Series, so that vectorized matching sees the same text as matching each
+    value with Python's re module would.
+    """
+    if series.dtype == pl.String:
+        return series.fill_null("None")
+
+    dtype = series.dtype
+    if not (
+        dtype.is_integer()
+        or dtype.is_float()
+        or dtype.is_temporal()
+        or dtype == pl.Boolean
+    ) or not low_cardinality(series):
+        # Other types (e.g., Decimal) may not have unique().
+        return _str_each(series)
+
+    # Only call str() on each distinct value, and look up the result for every
+    # value.
+    unique = series.unique()
+    strings = series.replace_strict(unique, _str_each(unique), return_dtype=pl.String)
+    if dtype.is_float():
+        # unique() takes -0.0 to be the same as 0.0.
+        negative_zero = ((series == 0) & (1 / series < 0)).fill_null(False)
+        if negative_zero.any():
+            strings = strings.set(negative_zero, "-0.0")
+    return strings
+
+
+def _str_each(series: pl.Series) -> pl.Series:
+    "Get a String Series holding what str() gives for each value in a Series."
+    return pl.Series(
+        series.name, [str(value) for value in series.to_list()], dtype=pl.String
+    )
+
+
+def low_cardinality(values: pl.Series) -> bool:
+    """
+    Judging from a sample spread through it, does a Series have so few
+    distinct values (e.g., status codes or country names) that matching each
+    of them once would be faster than matching every value?
+    """
+    sample = values.gather_every(max(1, len(values) // CARDINALITY_SAMPLE_SIZE))
+    return sample.n_unique() <= len(sample) * MAX_DISTINCT_FRACTION
+
+
+def deduplicated(
+    values: pl.Series, match: Callable[[pl.Series], pl.Series]
+) -> pl.Series:
+    """
+    Find which values in a String Series match, calling 'match' (which takes a
+    String Series and returns a Boolean Series) on each distinct value only
+    once, and looking up the result for every value.
+    """
+    unique = values.unique()
+    return values.is_in(unique.filter(match(unique)))
+
+
+def re_contains(values: pl.Series, pattern: re.Pattern) -> pl.Series:
+    """
+    Find which values in a String Series match a Python regex. If there are few
+    distinct values, each is only searched once.
+    """
+
+    def search(values: pl.Series) -> pl.Series:
+        return pl.Series(
+            values.name,
+            [pattern.search(value) is not None for value in values],
+            dtype=pl.Boolean,
+        )
+
+    if low_cardinality(values):
+        return deduplicated(values, search)
+    return search(values)
+
+
+def contains(values: pl.Series, pattern: str | Literals) -> pl.Series:
+    """
+    Find which values in a String Series match a (Polars) regex pattern, or
+    contain any of a set of literal strings. If there are few distinct values,
+    each is only matched once.
+    """
+    if low_cardinality(values):
+        return deduplicated(values, lambda unique: _contains(unique, pattern))
+    return _contains(values, pattern)
+
+
+def _contains(values: pl.Series, pattern: str | Literals) -> pl.Series:
+    if ignores_case(pattern):
+        # The pattern (or the literals) has no non-ASCII characters, so
+        # these are the only ones that differ in how they match it.
+        values = fold_case(values)
+
+    if isinstance(pattern, str):
+        return values.str.contains(pattern)
+
+    return values.str.contains_any(
+        pattern.strings, ascii_case_insensitive=pattern.ignore_case
+    )
+
+
+def match_mask(df: pl.DataFrame, pattern: str | Literals) -> pl.DataFrame:
+    """
+    Find which cells of a DataFrame match a (Polars) regex pattern or a set
+    of literal strings.
+
+    Return a DataFrame of Boolean columns, with the same names and shape as
+    the original.
+    """
+    return pl.DataFrame(
+        [contains(stringify(series), pattern) for series in df.iter_columns()]
+    )
+
+
+def any_match(
+    df: pl.DataFrame, pattern: str | Literals, chunk_size: int = 65_536
+) -> bool:
+    """
+    Does any cell of a DataFrame match a (Polars) regex pattern or a set of
+    literal strings? Rows are
+    matched in chunks, so a match near the start of a large DataFrame is found
+    without matching the rest of it.
+    """
+    for offset in range(0, len(df), chunk_size):
+        for series in df.slice(offset, chunk_size).iter_columns():
+            if contains(stringify(series), pattern).any():
+                return True
+    return False
+
+
+def _re_spans(values: pl.Series, pattern: re.Pattern) -> pl.DataFrame:
+    """
+    Find every match of a Python regex in each value of a String Series.
+    Return a DataFrame with a row for each match, giving the index of the value
+    it is in and its (character) offsets.
+    """
+    index, start, end = [], [], []
+    for i, value in enumerate(values):
+        for m in pattern.finditer(value):
+            index.append(i)
+            start.append(m.start())
+            end.append(m.end())
+    return pl.DataFrame(
+        dict(index=index, start=start, end=end),
+        schema=dict(index=pl.UInt32, start=pl.Int64, end=pl.Int64),
+    )
+
+
+def can_match_empty(pattern: re.Pattern) -> bool:
+    """
+    Can a Python regex match the empty string, somewhere in some value (e.g.,
+    'x*' or '\\d*\\b')? If the pattern cannot be parsed, assume it can.
+    """
+    try:
+        return _sre_parse.parse(pattern.pattern, pattern.flags).getwidth()[0] == 0
+    except Exception:
+        return True
+
+
+def _polars_spans(values: pl.Series, pattern: str) -> pl.DataFrame | None:
+    """
+    Find every match of a (Polars) regex pattern, which cannot match the
+    empty string, in each value of a String Series, as _re_spans does, or
+    return None if the matches could differ from those re.finditer would find.
+
+    Each match is found (by str.extract_all) along with the text between it
+    and the previous match, so its end offset is the total length of what has
+    been found so far, and its start offset is its end less its length.
+    """
+    if _PYTHON_DOLLAR in pattern:
+        # The match of '$' may include a final newline that Python's does not.
+        return None
+
+    if ignores_case(pattern):
+        values = fold_case(values)
+    matches = values.str.extract_all(pattern)
+    length = pl.col("found").str.len_chars().cast(pl.Int64)
+    return (
+        pl.DataFrame(
+            dict(
+                match=matches,
+                found=values.str.extract_all(rf"(?s:.)*?(?:{pattern})"),
+            )
+        )
+        .with_row_index("index")
+        .explode("match", "found")
+        .drop_nulls("found")
+        # The total length found in all the values so far, less that found in
+        # the values before this one.
+        .with_columns(total=length.cum_sum())
+        .with_columns(
+            end=pl.col("total") - (pl.col("total") - length).first().over("index")
+        )
+        .select(
+            "index",
+            start=pl.col("end") - pl.col("match").str.len_chars().cast(pl.Int64),
+            end="end",
+        )
+    )
+
+
+def _spans(values: pl.Series, pattern: re.Pattern, polars: str | None) -> pl.Series:
+    if polars is not None and can_match_empty(pattern):
+        # Python and Rust look for the next match from different places after
+        # an empty one, and Rust does not report some empty matches.
+        polars = None
+    # A row for each match, giving the index of the value it is in.
+    matches = None if polars is None else _polars_spans(values, polars)
+    if matches is None:
+        matches = _re_spans(values, pattern)
+    return (
+        pl.DataFrame(dict(index=pl.int_range(len(values), dtype=pl.UInt32, eager=True)))
+        .join(matches, on="index", how="left", maintain_order="left")
+        .group_by("index", maintain_order=True)
+        .agg(spans=pl.struct("start", "end").filter(pl.col("start").is_not_null()))
+        .get_column("spans")
+        .alias(values.name)
+    )
+
+
+def match_spans(
+    values: pl.Series, pattern: re.Pattern, polars: str | None = None
+) -> pl.Series:
+    """
+    Find the (character) offsets of every match of a Python regex in each
+    value of a String Series. If the regex can be matched by Polars (see
+    polars_pattern), that 'polars' pattern is used, unless its matches could
+    differ from Python's. If there are few distinct values, each is only
+    searched once.
+
+    Return a Series of lists of SPAN structs (with "start" and "end" fields),
+    which are empty for values that do not match. As with re.finditer, the
+    matches do not overlap, and may be empty.
+    """
+    if not len(values):
+        return pl.Series(values.name, [], dtype=pl.List(SPAN))
+    if low_cardinality(values):
+        unique = values.unique()
+        spans = _spans(unique, pattern, polars)
+        return values.replace_strict(unique, spans, return_dtype=pl.List(SPAN))
+    return _spans(values, pattern, polars)
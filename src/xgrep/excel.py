@@ -1,8 +1,12 @@
 import sys
 import polars as pl
-import xlsxwriter
-
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # xlsxwriter is only imported when a workbook is written.
+    import xlsxwriter
+    from xlsxwriter.worksheet import Worksheet
 
 
 def int_to_excel_column(column_num: int) -> str:
@@ -15,9 +19,46 @@ def int_to_excel_column(column_num: int) -> str:
     return "".join(reversed(column_chars))
 
 
+def excel_column_to_int(label: str) -> int:
+    """
+    Convert an Excel column label (e.g., 'A' or 'AB') to a (1-based) number.
+    """
+    if not (label.isascii() and label.isalpha()):
+        raise ValueError(f"Invalid Excel column label {label!r}.")
+    number = 0
+    for char in label.upper():
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def excel_column_numbers(spec: str) -> set[int]:
+    """
+    Get the (1-based) column numbers given by a comma-separated list of Excel
+    column labels and ranges (e.g., 'A,C:E').
+    """
+    numbers = set()
+    for part in spec.split(","):
+        start, _, end = part.strip().partition(":")
+        first = excel_column_to_int(start)
+        last = excel_column_to_int(end) if end else first
+        if last < first:
+            raise ValueError(f"Invalid Excel column range {part.strip()!r}.")
+        numbers.update(range(first, last + 1))
+    return numbers
+
+
 class ExcelWriter:
     """
     Manage an Excel workbook.
+
+    The workbook is only created when a sheet is first written to it, so if
+    nothing is written (and empty output is not to be saved), no file is made.
+
+    In 'constant_memory' mode, xlsxwriter writes each row to disk as soon as
+    the next one is started, so memory use does not grow with the size of the
+    output. Rows are then written one at a time, as plain cells (rather than
+    as a formatted Excel table, as pl.DataFrame.write_excel would), and the
+    batches of rows for a sheet are written as they arrive.
     """
 
     def __init__(
@@ -27,15 +68,36 @@ class ExcelWriter:
         sheet_separator: str,
         drop_filenames: bool,
         quiet: bool,
+        constant_memory: bool = False,
     ) -> None:
         self.path = path
         self.save_empty_output = save_empty_output
         self.sheet_separator = sheet_separator
         self.drop_filenames = drop_filenames
-        self.empty = True
-        self.workbook = xlsxwriter.Workbook(str(path), dict(strings_to_numbers=True))
         self.quiet = quiet
+        self.constant_memory = constant_memory
         self.sheet_names = {}
+        self._workbook: xlsxwriter.Workbook | None = None
+        # The name and DataFrames for the sheet that is being written. Writing
+        # is deferred so that batches of rows can be appended to a sheet.
+        self._pending: tuple[str | None, list[pl.DataFrame]] | None = None
+        # In constant memory mode, the name and column names of the sheet
+        # being written, its worksheet (once it has a row), and the index of
+        # the next row to write.
+        self._sheet: tuple[str | None, list[str]] | None = None
+        self._worksheet: Worksheet | None = None
+        self._row = 0
+
+    @property
+    def workbook(self) -> "xlsxwriter.Workbook":
+        if self._workbook is None:
+            import xlsxwriter
+
+            self._workbook = xlsxwriter.Workbook(
+                str(self.path),
+                dict(strings_to_numbers=True, constant_memory=self.constant_memory),
+            )
+        return self._workbook
 
     def new_sheet_name(self, name: str) -> str:
         """
@@ -61,45 +123,91 @@ class ExcelWriter:
 
         return candidate
 
-    def write(self, df: pl.DataFrame, name: str | None = None):
-        if len(df) or self.save_empty_output:
-            if name is not None:
-                try:
-                    filename, sheet_name = name.rsplit(self.sheet_separator, maxsplit=1)
-                except ValueError:
-                    filename, sheet_name = name, "Sheet"
+    def _sheet_name(self, name: str | None) -> str | None:
+        """
+        Get the name to give the sheet for the output for a file (or sheet).
+        """
+        if name is None:
+            return None
+
+        try:
+            filename, sheet_name = name.rsplit(self.sheet_separator, maxsplit=1)
+        except ValueError:
+            filename, sheet_name = name, "Sheet"
+
+        if self.drop_filenames:
+            name = sheet_name
 
-                if self.drop_filenames:
-                    name = sheet_name
+        name = self.new_sheet_name(name)
+        self.sheet_names[name] = filename
+        return name
 
-                name = self.new_sheet_name(name)
-                self.sheet_names[name] = filename
+    def write(self, df: pl.DataFrame, name: str | None = None, append: bool = False):
+        """
+        Write a DataFrame to a new sheet, or (if 'append' is true) add its rows
+        to the sheet written by the previous call.
+        """
+        if self.constant_memory:
+            if not (append and self._sheet is not None):
+                self._finish_sheet()
+                self._sheet = (name, df.columns)
+            self._write_rows(df)
+        elif append and self._pending is not None:
+            self._pending[1].append(df)
+        else:
+            self._write_pending()
+            self._pending = (name, [df])
+
+    def _write_pending(self) -> None:
+        if self._pending is None:
+            return
+
+        name, dfs = self._pending
+        self._pending = None
+        df = dfs[0] if len(dfs) == 1 else pl.concat(dfs, how="vertical_relaxed")
+
+        if len(df) or self.save_empty_output:
+            df.write_excel(self.workbook, worksheet=self._sheet_name(name))
 
-            df.write_excel(self.workbook, worksheet=name)
-            self.empty = False
+    def _write_rows(self, df: pl.DataFrame) -> None:
+        """
+        Write the rows of a DataFrame to the end of the current sheet (in
+        constant memory mode), first adding the sheet (and its header) if it
+        has not yet been added.
+        """
+        if self._worksheet is None:
+            if not len(df) and not self.save_empty_output:
+                return
+            assert self._sheet is not None
+            name, columns = self._sheet
+            self._worksheet = self.workbook.add_worksheet(self._sheet_name(name))
+            self._worksheet.write_row(0, 0, columns)
+            self._row = 1
+
+        for row in df.iter_rows():
+            self._worksheet.write_row(self._row, 0, row)
+            self._row += 1
+
+    def _finish_sheet(self) -> None:
+        self._sheet = self._worksheet = None
+        self._row = 0
 
     def close(self):
-        self.workbook.close()
-
-        if self.empty and not self.save_empty_output:
-            # If we have not written anything, the file will have an empty
-            # sheet. It doesn't have a zero size, so we need to read it to
-            # confirm. (BTW, simply skipping the call to 'close' does not
-            # prevent the file from being created if nothing was added to the
-            # output.)
-            try:
-                pl.read_excel(self.path)
-            except pl.exceptions.NoDataError:
-                # No output, as expected.
-                self.path.unlink()
-                if not self.quiet:
-                    print(
-                        "No matches were found, so nothing was written to "
-                        f"{str(self.path)!r}.",
-                        file=sys.stderr,
-                    )
-            else:
-                raise Exception(
-                    f"Expected output Excel file {str(self.path)!r} to be empty, but "
-                    "it is not. This is weird - please investigate!"
+        self._write_pending()
+        self._finish_sheet()
+
+        if self._workbook is not None:
+            self._workbook.close()
+        elif self.save_empty_output:
+            # An empty workbook (xlsxwriter adds an empty sheet).
+            self.workbook.close()
+        else:
+            # Remove any output left by an earlier run, so the output file
+            # does not exist (as though an empty workbook was removed).
+            self.path.unlink(missing_ok=True)
+            if not self.quiet:
+                print(
+                    "No matches were found, so nothing was written to "
+                    f"{str(self.path)!r}.",
+                    file=sys.stderr,
                 )
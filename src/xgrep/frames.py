@@ -0,0 +1,207 @@
+import sys
+import tempfile
+import polars as pl
+from pathlib import Path
+from typing import IO, Any, Iterable
+
+# The output formats written by a FrameWriter.
+FRAME_FORMATS = ("arrow", "ndjson", "parquet")
+
+
+class FrameWriter:
+    """
+    Write the output DataFrames for any number of files (and Excel sheets) to
+    a single Parquet, Arrow IPC, or NDJSON file, keeping the types of their
+    columns (e.g., the "Row" column is an integer column).
+
+    Each DataFrame is appended to the file as it arrives, so the output for a
+    large search is never all held in memory. NDJSON is written by Polars.
+    Parquet (a row group per DataFrame) and Arrow IPC (a record batch per
+    DataFrame) are written by pyarrow's streaming writers (pyarrow is in the
+    'arrow' extra).
+
+    The columns of a Parquet or Arrow file are those of all the DataFrames
+    written (in the order they are first seen), and are null in the rows of
+    DataFrames without them. A column with different types in different
+    DataFrames is given a type that can hold all its values (e.g., a String
+    column, for integers and strings). If a DataFrame adds a column, or
+    changes the type of one, it and the DataFrames after it go to a new part
+    file, and the parts are combined (a batch at a time) when the writer is
+    closed. So a row is written again at most once.
+
+    As with ExcelWriter, the file is only created when a DataFrame with rows
+    is written (unless empty output is to be saved).
+    """
+
+    def __init__(
+        self, path: Path, format_: str, save_empty_output: bool, quiet: bool
+    ) -> None:
+        assert format_ in FRAME_FORMATS
+        self.path = path
+        self.format_ = format_
+        self.save_empty_output = save_empty_output
+        self.quiet = quiet
+        self.rows = 0
+        self._schema: pl.Schema | None = None
+        # The pyarrow writer, or the NDJSON file.
+        self._writer: Any = None
+        self._file: IO[bytes] | None = None
+        # The files rows have been written to (the first is the output file),
+        # and the temporary directory holding the others.
+        self._parts: list[Path] = []
+        self._parts_dir: tempfile.TemporaryDirectory | None = None
+
+    def _union(self, df: pl.DataFrame) -> pl.Schema:
+        """
+        Get the columns (and types) of the rows written so far and of a
+        DataFrame.
+        """
+        if self._schema is None:
+            return df.schema
+        return pl.concat(
+            [pl.DataFrame(schema=self._schema), df.clear()], how="diagonal_relaxed"
+        ).schema
+
+    def _conform(self, df: pl.DataFrame) -> pl.DataFrame:
+        """
+        Give a DataFrame the columns (and types) of the file.
+        """
+        assert self._schema is not None
+        return df.select(
+            (
+                pl.col(column)
+                if column in df.columns
+                else pl.lit(None, dtype=dtype).alias(column)
+            )
+            for column, dtype in self._schema.items()
+        ).cast(self._schema)
+
+    def _open(self, path: Path) -> None:
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        schema = pl.DataFrame(schema=self._schema).to_arrow().schema
+        if self.format_ == "parquet":
+            self._writer = pyarrow.parquet.ParquetWriter(path, schema)
+        else:
+            self._file = open(path, "wb")
+            self._writer = pyarrow.ipc.new_file(self._file, schema)
+
+    def _open_part(self) -> None:
+        """
+        Start writing rows (with the columns of all those written so far) to
+        a new part file. The first part is the output file itself.
+        """
+        if not self._parts:
+            path = self.path
+        else:
+            if self._parts_dir is None:
+                self._parts_dir = tempfile.TemporaryDirectory(
+                    prefix=f".{self.path.name}.", dir=self.path.parent
+                )
+            path = Path(self._parts_dir.name) / f"{len(self._parts)}.{self.format_}"
+        self._parts.append(path)
+        self._open(path)
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _combine_parts(self) -> None:
+        """
+        Write the rows of all the part files to the output file, a batch at a
+        time, with the columns of all of them.
+        """
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        assert self._parts_dir is not None
+        first = Path(self._parts_dir.name) / f"0.{self.format_}"
+        self.path.replace(first)
+        self._parts[0] = first
+        self._open(self.path)
+
+        for part in self._parts:
+            if self.format_ == "parquet":
+                with pyarrow.parquet.ParquetFile(part) as parquet:
+                    self._write_batches(parquet.iter_batches())
+            else:
+                with pyarrow.memory_map(str(part)) as source:
+                    reader = pyarrow.ipc.open_file(source)
+                    self._write_batches(
+                        reader.get_batch(i) for i in range(reader.num_record_batches)
+                    )
+
+        self._close_writer()
+
+    def _write_batches(self, batches: Iterable[Any]) -> None:
+        for batch in batches:
+            df = pl.from_arrow(batch)
+            assert isinstance(df, pl.DataFrame)
+            self._writer.write_table(self._conform(df).to_arrow())
+
+    def write(self, df: pl.DataFrame, name: str | None = None, append: bool = False):
+        """
+        Add the rows of a DataFrame to the file. The 'name' of the file (or
+        sheet) the rows are from, and 'append' (for the interface of
+        ExcelWriter), are ignored, since all rows go to the same file.
+        """
+        if not len(df):
+            return
+
+        if self.format_ == "ndjson":
+            if self.rows == 0:
+                self._file = open(self.path, "wb")
+            assert self._file is not None
+            df.write_ndjson(self._file)
+            self.rows += len(df)
+            return
+
+        schema = self._union(df)
+        if schema != self._schema:
+            self._close_writer()
+            self._schema = schema
+            self._open_part()
+
+        self._writer.write_table(self._conform(df).to_arrow())
+        self.rows += len(df)
+
+    def _write_frames(self, df: pl.DataFrame) -> None:
+        """
+        Write a DataFrame with Polars.
+        """
+        if self.format_ == "parquet":
+            df.write_parquet(self.path)
+        elif self.format_ == "arrow":
+            df.write_ipc(self.path)
+        else:
+            df.write_ndjson(self.path)
+
+    def close(self) -> None:
+        self._close_writer()
+        if self._parts_dir is not None:
+            try:
+                self._combine_parts()
+            finally:
+                self._close_writer()
+                self._parts_dir.cleanup()
+                self._parts_dir = None
+
+        if self.rows == 0:
+            if self.save_empty_output:
+                self._write_frames(pl.DataFrame())
+            else:
+                # Remove any output left by an earlier run, as ExcelWriter
+                # does.
+                self.path.unlink(missing_ok=True)
+                if not self.quiet:
+                    print(
+                        "No matches were found, so nothing was written to "
+                        f"{str(self.path)!r}.",
+                        file=sys.stderr,
+                    )
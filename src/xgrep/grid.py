@@ -1,18 +1,465 @@
+import re
 import sys
+import bz2
+import gzip
+import lzma
 from pathlib import Path
+import fastexcel
 import polars as pl
 from io import BytesIO, StringIO
+from datetime import time
 from functools import partial
+from contextlib import nullcontext
 from dataclasses import dataclass
+from typing import Callable, Iterator, TextIO
+
+from xgrep.cache import CachedWorkbook, GridCache, MemoryCache, MemoryCachedWorkbook
+
+
+def open_zstd(path: Path, mode: str = "rt") -> TextIO:
+    """
+    Open a zstd-compressed file, using the standard library module if there is
+    one (in Python 3.14 and later) or otherwise the zstandard package.
+    """
+    try:
+        from compression import zstd  # type: ignore[import-not-found]
+    except ImportError:
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                f"Cannot read {str(path)!r}: reading zstd-compressed files needs "
+                "Python 3.14 or the zstandard package (pip install 'xgrep[zstd]')."
+            )
+        return zstandard.open(path, mode)
+    return zstd.open(path, mode)
+
+
+# The number of rows of an Excel sheet used to infer the types of its columns
+# (as in pl.read_excel).
+EXCEL_SCHEMA_SAMPLE_ROWS = 100
+
+# The names fastexcel gives to columns with an empty header cell (other than
+# the first, whose name is "").
+_UNNAMED_COLUMN = re.compile(r"(_duplicated_|__UNNAMED__)\d+$")
+
+# The functions to open (as text) CSV/TSV files compressed in different ways,
+# keyed by the suffix of the compressed files. Files are decompressed as they
+# are read, so a compressed file is never expanded in full on disk (and, when
+# reading in batches, not in memory either).
+COMPRESSIONS: dict[str, Callable[..., TextIO]] = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+    ".zst": open_zstd,
+}
+
+# The suffixes of the files that can be read.
+SUFFIXES = (
+    ".csv",
+    ".tsv",
+    ".xlsx",
+    *(
+        suffix + compression
+        for suffix in (".csv", ".tsv")
+        for compression in COMPRESSIONS
+    ),
+)
+
+
+def split_suffix(path: Path) -> tuple[str, str | None]:
+    """
+    Get the (lower case) suffix giving the format of a file, and the suffix
+    giving its compression (or None if it is not compressed). For example,
+    ('.csv', '.gz') for 'data.csv.gz'.
+    """
+    suffix = path.suffix.lower()
+    if suffix in COMPRESSIONS:
+        return Path(path.stem).suffix.lower(), suffix
+    return suffix, None
+
+
+def open_text(path: Path, compression: str | None = None) -> TextIO:
+    """
+    Open a (possibly compressed) CSV/TSV file for reading as text.
+    """
+    if compression is None:
+        return open(path)
+    return COMPRESSIONS[compression](path, "rt")
 
 
 @dataclass
 class Grid:
-    col_names: list[str]
-    rows: tuple[tuple[str, ...], ...]
+    """
+    The values read from an input file (or Excel sheet), held in the columns
+    of a Polars DataFrame. Values are only converted to Python objects if they
+    are asked for (e.g., using 'rows'), which xgrep itself never does.
+    """
+
+    df: pl.DataFrame
     filename: str
     header: bool
     skip: int
+    # The number of data rows that precede this grid, if it is a batch of
+    # rows read from a larger file.
+    offset: int = 0
+    # The name of the file the grid was read from. This differs from
+    # 'filename' for Excel sheets, whose filename includes the sheet name.
+    source: str | None = None
+    # The (0-based) indices of the grid's columns in the input, if only some
+    # of its columns were read.
+    col_indices: list[int] | None = None
+    # The indices of the grid columns to match, if not all of them.
+    match_cols: list[int] | None = None
+    # The name of the Excel sheet the grid was read from.
+    sheet: str | None = None
+
+    @property
+    def col_names(self) -> list[str]:
+        return self.df.columns
+
+    @property
+    def height(self) -> int:
+        """
+        Get the number of rows in the grid.
+        """
+        return self.df.height
+
+    @property
+    def first_row(self) -> int:
+        """
+        Get the (1-based) row number in the input of the grid's first row.
+        """
+        return 1 + self.skip + self.header + self.offset
+
+    @property
+    def rows(self) -> tuple[tuple, ...]:
+        """
+        Get all the rows of the grid, as tuples of Python values. Note that
+        this makes a Python object for every value in the grid.
+        """
+        return tuple(self.df.iter_rows())
+
+    def row(self, index: int) -> tuple:
+        """
+        Get one row of the grid, as a tuple of Python values.
+        """
+        return self.df.row(index)
+
+    def column(self, index: int) -> pl.Series:
+        """
+        Get one column of the grid (without copying it).
+        """
+        return self.df.to_series(index)
+
+    def col_index(self, index: int) -> int:
+        """
+        Get the index in the input of one of the grid's columns.
+        """
+        return index if self.col_indices is None else self.col_indices[index]
+
+
+@dataclass(frozen=True)
+class ColumnSelector:
+    """
+    A selection of the columns of input files: those with one of some names,
+    those whose names match any of some regexes, and those with one of some
+    (1-based) numbers (e.g., given as Excel column labels).
+    """
+
+    names: frozenset[str] = frozenset()
+    regexes: tuple[re.Pattern, ...] = ()
+    numbers: frozenset[int] = frozenset()
+
+    def indices(self, col_names: list[str]) -> list[int]:
+        """
+        Get the (0-based) indices of the selected columns, given the names of
+        all the columns.
+        """
+        return [
+            index
+            for index, name in enumerate(col_names)
+            if name in self.names
+            or index + 1 in self.numbers
+            or any(regex.search(name) for regex in self.regexes)
+        ]
+
+
+def _quoted_at_end(line: str, separator: str, quoted: bool) -> bool:
+    """
+    Is a CSV/TSV record still in a quoted value at the end of a line, given
+    whether it was at the start of the line? As in the Polars CSV reader, a
+    quote only starts a quoted value at the start of a field, and a doubled
+    quote in a quoted value is a literal quote.
+    """
+    if not quoted and '"' not in line:
+        return False
+
+    # The start of a field, or a position in a quoted value.
+    pos = 0
+    while True:
+        if quoted:
+            end = line.find('"', pos)
+            if end == -1:
+                return True
+            if line.startswith('"', end + 1):
+                pos = end + 2
+                continue
+            quoted = False
+            pos = end + 1
+        elif line.startswith('"', pos):
+            quoted = True
+            pos += 1
+            continue
+        separator_pos = line.find(separator, pos)
+        if separator_pos == -1:
+            return False
+        pos = separator_pos + 1
+
+
+def read_records(fp: TextIO, count: int, separator: str = ",") -> str:
+    """
+    Read (up to) 'count' complete CSV/TSV records from a file. A record may span
+    several lines if it has a quoted value containing a newline. A blank line
+    is a record (of empty values), as it is for the Polars CSV reader.
+    """
+    lines = []
+    quoted = False
+    while count:
+        line = fp.readline()
+        if not line:
+            break
+        lines.append(line)
+        quoted = _quoted_at_end(line, separator, quoted)
+        if not quoted:
+            count -= 1
+    return "".join(lines)
+
+
+def read_csv_batches(
+    fp: TextIO,
+    read_csv: Callable[..., pl.DataFrame],
+    header: bool,
+    skip: int,
+    batch_size: int,
+    columns: list[int] | None = None,
+    separator: str = ",",
+) -> Iterator[pl.DataFrame]:
+    """
+    Read a CSV/TSV file in batches of 'batch_size' rows, so that only one batch
+    is ever held in memory. If 'columns' is given, only the columns with those
+    indices are read. The batches hold the same rows as reading the whole
+    file would.
+    """
+    # The first batch is read with the same options as a whole file would be
+    # (skipping rows and reading the header), which establishes the schema
+    # for the remaining batches.
+    records = read_records(fp, skip + header + batch_size, separator)
+    df = read_csv(StringIO(records), columns=columns)
+    yield df
+
+    if columns is None:
+        schema = df.schema
+    else:
+        # All values are read as strings, so the number of columns in the
+        # file is enough for a schema of all of them.
+        width = read_csv(StringIO(records), n_rows=1).width
+        schema = pl.Schema({f"column_{i}": pl.String for i in range(width)})
+
+    while records := read_records(fp, batch_size, separator):
+        # Polars skips blank lines at the start of what it reads (but not
+        # after the first row, where they are rows of empty values), so the
+        # records are read after a row of an empty value, which is dropped.
+        batch = read_csv(
+            StringIO('""\n' + records),
+            has_header=False,
+            skip_rows=0,
+            schema=schema,
+            columns=columns,
+        ).slice(1)
+        batch.columns = df.columns
+        yield batch
+
+
+def excel_sheet_names(
+    available: list[str],
+    sheet_name: tuple[str, ...] | str | None = None,
+    sheet_id: tuple[int, ...] | int | None = None,
+) -> list[str]:
+    """
+    Get the names of the sheets to read from a workbook, given the names of all
+    its sheets. Sheets are selected as pl.read_excel would select them, and the
+    same ValueError is raised if a requested sheet does not exist.
+    """
+    if sheet_name is not None and sheet_id is not None:
+        raise ValueError("You cannot give both a sheet name and a sheet id.")
+
+    if sheet_name is None and sheet_id is None:
+        return available[:1]
+
+    if sheet_id == 0:
+        return list(available)
+
+    if sheet_name is not None:
+        names = (sheet_name,) if isinstance(sheet_name, str) else sheet_name
+        for name in names:
+            if name not in available:
+                raise ValueError(
+                    f"no matching sheet found when `sheet_name` is {name!r}"
+                )
+        return list(names)
+
+    assert sheet_id is not None
+    ids = (sheet_id,) if isinstance(sheet_id, int) else sheet_id
+    for id_ in ids:
+        if not 1 <= id_ <= len(available):
+            raise ValueError(f"no matching sheet found when `sheet_id` is {id_}")
+    return [available[id_ - 1] for id_ in ids]
+
+
+def read_csv_col_names(
+    fp: TextIO,
+    read_csv: Callable[..., pl.DataFrame],
+    skip: int,
+    separator: str = ",",
+) -> list[str]:
+    """
+    Get the column names of a CSV/TSV file, by reading only its first record
+    (after the 'skip' rows to be skipped). If the file is seekable, its
+    position is not changed.
+    """
+    start = fp.tell() if fp.seekable() else None
+    try:
+        return read_csv(
+            StringIO(read_records(fp, skip + 1, separator)), n_rows=1
+        ).columns
+    finally:
+        if start is not None:
+            fp.seek(start)
+
+
+def no_selected_columns(filename: str, quiet: bool) -> None:
+    if not quiet:
+        print(f"No selected columns found in {filename!r}.", file=sys.stderr)
+
+
+def read_excel_sheet(
+    workbook: fastexcel.ExcelReader, sheet_name: str, header: bool, skip: int
+) -> pl.DataFrame:
+    """
+    Read one sheet of an Excel workbook into a DataFrame, as pl.read_excel
+    would (with its default calamine engine), but without reading any of the
+    other sheets: unnamed empty columns and empty rows are dropped, float
+    columns holding only integers are made Int64 columns, and datetime
+    columns holding only midnights are made Date columns.
+    """
+    df = workbook.load_sheet_by_name(
+        sheet_name,
+        header_row=skip if header else None,
+        schema_sample_rows=EXCEL_SCHEMA_SAMPLE_ROWS,
+    ).to_polars()
+
+    if not header:
+        df.columns = [f"column_{i}" for i in range(1, df.width + 1)]
+
+    df = df.drop(
+        series.name
+        for series in df.iter_columns()
+        if (series.name == "" or _UNNAMED_COLUMN.match(series.name))
+        and (
+            series.null_count() == len(series)
+            or (
+                series.dtype.is_numeric()
+                and series.replace(0, None).null_count() == len(series)
+            )
+        )
+    )
+
+    if not df.width:
+        raise pl.exceptions.NoDataError("empty Excel sheet")
+
+    df = df.filter(~pl.all_horizontal(pl.all().is_null()))
+
+    if df.is_empty():
+        return df.cast({pl.Null: pl.String})
+
+    casts = {}
+    for name, dtype in df.schema.items():
+        col = pl.col(name)
+        if dtype.is_float():
+            casts[name] = (col.floor().eq_missing(col) & col.is_not_nan(), pl.Int64)
+        elif dtype == pl.Datetime:
+            casts[name] = (col.dt.time().eq(time(0, 0, 0)), pl.Date)
+
+    if casts:
+        checks = df.select(
+            check.all(ignore_nulls=True) for check, _ in casts.values()
+        ).row(0)
+        df = df.cast(
+            {name: dtype for (name, (_, dtype)), ok in zip(casts.items(), checks) if ok}
+        )
+
+    return df
+
+
+class Workbook:
+    """
+    An Excel workbook, which is only opened (and whose sheets are only read) if
+    what is needed cannot be found in a cache.
+    """
+
+    def __init__(
+        self,
+        source: Path | BytesIO,
+        cache: CachedWorkbook | MemoryCachedWorkbook | None = None,
+    ) -> None:
+        self.source = source
+        self.cache = cache
+        self._reader: fastexcel.ExcelReader | None = None
+
+    @property
+    def reader(self) -> fastexcel.ExcelReader:
+        if self._reader is None:
+            if isinstance(self.source, BytesIO):
+                self._reader = fastexcel.read_excel(self.source.getvalue())
+            else:
+                # Opened by path, so only the parts of the file that are
+                # needed are read. Opening it here first gives the usual
+                # errors (e.g., FileNotFoundError) if it cannot be read.
+                with open(self.source, "rb"):
+                    pass
+                self._reader = fastexcel.read_excel(str(self.source))
+        return self._reader
+
+    def sheet_names(self) -> list[str]:
+        """
+        Get the names of all the sheets in the workbook.
+        """
+        if self.cache is not None:
+            if (sheet_names := self.cache.sheet_names()) is not None:
+                return sheet_names
+
+        sheet_names = self.reader.sheet_names
+
+        if self.cache is not None:
+            self.cache.set_sheet_names(sheet_names)
+
+        return sheet_names
+
+    def sheet(self, sheet_name: str, header: bool, skip: int) -> pl.DataFrame:
+        """
+        Get a DataFrame holding the content of a sheet.
+        """
+        if self.cache is not None:
+            if (df := self.cache.sheet(sheet_name, header, skip)) is not None:
+                return df
+
+        df = read_excel_sheet(self.reader, sheet_name, header, skip)
+
+        if self.cache is not None:
+            self.cache.set_sheet(sheet_name, header, skip, df)
+
+        return df
 
 
 def grid_reader(
@@ -26,10 +473,29 @@ def grid_reader(
     ignore_missing_sheets: bool = False,
     quiet: bool = False,
     filename: str | None = None,
+    batch_size: int | None = None,
+    cache: GridCache | MemoryCache | None = None,
+    columns: ColumnSelector | None = None,
+    all_cols: bool = False,
 ):
     """
     Read a grid (or several, in the case of Excel sheets) from a source and yield
     Grid instances.
+
+    If 'columns' is given, only the selected columns are matched. Unless
+    'all_cols' is true, they are also the only columns read (for CSV/TSV
+    files, the other columns are not even parsed). A grid with no selected
+    columns is skipped.
+
+    If 'batch_size' is given, CSV/TSV input is read and yielded in batches of
+    (at most) that many rows, each as a Grid whose 'offset' is the number of
+    data rows in the batches before it.
+
+    If a 'cache' is given, the sheets of Excel files (given as a Path) are
+    taken from it when possible, and are added to it when not.
+
+    CSV/TSV files (given as a Path) may be compressed (see COMPRESSIONS), in
+    which case they are decompressed as they are read.
     """
     if isinstance(source, Path):
         if filename is not None:
@@ -43,23 +509,21 @@ def grid_reader(
 
     output_filename = str(path.name if basename else path)
 
-    match suffix := path.suffix.lower():
-        case ".xlsx":
-            options: dict[str, int | dict[str, int]] = dict(has_header=header)
-            if header:
-                options["read_options"] = dict(header_row=skip)
+    suffix, compression = split_suffix(path)
+
+    match suffix, compression:
+        case ".xlsx", None:
+            if filename:
+                assert isinstance(source, BytesIO)
+                workbook = Workbook(source)
+            else:
+                assert isinstance(source, Path)
+                workbook = Workbook(
+                    source, None if cache is None else cache.workbook(source)
+                )
 
-            read_excel = partial(
-                pl.read_excel, sheet_name=sheet_name, sheet_id=sheet_id, **options
-            )
             try:
-                if filename:
-                    assert isinstance(source, BytesIO)
-                    worksheet = read_excel(source)
-                else:
-                    assert isinstance(source, Path)
-                    with open(source, "rb") as fp:
-                        worksheet = read_excel(fp)
+                names = excel_sheet_names(workbook.sheet_names(), sheet_name, sheet_id)
             except ValueError as e:
                 if "no matching sheet found" in str(e) and ignore_missing_sheets:
                     if not quiet:
@@ -69,46 +533,119 @@ def grid_reader(
                             f"{', '.join(sheet_name)} not found in {str(path)!r}.",
                             file=sys.stderr,
                         )
-                else:
-                    raise
-            else:
-                if isinstance(worksheet, pl.DataFrame):
-                    worksheets = {None: worksheet}
-                else:
-                    assert isinstance(worksheet, dict)
-                    worksheets = worksheet
-
-                for this_sheet_name, worksheet in worksheets.items():
-                    name = (
-                        output_filename
-                        if this_sheet_name is None
-                        else f"{output_filename}{sheet_separator}{this_sheet_name}"
-                    )
-                    col_names = worksheet.columns
-                    rows = tuple(tuple(row) for row in worksheet.iter_rows())
-                    yield Grid(col_names, rows, name, header, skip)
+                    return
+                raise
+
+            # Only a single sheet (given by a scalar name or id) is named by
+            # its filename alone.
+            single = isinstance(sheet_name, str) or (
+                isinstance(sheet_id, int) and sheet_id != 0
+            )
 
-        case ".csv" | ".tsv":
+            # Each sheet is read only when it is needed, so a caller that
+            # stops early does not read later sheets, and only one sheet need
+            # be held in memory at a time.
+            for this_sheet_name in names:
+                worksheet = workbook.sheet(this_sheet_name, header, skip)
+                name = (
+                    output_filename
+                    if single
+                    else f"{output_filename}{sheet_separator}{this_sheet_name}"
+                )
+
+                col_indices = match_cols = None
+                if columns is not None:
+                    indices = columns.indices(worksheet.columns)
+                    if not indices:
+                        no_selected_columns(name, quiet)
+                        continue
+                    if all_cols:
+                        match_cols = indices
+                    else:
+                        # The other columns are dropped as soon as the sheet
+                        # is read. (They could be left unread by passing the
+                        # indices to fastexcel, but that would change which
+                        # empty rows are dropped, and so the row numbers, and
+                        # calamine parses every cell of a sheet anyway.)
+                        worksheet = worksheet[:, indices]
+                        col_indices = indices
+
+                yield Grid(
+                    worksheet,
+                    name,
+                    header,
+                    skip,
+                    source=output_filename,
+                    col_indices=col_indices,
+                    match_cols=match_cols,
+                    sheet=this_sheet_name,
+                )
+
+        case ".csv" | ".tsv", _:
+            separator = "," if suffix == ".csv" else "\t"
             read_csv = partial(
                 pl.read_csv,
                 missing_utf8_is_empty_string=True,
-                separator="," if suffix == ".csv" else "\t",
+                separator=separator,
                 has_header=header,
                 skip_rows=skip,
                 infer_schema=False,
             )
             if filename:
                 assert isinstance(source, StringIO)
-                rows = read_csv(source)
+                context = nullcontext(source)
             else:
                 assert isinstance(source, Path)
-                with open(source) as fp:
-                    rows = read_csv(fp)
+                context = open_text(source, compression)
 
-            col_names = rows.columns
-            rows = tuple(tuple(row) for row in rows.iter_rows())
+            with context as fp:
+                col_indices = match_cols = None
+                if columns is not None:
+                    if fp.seekable():
+                        col_names = read_csv_col_names(fp, read_csv, skip, separator)
+                    else:
+                        # E.g., a zstd stream, which cannot seek back to its
+                        # start, so the first record is read from a second
+                        # stream.
+                        assert isinstance(source, Path)
+                        with open_text(source, compression) as head:
+                            col_names = read_csv_col_names(
+                                head, read_csv, skip, separator
+                            )
+                    indices = columns.indices(col_names)
+                    if not indices:
+                        no_selected_columns(output_filename, quiet)
+                        return
+                    if all_cols:
+                        match_cols = indices
+                    else:
+                        col_indices = indices
 
-            yield Grid(col_names, rows, output_filename, header, skip)
+                if batch_size is None:
+                    if compression is not None:
+                        # Polars would read a compressed file's underlying
+                        # (compressed) bytes, so it is given the text. Use
+                        # batch_size to avoid holding it all in memory.
+                        fp = StringIO(fp.read())
+                    batches = [read_csv(fp, columns=col_indices)]
+                else:
+                    batches = read_csv_batches(
+                        fp, read_csv, header, skip, batch_size, col_indices, separator
+                    )
+
+                offset = 0
+                for df in batches:
+                    yield Grid(
+                        df,
+                        output_filename,
+                        header,
+                        skip,
+                        offset,
+                        output_filename,
+                        col_indices,
+                        match_cols,
+                    )
+                    offset += len(df)
 
         case _:
-            raise ValueError(f"Unknown file suffix: {suffix!r}")
+            raise ValueError(f"Unknown file suffix: {suffix + (compression or '')!r}")
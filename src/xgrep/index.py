@@ -0,0 +1,600 @@
+import json
+import re
+import sqlite3
+import polars as pl
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+except ImportError:
+    # Python < 3.11.
+    import sre_parse  # type: ignore[no-redef]
+
+from xgrep.engine import stringify
+from xgrep.grid import excel_sheet_names, grid_reader
+
+# A query is True (every unit of the index is a candidate), a trigram (the
+# units containing it are candidates), or a tuple of "and" or "or" followed by
+# two or more sub-queries.
+Query = bool | str | tuple
+
+# The ASCII letters, and the only non-ASCII characters that Python's re module
+# considers to be equal to an ASCII character when ignoring case (U+0130 and
+# U+0131 are equal to 'i', U+017F to 's', and U+212A to 'k'). Text is indexed
+# after mapping all of these to lower case ASCII, so that the index can be used
+# whether or not case is ignored.
+_FOLD = str.maketrans(
+    {
+        **{chr(c): chr(c + 32) for c in range(ord("A"), ord("Z") + 1)},
+        "İ": "i",
+        "ı": "i",
+        "ſ": "s",
+        "K": "k",
+    }
+)
+
+# The maximum number of strings in an _Info 'exact' set, and in its 'prefix'
+# and 'suffix' sets. Larger sets are summarized as trigram queries.
+_MAX_EXACT = 16
+_MAX_SET = 32
+
+# The number of rows of CSV/TSV files to read at once when indexing.
+_BATCH_SIZE = 100_000
+
+# The largest character range (in a character class) that is expanded into the
+# characters it contains.
+_MAX_RANGE = 10
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    size INTEGER,
+    mtime INTEGER,
+    -- A JSON list of the names of all the sheets in an Excel file.
+    sheets TEXT
+);
+CREATE TABLE units (id INTEGER PRIMARY KEY, file INTEGER, sheet TEXT, col INTEGER);
+CREATE INDEX units_file ON units (file);
+CREATE TABLE postings (
+    trigram TEXT, unit INTEGER, PRIMARY KEY (trigram, unit)
+) WITHOUT ROWID;
+CREATE INDEX postings_unit ON postings (unit);
+"""
+
+
+def fold(text: str) -> str:
+    """
+    Fold the case of text so it can be indexed (see _FOLD).
+    """
+    return text.translate(_FOLD)
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Get the trigrams in (case-folded) text.
+    """
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def series_trigrams(series: pl.Series) -> set[str]:
+    """
+    Get the trigrams in the text that is matched for the values in a Series
+    (see xgrep.engine.stringify).
+    """
+    result: set[str] = set()
+    for value in stringify(series).unique().to_list():
+        result.update(trigrams(fold(value)))
+    return result
+
+
+def _and(a: Query, b: Query) -> Query:
+    if a is True:
+        return b
+    if b is True or a == b:
+        return a
+    return ("and", a, b)
+
+
+def _or(a: Query, b: Query) -> Query:
+    if a is True or b is True:
+        return True
+    if a == b:
+        return a
+    return ("or", a, b)
+
+
+def _strings_query(strings: Iterable[str]) -> Query:
+    """
+    Get a query for text that contains (at least) one of some strings.
+    """
+    result: Query | None = None
+    # Sorted, so that queries do not depend on set iteration order.
+    for string in sorted(strings):
+        if len(string) < 3:
+            # A string with no trigrams could be anywhere.
+            return True
+        query: Query = True
+        for trigram in sorted(trigrams(string)):
+            query = _and(query, trigram)
+        result = query if result is None else _or(result, query)
+    # No strings means nothing can match, but that is not worth representing.
+    return True if result is None else result
+
+
+@dataclass
+class _Info:
+    """
+    What is known about the strings matched by (part of) a regex, following
+    Russ Cox's "Regular Expression Matching with a Trigram Index". Every string
+    matched is in 'exact' (if it is not None), starts with a string in 'prefix'
+    and ends with a string in 'suffix' (if 'exact' is None), and contains the
+    trigrams required by 'match'.
+    """
+
+    emptyable: bool
+    exact: set[str] | None
+    prefix: set[str]
+    suffix: set[str]
+    match: Query
+
+    def starts(self) -> set[str]:
+        return self.prefix if self.exact is None else self.exact
+
+    def ends(self) -> set[str]:
+        return self.suffix if self.exact is None else self.exact
+
+    def query(self) -> Query:
+        """
+        Get the query for text that contains a match.
+        """
+        if self.exact is None:
+            return self.match
+        return _and(self.match, _strings_query(self.exact))
+
+    def inexact(self) -> "_Info":
+        """
+        Move the 'exact' strings into the query and the prefix and suffix sets.
+        """
+        if self.exact is None:
+            return self
+        return _Info(
+            self.emptyable, None, set(self.exact), set(self.exact), self.query()
+        )
+
+    def simplify(self) -> "_Info":
+        """
+        Keep the sets small, moving what they tell us into the query.
+        """
+        info = self
+        if info.exact is not None and len(info.exact) > _MAX_EXACT:
+            info = info.inexact()
+
+        if info.exact is None:
+            match = info.match
+            prefix, suffix = info.prefix, info.suffix
+            if any(len(string) > 2 for string in prefix):
+                # Every match contains one of the prefixes, and starts with
+                # the first two characters of one of them.
+                match = _and(match, _strings_query(prefix))
+                prefix = {string[:2] for string in prefix}
+            if any(len(string) > 2 for string in suffix):
+                match = _and(match, _strings_query(suffix))
+                suffix = {string[-2:] for string in suffix}
+            if len(prefix) > _MAX_SET:
+                prefix = {""}
+            if len(suffix) > _MAX_SET:
+                suffix = {""}
+            info = _Info(info.emptyable, None, prefix, suffix, match)
+
+        return info
+
+
+def _empty() -> _Info:
+    return _Info(True, {""}, {""}, {""}, True)
+
+
+def _any_char() -> _Info:
+    return _Info(False, None, {""}, {""}, True)
+
+
+def _any_string() -> _Info:
+    return _Info(True, None, {""}, {""}, True)
+
+
+def _chars(chars: set[str]) -> _Info:
+    return _Info(False, chars, set(), set(), True)
+
+
+def _concat(x: _Info, y: _Info) -> _Info:
+    if x.exact is not None and y.exact is not None:
+        if len(x.exact) * len(y.exact) > _MAX_EXACT:
+            x = x.inexact()
+        else:
+            return _Info(
+                x.emptyable and y.emptyable,
+                {a + b for a in x.exact for b in y.exact},
+                set(),
+                set(),
+                _and(x.match, y.match),
+            ).simplify()
+
+    if x.exact is not None:
+        prefix = {a + b for a in x.exact for b in y.prefix}
+    else:
+        prefix = x.prefix | y.starts() if x.emptyable else x.prefix
+
+    if y.exact is not None:
+        suffix = {a + b for a in x.suffix for b in y.exact}
+    else:
+        suffix = y.suffix | x.ends() if y.emptyable else y.suffix
+
+    # Matches contain a string made from the end of an x match and the start
+    # of a y match.
+    match = _and(_and(x.match, y.match), _strings_query(_cross(x.ends(), y.starts())))
+
+    if x.exact is not None:
+        match = _and(match, _strings_query(x.exact))
+    if y.exact is not None:
+        match = _and(match, _strings_query(y.exact))
+
+    return _Info(x.emptyable and y.emptyable, None, prefix, suffix, match).simplify()
+
+
+def _cross(a: set[str], b: set[str]) -> set[str]:
+    if len(a) * len(b) > _MAX_SET:
+        return {""}
+    return {x + y for x in a for y in b}
+
+
+def _alternate(x: _Info, y: _Info) -> _Info:
+    if x.exact is not None and y.exact is not None:
+        return _Info(
+            x.emptyable or y.emptyable,
+            x.exact | y.exact,
+            set(),
+            set(),
+            _or(x.match, y.match),
+        ).simplify()
+
+    x, y = x.inexact(), y.inexact()
+    return _Info(
+        x.emptyable or y.emptyable,
+        None,
+        x.prefix | y.prefix,
+        x.suffix | y.suffix,
+        _or(x.match, y.match),
+    ).simplify()
+
+
+def _plus(x: _Info) -> _Info:
+    """
+    Get the info for one or more repetitions of x.
+    """
+    x = x.inexact()
+    return _Info(x.emptyable, None, x.prefix, x.suffix, x.match)
+
+
+def _literal(char: str, ignore_case: bool) -> _Info:
+    if ignore_case and not char.isascii():
+        # We do not know which other characters this is equal to.
+        return _any_char()
+    return _chars({fold(char)})
+
+
+def _class(items: list, ignore_case: bool) -> _Info:
+    """
+    Get the info for a character class.
+    """
+    chars = set()
+    for op, value in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(value))
+        elif op is sre_parse.RANGE and value[1] - value[0] < _MAX_RANGE:
+            chars.update(chr(c) for c in range(value[0], value[1] + 1))
+        else:
+            # A negated class, a category (e.g., \d), or a large range.
+            return _any_char()
+
+    if ignore_case and not all(char.isascii() for char in chars):
+        return _any_char()
+
+    return _chars({fold(char) for char in chars}).simplify()
+
+
+def _combine(combine: Callable[[_Info, _Info], _Info], infos: list[_Info]) -> _Info:
+    """
+    Combine infos in pairs, as a balanced tree. The depth of the resulting
+    query then only grows logarithmically with the number of infos (e.g., for
+    an alternation of thousands of strings).
+    """
+    while len(infos) > 1:
+        infos = [
+            combine(*infos[i : i + 2]) if i + 1 < len(infos) else infos[i]
+            for i in range(0, len(infos), 2)
+        ]
+    return infos[0]
+
+
+def _analyze(pattern: Any, flags: int) -> _Info:
+    """
+    Get the info for a parsed regex (a sequence of (op, value) pairs).
+    """
+    if not len(pattern):
+        return _empty()
+    return _combine(_concat, [_analyze_op(op, value, flags) for op, value in pattern])
+
+
+def _analyze_op(op: Any, value: Any, flags: int) -> _Info:
+    ignore_case = bool(flags & re.IGNORECASE)
+
+    if op is sre_parse.LITERAL:
+        return _literal(chr(value), ignore_case)
+
+    if op is sre_parse.IN:
+        return _class(value, ignore_case)
+
+    if op in (sre_parse.ANY, sre_parse.NOT_LITERAL):
+        return _any_char()
+
+    if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        # Anchors and lookaround assertions match the empty string.
+        return _empty()
+
+    if op is sre_parse.BRANCH:
+        return _combine(_alternate, [_analyze(branch, flags) for branch in value[1]])
+
+    if op is sre_parse.SUBPATTERN:
+        _, add_flags, del_flags, subpattern = value
+        return _analyze(subpattern, (flags | add_flags) & ~del_flags)
+
+    if op is getattr(sre_parse, "ATOMIC_GROUP", None):
+        return _analyze(value, flags)
+
+    if op in (
+        sre_parse.MAX_REPEAT,
+        sre_parse.MIN_REPEAT,
+        getattr(sre_parse, "POSSESSIVE_REPEAT", None),
+    ):
+        min_, max_, subpattern = value
+        info = _analyze(subpattern, flags)
+        if min_ == 0:
+            if max_ == 1:
+                return _alternate(info, _empty())
+            return _any_string()
+        return _plus(info)
+
+    # Anything else (e.g., a backreference) could match any string.
+    return _any_string()
+
+
+def regex_query(regex: re.Pattern) -> Query:
+    """
+    Get the trigram query that (case-folded) text must satisfy if it contains
+    a match for a regex. A result of True means the index cannot help.
+    """
+    if not isinstance(regex.pattern, str):
+        return True
+    parsed = sre_parse.parse(regex.pattern, regex.flags)
+    return _analyze(parsed, parsed.state.flags).query()
+
+
+class TrigramIndex:
+    """
+    An on-disk (SQLite) index recording which trigrams are in the values of
+    each column (a 'unit') of each sheet of a set of files.
+    """
+
+    def __init__(self, path: Path, create: bool = False) -> None:
+        self.path = path
+        if create:
+            path.unlink(missing_ok=True)
+        elif not path.exists():
+            raise FileNotFoundError(f"No index found at {str(path)!r}.")
+        self.db = sqlite3.connect(path)
+        if create:
+            self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _meta(self, key: str) -> Any:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    @property
+    def options(self) -> dict[str, Any]:
+        """
+        The options used to read files when they were indexed.
+        """
+        return self._meta("options")
+
+    @options.setter
+    def options(self, options: dict[str, Any]) -> None:
+        with self.db:
+            self._set_meta("options", options)
+
+    def _file(self, path: Path) -> tuple[int, int, int, str | None] | None:
+        return self.db.execute(
+            "SELECT id, size, mtime, sheets FROM files WHERE path = ?",
+            (str(path.resolve()),),
+        ).fetchone()
+
+    def _remove(self, file_id: int) -> None:
+        self.db.execute(
+            "DELETE FROM postings WHERE unit IN (SELECT id FROM units WHERE file = ?)",
+            (file_id,),
+        )
+        self.db.execute("DELETE FROM units WHERE file = ?", (file_id,))
+        self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def up_to_date(self, path: Path) -> bool:
+        """
+        Is a file in the index, unchanged since it was indexed?
+        """
+        row = self._file(path)
+        if row is None:
+            return False
+        stat = path.stat()
+        return (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns)
+
+    def add(self, path: Path) -> None:
+        """
+        Index a file, replacing anything previously indexed for it.
+        """
+        stat = path.stat()
+        options = self.options
+        excel = path.suffix.lower() == ".xlsx"
+        # The trigrams in each (sheet, column) of the file.
+        units: dict[tuple[str | None, int], set[str]] = {}
+        sheets = []
+
+        # Large CSV/TSV files are read in batches, to limit memory use.
+        for grid in grid_reader(
+            path,
+            header=options["header"],
+            skip=options["skip"],
+            sheet_id=0,
+            sheet_separator="",
+            batch_size=_BATCH_SIZE,
+        ):
+            sheet = None
+            if excel:
+                # The grid filename is the file name followed by the sheet
+                # name (since there is no separator).
+                sheet = grid.filename[len(grid.source or "") :]
+                sheets.append(sheet)
+            for col, series in enumerate(grid.df.iter_columns()):
+                units.setdefault((sheet, col), set()).update(series_trigrams(series))
+
+        with self.db:
+            if (row := self._file(path)) is not None:
+                self._remove(row[0])
+
+            file_id = self.db.execute(
+                "INSERT INTO files (path, size, mtime, sheets) VALUES (?, ?, ?, ?)",
+                (
+                    str(path.resolve()),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    json.dumps(sheets) if excel else None,
+                ),
+            ).lastrowid
+
+            for (sheet, col), unit_trigrams in units.items():
+                unit = self.db.execute(
+                    "INSERT INTO units (file, sheet, col) VALUES (?, ?, ?)",
+                    (file_id, sheet, col),
+                ).lastrowid
+                self.db.executemany(
+                    "INSERT INTO postings VALUES (?, ?)",
+                    ((trigram, unit) for trigram in unit_trigrams),
+                )
+
+    def remove(self, path: Path) -> bool:
+        """
+        Remove a file from the index. Return True if it was indexed.
+        """
+        if (row := self._file(path)) is None:
+            return False
+        with self.db:
+            self._remove(row[0])
+        return True
+
+    def paths(self) -> list[Path]:
+        """
+        Get the paths of all indexed files.
+        """
+        return [Path(path) for (path,) in self.db.execute("SELECT path FROM files")]
+
+    def _units(self, query: Query, cache: dict[str, set[int]]) -> set[int]:
+        """
+        Get the ids of the units that satisfy a query (which must not be True).
+        """
+        if isinstance(query, str):
+            if query not in cache:
+                cache[query] = {
+                    unit
+                    for (unit,) in self.db.execute(
+                        "SELECT unit FROM postings WHERE trigram = ?", (query,)
+                    )
+                }
+            return cache[query]
+
+        op, *queries = query
+        results = [self._units(q, cache) for q in queries if q is not True]
+        if op == "and":
+            return set.intersection(*results)
+        assert op == "or"
+        return set.union(*results)
+
+    def filter(
+        self,
+        paths: Iterable[Path],
+        regex: re.Pattern,
+        reader_options: dict[str, Any],
+    ) -> Iterator[tuple[Path, dict[str, Any]]]:
+        """
+        Yield the (path, reader options) of each file that could contain a match
+        for a regex. For Excel files, the sheets are limited to those that could
+        contain a match. Files that are not in the index (or that have changed
+        since they were indexed) are always yielded.
+        """
+        query = regex_query(regex)
+        options = self.options
+
+        if query is True or any(
+            reader_options[key] != value for key, value in options.items()
+        ):
+            for path in paths:
+                yield path, reader_options
+            return
+
+        units = self._units(query, {})
+
+        for path in paths:
+            if not self.up_to_date(path):
+                yield path, reader_options
+                continue
+
+            file_id, _, _, sheets = self._file(path)
+            matching = {
+                sheet
+                for unit, sheet in self.db.execute(
+                    "SELECT id, sheet FROM units WHERE file = ?", (file_id,)
+                )
+                if unit in units
+            }
+
+            if sheets is None:
+                # A CSV or TSV file.
+                if matching:
+                    yield path, reader_options
+                continue
+
+            try:
+                names = excel_sheet_names(
+                    json.loads(sheets),
+                    reader_options["sheet_name"],
+                    reader_options["sheet_id"],
+                )
+            except ValueError:
+                # A missing sheet, which will be reported (or not) when the
+                # file is read.
+                yield path, reader_options
+                continue
+
+            if all(name in matching for name in names):
+                yield path, reader_options
+            elif names := [name for name in names if name in matching]:
+                yield path, reader_options | dict(
+                    sheet_name=tuple(names), sheet_id=None
+                )
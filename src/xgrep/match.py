@@ -1,58 +1,409 @@
 import re
 import polars as pl
 import polars.selectors as cs
-from collections import defaultdict
-from rich.table import Table
-from io import StringIO
+from dataclasses import replace
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
 
-from xgrep.cell import Cell
+from xgrep.engine import (
+    SPAN,
+    any_match,
+    literal_set,
+    match_mask,
+    match_spans,
+    polars_pattern,
+    re_contains,
+    stringify,
+)
 from xgrep.excel import int_to_excel_column, ExcelWriter
-from xgrep.row import Row
-from xgrep.col import Col
+from xgrep.frames import FRAME_FORMATS, FrameWriter
 from xgrep.grid import Grid
 
+if TYPE_CHECKING:
+    # rich is only imported to make a table (see rich_table).
+    from rich.table import Table
+
+# The number of matching rows formatted at a time for CSV/TSV output.
+OUTPUT_BATCH_SIZE = 10_000
+
+# The number of rows first matched at a time, when only the first few
+# matching rows are wanted (see Match).
+MATCH_BLOCK_SIZE = 10_000
+
+
+# Keeps the non-empty matches in a list of spans.
+_nonempty = pl.element().filter(
+    pl.element().struct.field("end") > pl.element().struct.field("start")
+)
+
+
+def highlight(values: pl.Series, spans: pl.Series, color: str) -> pl.Series:
+    """
+    Mark up the matches (given by match_spans) in some values, so rich shows
+    them in a color. Empty matches are not marked up.
+    """
+    value, start, end = pl.col("value"), pl.col("start"), pl.col("end")
+    # The end of the previous match in the same value (or its start).
+    previous = end.shift(1).over("index").fill_null(0)
+    marked = pl.concat_str(
+        value.str.slice(previous, start - previous),
+        pl.lit(f"[{color}]"),
+        value.str.slice(start, end - start),
+        pl.lit(f"[/{color}]"),
+    )
+    return (
+        pl.DataFrame(dict(value=values, spans=spans.list.eval(_nonempty)))
+        .with_row_index("index")
+        # A row for each match (or for each value with no matches, which has
+        # a null start and end).
+        .explode("spans")
+        .unnest("spans")
+        .with_columns(marked=marked.fill_null(""))
+        .group_by("index", maintain_order=True)
+        .agg("marked", value.first(), end.last().fill_null(0).alias("tail"))
+        .select(
+            pl.concat_str(
+                pl.col("marked").list.join(""), value.str.slice(pl.col("tail"))
+            )
+        )
+        .to_series()
+    )
+
+
+def grid_matches(
+    grid: Grid, pattern: str | re.Pattern, vectorize: bool = True, invert: bool = False
+) -> bool:
+    """
+    Does any cell in a grid match a pattern (or, with 'invert', does any row
+    have no matching cell)? This gives the same result as
+    bool(Match(grid, pattern, invert).count()), but stops as soon as the
+    answer is known.
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+
+    if invert:
+        # Rows are matched in blocks, until one with no matching cell is found.
+        return bool(Match(grid, pattern, True, vectorize, max_count=1).count())
+
+    if vectorize:
+        polars_match = literal_set(pattern) or polars_pattern(pattern)
+        if polars_match is not None:
+            df = grid.df if grid.match_cols is None else grid.df[:, grid.match_cols]
+            return any_match(df, polars_match)
+
+    match_cols = (
+        range(len(grid.col_names)) if grid.match_cols is None else grid.match_cols
+    )
+
+    # One column at a time is converted to Python strings.
+    return any(
+        pattern.search(value)
+        for col_index in match_cols
+        for value in stringify(grid.column(col_index))
+    )
+
 
 class Match:
     """
     Match a pattern and provide ways to format the result.
+
+    The result of matching is held in a Boolean mask with a column for each
+    grid column, from which vectors summarizing the rows and columns are
+    computed once.
+
+    If 'max_count' is given, only the first 'max_count' rows selected for
+    output are kept (as for grep -m): the grid is cut short after the last of
+    them, and the rows after it are not matched at all.
     """
 
-    def __init__(self, grid: "Grid", pattern: str | re.Pattern, invert: bool = False):
+    def __init__(
+        self,
+        grid: "Grid",
+        pattern: str | re.Pattern,
+        invert: bool = False,
+        vectorize: bool = True,
+        max_count: int | None = None,
+    ):
         self._grid = grid
-        self._matched = False
         if isinstance(pattern, str):
             pattern = re.compile(pattern)
-        self.rows = []
-        self.cols = []
-
-        for row_index, row_data in enumerate(self._grid.rows):
-            row = Row(row_index, invert)
-            self.rows.append(row)
-            for col_index, value in enumerate(row_data):
-                try:
-                    col = self.cols[col_index]
-                except IndexError:
-                    col = Col(col_index, invert)
-                    self.cols.append(col)
-                cell = Cell(value, pattern)
-                row.append(cell)
-                col.append(cell)
-                if cell.matched:
-                    self._matched = True
+        self._pattern = pattern
+        self._invert = invert
+        self._df_cols = {}
+
+        # Match whole columns at once using Polars, if its regex engine can
+        # handle the pattern. Otherwise fall back to Python's re module. A
+        # pattern that is just a set of literal strings is matched with an
+        # Aho-Corasick automaton instead (the regex is then only used to find
+        # the offsets of matches, for highlighting).
+        if vectorize:
+            self._polars_pattern = polars_pattern(pattern)
+            self._literals = literal_set(pattern)
+        else:
+            self._polars_pattern = self._literals = None
+
+        if max_count is None or not grid.df.width:
+            self._mask = self._match_mask(grid)
+        else:
+            # Match blocks of rows (each twice the size of the last), stopping
+            # as soon as 'max_count' rows are selected. The rows after the
+            # last of those are dropped from the grid, as if never read.
+            masks = []
+            selected = start = 0
+            size = MATCH_BLOCK_SIZE
+            while True:
+                mask = self._match_mask(replace(grid, df=grid.df.slice(start, size)))
+                rows = mask.select(pl.any_horizontal(pl.all())).to_series()
+                if invert:
+                    rows = ~rows
+                needed = max_count - selected
+                if rows.sum() >= needed:
+                    end = rows.arg_true()[needed - 1] + 1 if needed else 0
+                    masks.append(mask.head(end))
+                    grid = self._grid = replace(grid, df=grid.df.head(start + end))
+                    break
+                masks.append(mask)
+                selected += rows.sum()
+                start += size
+                size *= 2
+                if start >= grid.height:
+                    break
+            self._mask = pl.concat(masks)
+
+        if self._mask.width:
+            hits = self._mask.select(pl.any_horizontal(pl.all())).to_series()
+        else:
+            hits = pl.Series(dtype=pl.Boolean)
+
+        self._matched = bool(hits.any())
+        self._row_matched = ~hits if invert else hits
+        self._col_matched = [
+            bool(col.any()) != invert for col in self._mask.iter_columns()
+        ]
+
+    def _match_mask(self, grid: Grid) -> pl.DataFrame:
+        """
+        Match the cells of a grid, giving a Boolean mask with a column for
+        each grid column.
+        """
+        pattern = self._pattern
+
+        # Only some columns may need to be matched.
+        match_cols = (
+            range(len(grid.col_names)) if grid.match_cols is None else grid.match_cols
+        )
+
+        if self._literals is not None or self._polars_pattern is not None:
+            df = grid.df if grid.match_cols is None else grid.df[:, grid.match_cols]
+            mask = match_mask(df, self._literals or self._polars_pattern)
+        else:
+            # Only one column at a time is converted to Python strings.
+            mask = pl.DataFrame(
+                [
+                    re_contains(stringify(grid.column(col_index)), pattern)
+                    for col_index in match_cols
+                ]
+            )
+
+        if grid.match_cols is not None:
+            # No cell in the other columns matches.
+            mask = pl.DataFrame(
+                [
+                    (
+                        mask.get_column(name)
+                        if name in mask.columns
+                        else pl.repeat(
+                            False, mask.height, dtype=pl.Boolean, eager=True
+                        ).alias(name)
+                    )
+                    for name in grid.col_names
+                ]
+            )
+
+        return mask
 
     def __str__(self):
         result = []
-        for i, row in enumerate(self.rows):
+        for i, (row_matched, cells) in enumerate(
+            zip(self._row_matched, self._mask.iter_rows())
+        ):
             result.append(
-                f"Row {i} matched {row.matched()}: "
-                + " ".join(["1" if cell.matched else "0" for cell in row])
+                f"Row {i} matched {row_matched}: "
+                + " ".join(["1" if matched else "0" for matched in cells])
             )
         return "\n".join(result)
 
     def __bool__(self):
         return self._matched
 
+    @property
+    def grid(self) -> Grid:
+        return self._grid
+
+    def count(self) -> int:
+        """
+        Get the number of rows selected for output (as for grep -c). This is
+        computed directly from the match result, without formatting anything.
+        """
+        return self._row_matched.sum()
+
+    def _numeric(self, col_index: int) -> bool:
+        """
+        Are all the values in a column numeric?
+        """
+        series = self._grid.column(col_index)
+        dtype = series.dtype
+        return len(series) == 0 or (
+            (dtype.is_numeric() or dtype == pl.Boolean)
+            and not isinstance(dtype, pl.Decimal)
+            and not series.null_count()
+        )
+
+    def _values(self, col_index: int, row_indices: list[int]) -> pl.Series:
+        """
+        Get the (string) values of a column, in the given rows.
+        """
+        return stringify(self._grid.column(col_index).gather(row_indices))
+
+    def _spans(self, values: pl.Series) -> pl.Series:
+        """
+        Get the start and end offsets of every match in some values (see
+        match_spans).
+        """
+        return match_spans(values, self._pattern, self._polars_pattern)
+
+    def _format_col(
+        self,
+        col_index: int,
+        row_indices: list[int],
+        unmatched: str | None,
+        color: str | None,
+        typed: bool = False,
+    ) -> pl.Series:
+        """
+        Format the cells of a column, in the given rows. Only the matched
+        cells are highlighted, so no other cell is searched for matches. If
+        'typed' is true, and no cells are to be changed, the values keep their
+        type (e.g., integers in an Excel sheet are not made strings).
+        """
+        if typed and unmatched is None and not color:
+            return self._grid.column(col_index).gather(row_indices)
+
+        values = self._values(col_index, row_indices)
+        mask = self._mask.to_series(col_index).gather(row_indices)
+        if color and mask.any():
+            matched_rows = mask.arg_true()
+            matched = values.gather(matched_rows)
+            values = values.scatter(
+                matched_rows, highlight(matched, self._spans(matched), color)
+            )
+
+        if unmatched is None:
+            return values
+        return (
+            pl.DataFrame(dict(value=values, matched=mask))
+            .select(pl.when("matched").then("value").otherwise(pl.lit(unmatched)))
+            .to_series()
+        )
+
+    def _col_label(self, col_index: int, col_numbers: bool, excel_cols: bool) -> str:
+        """
+        Get the label of a column in the output.
+        """
+        # Label columns by their position in the input, which differs from
+        # their position in the grid if only some were read.
+        input_col = self._grid.col_index(col_index) + 1
+        excel_col = int_to_excel_column(input_col)
+        str_col = f"{input_col}"
+
+        if not self._grid.header:
+            return "Column " + (excel_col if excel_cols else str_col)
+
+        grid_col_name = self._grid.col_names[col_index]
+        if excel_cols:
+            return f"{grid_col_name} ({excel_col})"
+        if col_numbers:
+            return f"{grid_col_name} ({str_col})"
+        return grid_col_name
+
+    def only_matching_df(
+        self,
+        row_numbers: bool,
+        col_numbers: bool,
+        filenames: bool,
+        color: str | None,
+        excel_cols: bool,
+        row_indices: list[int],
+    ) -> pl.DataFrame:
+        """
+        Make a DataFrame of just the matched parts of the cells in the given
+        rows (as for grep -o), with a "Match" row for each (non-empty) match,
+        in row and then column order. Its "File", "Row", and "Column" columns
+        are only given for 'filenames', 'row_numbers', and 'col_numbers' (or
+        'excel_cols').
+        """
+        schema = dict(index=pl.Int64, col=pl.Int64, Match=pl.String)
+        matches = []
+        for col_index, col_matched in enumerate(self._col_matched):
+            if not col_matched:
+                continue
+            # Only the matched cells can have matches.
+            matched_rows = (
+                pl.Series(row_indices, dtype=pl.Int64)
+                .filter(self._mask.to_series(col_index).gather(row_indices))
+                .to_list()
+            )
+            values = self._values(col_index, matched_rows)
+            matches.append(
+                pl.DataFrame(
+                    dict(
+                        index=matched_rows,
+                        col=pl.repeat(col_index, len(matched_rows), eager=True),
+                        value=values,
+                        spans=self._spans(values).list.eval(_nonempty),
+                    )
+                )
+                .explode("spans")
+                .unnest("spans")
+                .drop_nulls("start")
+                .select(
+                    "index",
+                    "col",
+                    Match=pl.col("value").str.slice(
+                        pl.col("start"), pl.col("end") - pl.col("start")
+                    ),
+                )
+                .cast(schema)
+            )
+
+        df = (
+            pl.concat(matches).sort("index", "col", maintain_order=True)
+            if matches
+            else pl.DataFrame(schema=schema)
+        )
+
+        data = {}
+        if filenames:
+            data["File"] = pl.repeat(self._grid.filename, df.height, eager=True)
+        if row_numbers:
+            data["Row"] = df.get_column("index") + self._grid.first_row
+        if col_numbers or excel_cols:
+            labels = pl.Series(
+                [
+                    self._col_label(col_index, col_numbers, excel_cols)
+                    for col_index in range(len(self._grid.col_names))
+                ],
+                dtype=pl.String,
+            )
+            data["Column"] = labels.gather(df.get_column("col"))
+        data["Match"] = df.get_column("Match")
+        if color:
+            data["Match"] = f"[{color}]" + data["Match"] + f"[/{color}]"
+
+        self._df_cols = {}
+        return pl.DataFrame(data)
+
     def polars_df(
         self,
         row_numbers: bool,
@@ -62,10 +413,23 @@ class Match:
         unmatched: str | None,
         only_matching_cols: bool,
         excel_cols: bool,
+        row_indices: list[int] | None = None,
+        only_matching: bool = False,
+        typed: bool = False,
     ) -> pl.DataFrame:
-        data = defaultdict(list)
-        row_inc = 1 + self._grid.skip + self._grid.header
+        """
+        Make a DataFrame of the formatted output for the rows selected for
+        output, or for just some of them (given by 'row_indices'). If
+        'only_matching' is true, give just the matched parts of their cells
+        (see only_matching_df). If 'typed' is true, columns keep the types
+        they have in the grid, unless 'unmatched' (or 'color') changes their
+        cells.
+        """
+        data = {}
         grid_col_names = set(self._grid.col_names)
+        # Remember which grid column each output column comes from, so
+        # rich_table can justify numeric columns.
+        self._df_cols = {}
 
         def new_col_name(name: str) -> str:
             """
@@ -79,65 +443,144 @@ class Match:
                 candidate = f"{name} ({i})"
             return candidate
 
+        if row_indices is None:
+            row_indices = self._row_matched.arg_true().to_list()
+
+        if only_matching:
+            return self.only_matching_df(
+                row_numbers, col_numbers, filenames, color, excel_cols, row_indices
+            )
+
+        if not row_indices:
+            return pl.DataFrame({new_col_name("File"): []} if filenames else {})
+
         if filenames:
-            # This looks like a no op, but it has the side-effect of making
-            # sure the new "File" column is the first thing in the 'data'
-            # dict. As a result, it will appear first in the list of columns.
-            col_name = new_col_name("File")
-            data[col_name] = []
-
-        for row in self.rows:
-            if row.matched:
-                if row_numbers:
-                    col_name = new_col_name("Row")
-                    # Note that this new column is numeric. All other columns
-                    # are strings (because that is how we orignially read (or
-                    # converted) the data out of CSV, TSV, or Excel). We make
-                    # our additional "Row" column numeric in order to know
-                    # that we can right justify it in rich_table. If not, we
-                    # would either need to leave it left justified or think
-                    # of a non-horrible way for this function to return the
-                    # name of the newly-added "Row" column so the name could
-                    # be passed to rich_table.
-                    data[col_name].append(row.index + row_inc)
-                for col_index, cell in enumerate(row):
-                    if only_matching_cols and not self.cols[col_index].matched:
-                        continue
-
-                    grid_col_name = self._grid.col_names[col_index]
-                    excel_col = int_to_excel_column(col_index + 1)
-                    str_col = f"{col_index + 1}"
-
-                    if self._grid.header:
-                        if excel_cols:
-                            col_name = f"{grid_col_name} ({excel_col})"
-                        elif col_numbers:
-                            col_name = f"{grid_col_name} ({str_col})"
-                        else:
-                            col_name = grid_col_name
-                    else:
-                        col_name = "Column " + (excel_col if excel_cols else str_col)
-
-                    if col_name != grid_col_name:
-                        col_name = new_col_name(col_name)
-
-                    data[col_name].append(cell.format(unmatched, color))
-
-                if filenames:
-                    col_name = new_col_name("File")
-                    data[col_name].append(self._grid.filename)
+            data[new_col_name("File")] = [self._grid.filename] * len(row_indices)
+
+        if row_numbers:
+            # Note that this new column is numeric. All other columns are
+            # strings (because that is how we orignially read (or converted)
+            # the data out of CSV, TSV, or Excel). We make our additional
+            # "Row" column numeric in order to know that we can right justify
+            # it in rich_table.
+            data[new_col_name("Row")] = (
+                pl.Series(row_indices, dtype=pl.Int64) + self._grid.first_row
+            )
+
+        for col_index, grid_col_name in enumerate(self._grid.col_names):
+            if only_matching_cols and not self._col_matched[col_index]:
+                continue
+
+            col_name = self._col_label(col_index, col_numbers, excel_cols)
+            if col_name != grid_col_name:
+                col_name = new_col_name(col_name)
+
+            data[col_name] = self._format_col(
+                col_index, row_indices, unmatched, color, typed
+            )
+            self._df_cols[col_name] = col_index
 
         return pl.DataFrame(data)
 
-    def rich_table(self, df: pl.DataFrame) -> Table:
+    def csv_batches(
+        self,
+        format_: str = "csv",
+        include_header: bool = True,
+        only_matching_cols: bool = False,
+        filenames: bool = False,
+        unmatched: str | None = None,
+        color: str | None = None,
+        row_numbers: bool = False,
+        col_numbers: bool = False,
+        excel_cols: bool = False,
+        only_matching: bool = False,
+        batch_size: int = OUTPUT_BATCH_SIZE,
+    ) -> Iterator[str]:
+        """
+        Format the rows selected for output as CSV (or TSV), 'batch_size' rows
+        at a time, so the output for a large match can be written as it is
+        made instead of being held in memory all at once. Each batch of text
+        ends with a newline.
+        """
+        row_indices = self._row_matched.arg_true()
+        for start in range(0, len(row_indices), batch_size):
+            df = self.polars_df(
+                row_numbers,
+                col_numbers,
+                filenames,
+                color=color,
+                unmatched=unmatched,
+                only_matching_cols=only_matching_cols,
+                excel_cols=excel_cols,
+                row_indices=row_indices.slice(start, batch_size).to_list(),
+                only_matching=only_matching,
+            )
+            yield df.write_csv(
+                separator="," if format_ == "csv" else "\t",
+                include_header=include_header and start == 0,
+            )
+
+    def cells(self) -> pl.DataFrame:
+        """
+        Make a DataFrame of the matching cells in the rows selected for output,
+        in row order, giving each cell's row number in the input ('row'), its
+        grid column index ('col'), the 'start' and 'end' offsets of the first
+        match in it, and the offsets of all its matches ('spans', see
+        match_spans). With 'invert', the selected rows have no matching cells,
+        so each row is given once, with null 'col', 'start', 'end' and 'spans'.
+        """
+        schema = dict(
+            row=pl.Int64,
+            col=pl.Int64,
+            start=pl.Int64,
+            end=pl.Int64,
+            spans=pl.List(SPAN),
+        )
+
+        if self._invert:
+            rows = self._row_matched.arg_true().cast(pl.Int64) + self._grid.first_row
+            nulls = pl.repeat(None, len(rows), dtype=pl.Int64, eager=True)
+            return pl.DataFrame(
+                dict(row=rows, col=nulls, start=nulls, end=nulls, spans=nulls)
+            ).cast(schema)
+
+        cells = []
+        for col_index, col_matched in enumerate(self._col_matched):
+            if not col_matched:
+                continue
+            row_indices = self._mask.to_series(col_index).arg_true().to_list()
+            spans = self._spans(self._values(col_index, row_indices))
+            first = spans.list.first().struct
+            cells.append(
+                pl.DataFrame(
+                    dict(
+                        row=pl.Series(row_indices) + self._grid.first_row,
+                        col=pl.repeat(col_index, len(row_indices), eager=True),
+                        start=first.field("start"),
+                        end=first.field("end"),
+                        spans=spans,
+                    )
+                ).cast(schema)
+            )
+
+        if not cells:
+            return pl.DataFrame(schema=schema)
+
+        return pl.concat(cells).sort("row", "col")
+
+    def rich_table(self, df: pl.DataFrame) -> "Table":
+        from rich.table import Table
+
         table = Table(title=self._grid.filename)
 
         numeric_columns = set(df.select(cs.numeric()).columns)
 
-        for col_index, col_name in enumerate(df.columns):
+        for col_name in df.columns:
+            col_index = self._df_cols.get(col_name)
             justify = (
                 "right"
-                if col_name in numeric_columns or self.cols[col_index - 1].numeric
+                if col_name in numeric_columns
+                or (col_index is not None and self._numeric(col_index))
                 else "left"
             )
 
@@ -161,9 +604,42 @@ class Match:
         row_numbers: bool = False,
         col_numbers: bool = False,
         excel_cols: bool = False,
+        only_matching: bool = False,
         out: Path | None = None,
-        excel_writer: ExcelWriter | None = None,
-    ) -> str | Table | None:
+        writer: ExcelWriter | FrameWriter | None = None,
+        continued: bool = False,
+    ) -> "str | Table | None":
+        """
+        Format the match. Set 'continued' if this match is for a batch of rows
+        whose file already has output (which must not repeat the CSV/TSV header,
+        and is added to the same Excel sheet).
+        """
+        # Counting and showing the filename only need the match result, not
+        # a formatted DataFrame.
+        if count:
+            return f"{self._grid.filename + ':' if filenames else ''}{self.count()}"
+
+        if only_filename:
+            return self._grid.filename
+
+        if format_ in ("csv", "tsv"):
+            # Drop the trailing newline so our caller can consistently print
+            # our result without needing to selectively use print(result, end="").
+            return "".join(
+                self.csv_batches(
+                    format_,
+                    include_header=self._grid.header and not continued,
+                    row_numbers=row_numbers,
+                    col_numbers=col_numbers,
+                    filenames=filenames,
+                    color=None if out else color,
+                    unmatched=unmatched,
+                    only_matching_cols=only_matching_cols,
+                    excel_cols=excel_cols,
+                    only_matching=only_matching,
+                )
+            ).rstrip("\n")
+
         df = self.polars_df(
             row_numbers,
             col_numbers,
@@ -172,31 +648,16 @@ class Match:
             unmatched=unmatched,
             only_matching_cols=only_matching_cols,
             excel_cols=excel_cols,
+            only_matching=only_matching,
+            typed=format_ in FRAME_FORMATS,
         )
 
-        if count:
-            return f"{self._grid.filename + ':' if filenames else ''}{len(df)}"
-
-        if only_filename:
-            return self._grid.filename
-
-        if format_ in ("csv", "tsv"):
-            output = StringIO()
-            df.write_csv(
-                output,
-                separator="," if format_ == "csv" else "\t",
-                include_header=self._grid.header,
-            )
-            # Drop the trailing newline so our caller can consistently print
-            # our result without needing to selectively use print(result, end="").
-            return output.getvalue().rstrip("\n")
-
         if format_ == "rich":
             return self.rich_table(df)
 
-        if format_ == "excel":
-            assert excel_writer is not None
-            excel_writer.write(df, self._grid.filename)
+        if format_ == "excel" or format_ in FRAME_FORMATS:
+            assert writer is not None
+            writer.write(df, self._grid.filename, append=continued)
             return
 
         raise ValueError(f"Unknown output format {format_!r}.")
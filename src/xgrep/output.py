@@ -0,0 +1,183 @@
+from typing import TYPE_CHECKING, Any, TextIO
+
+from xgrep.excel import ExcelWriter
+from xgrep.frames import FrameWriter
+from xgrep.match import Match
+from xgrep.stats import Stats, timed
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+
+class TextConsole:
+    """
+    A stand-in for a rich Console, for output that is only text (counts, file
+    names, and CSV/TSV) and that is not going to a terminal, so rich need not
+    be imported. Unlike a rich Console, it does not wrap long lines or treat
+    any of the text as markup.
+    """
+
+    is_terminal = False
+    color_system = None
+
+    def __init__(self, file: TextIO, width: int | None = None) -> None:
+        self.file = file
+        self.width = width
+
+    def print(self, result: Any) -> None:
+        print(result, file=self.file)
+
+
+def make_console(
+    file: TextIO, width: int | None, tables: bool
+) -> "Console | TextConsole":
+    """
+    Make a console to print output to a file. A rich Console is only needed if
+    there may be rich tables ('tables'), or to show matches in color on a
+    terminal.
+    """
+    if tables or file.isatty():
+        from rich.console import Console
+
+        return Console(file=file, width=width, highlight=False)
+
+    return TextConsole(file, width)
+
+
+class Output:
+    """
+    Format and write the matches found in a sequence of grids.
+
+    Consecutive grids may be batches of rows from the same file (see the
+    'offset' attribute of Grid), in which case their output is combined as
+    though the file had been matched all at once: a count is printed once per
+    file, and a CSV/TSV header is only written before the first matching batch.
+
+    CSV/TSV output that is not going to a terminal is written straight to
+    the console's file, a batch of rows at a time (see Match.csv_batches), so
+    it is never all held in memory and rich does not wrap its lines or treat
+    any of it as markup. (On a terminal, rich is used to show matches in
+    color.)
+
+    Note that the names of matching files (for --only-filename) are printed
+    by the caller, since it can stop reading a file once it has a match.
+    """
+
+    def __init__(
+        self,
+        console: "Console | TextConsole | None",
+        writer: ExcelWriter | FrameWriter | None,
+        format_: str,
+        count: bool,
+        only_filename: bool,
+        width: int | None,
+        filenames: bool,
+        stats: Stats | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self.writer = writer
+        self.console = console
+        self.format_ = format_
+        self.count = count
+        self.only_filename = only_filename
+        self.width = width
+        self.filenames = filenames
+        self.stats = stats
+        # Additional keyword arguments for Match.format.
+        self.kwargs = kwargs
+        self._reset()
+
+    def _reset(self) -> None:
+        self._filename = None
+        self._count = 0
+
+    def add(self, match: Match) -> None:
+        """
+        Add the result of matching a grid (or a batch of its rows).
+        """
+        if match.grid.offset == 0:
+            self.flush()
+
+        # Note that with --invert, a batch with no matching cell has rows to
+        # output, and one in which every row matches has none. The CSV/TSV
+        # header is written with the first batch that has rows to output.
+        if not match.count():
+            if self.count and match:
+                # As before, a grid whose every row matches has its count (of
+                # zero) shown with --invert.
+                self._filename = match.grid.filename
+            return
+
+        continued = self._filename is not None
+        self._filename = match.grid.filename
+
+        if self.count:
+            self._count += match.count()
+            return
+
+        if (
+            self.format_ in ("csv", "tsv")
+            and self.console is not None
+            and not self.console.is_terminal
+        ):
+            kwargs = self.kwargs | dict(color=None)
+            kwargs.pop("out", None)
+            batches = match.csv_batches(
+                self.format_,
+                include_header=match.grid.header and not continued,
+                filenames=self.filenames,
+                **kwargs,
+            )
+            while True:
+                with timed(self.stats, "format", match.grid):
+                    text = next(batches, None)
+                if text is None:
+                    return
+                with timed(self.stats, "write", match.grid):
+                    self.console.file.write(text)
+
+        # Giving a match to a writer writes it to the workbook (or file).
+        with timed(
+            self.stats,
+            "format" if self.writer is None else "write",
+            match.grid,
+        ):
+            result = match.format(
+                format_=self.format_,
+                width=self.width,
+                filenames=self.filenames,
+                writer=self.writer,
+                continued=continued,
+                **self.kwargs,
+            )
+
+        if self.writer is None:
+            # Unless an Excel (or Parquet, etc.) writer has saved the match,
+            # there must be some kind of result, since there are rows to
+            # output (see above).
+            assert result is not None
+            # Rendering a rich Table happens when it is printed.
+            with timed(self.stats, "write", match.grid):
+                self.print(result)
+
+    def flush(self) -> None:
+        """
+        Finish the output for the grid whose batches have been added so far.
+        """
+        if self._filename is not None and self.count:
+            self.print(f"{self._filename + ':' if self.filenames else ''}{self._count}")
+        self._reset()
+
+    def write(self, text: str) -> None:
+        """
+        Write output that has already been printed to another console (see
+        xgrep.parallel).
+        """
+        if self.console is not None:
+            self.console.file.write(text)
+
+    def print(self, result: Any) -> None:
+        # Note that there is no console when writing Excel (or Parquet,
+        # etc.), in which case counts and filenames are not shown.
+        if self.console is not None:
+            self.console.print(result)
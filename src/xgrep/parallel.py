@@ -0,0 +1,309 @@
+import os
+import re
+import multiprocessing
+import polars as pl
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import contextmanager
+from io import StringIO
+from itertools import chain
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from xgrep.grid import Workbook, excel_sheet_names
+from xgrep.output import Output, TextConsole
+from xgrep.stats import Stats
+
+
+class Recorder:
+    """
+    Record the DataFrames a worker process would write to an Excel workbook
+    (or a Parquet, Arrow, or NDJSON file), so the main process can write them
+    to the real one (see ExcelWriter and FrameWriter).
+    """
+
+    def __init__(self) -> None:
+        self.writes: list[tuple[pl.DataFrame, str | None, bool]] = []
+
+    def write(
+        self, df: pl.DataFrame, name: str | None = None, append: bool = False
+    ) -> None:
+        self.writes.append((df, name, append))
+
+
+def _search(
+    path: Path,
+    console_options: dict[str, Any] | None,
+    output_options: dict[str, Any],
+    record: bool,
+    regex: re.Pattern,
+    invert: bool,
+    quiet: bool,
+    reader_options: dict[str, Any],
+    max_count: int | None = None,
+    stats: bool = False,
+    trace_memory: bool = False,
+) -> tuple[
+    str, list[tuple[pl.DataFrame, str | None, bool]], bool, dict[str, Any] | None
+]:
+    """
+    Search a file in a worker process. Return the text that was printed, the
+    DataFrames that were written to Excel (or Parquet, etc.), whether there
+    was a match, and (if 'stats' is true) the statistics recorded for the
+    search (see Stats, and its 'trace_memory').
+    """
+    # Imported here to avoid a circular import.
+    from xgrep.cli import search_file
+
+    fp = StringIO()
+    if console_options is None:
+        console = TextConsole(fp)
+    else:
+        from rich.console import Console
+
+        console = Console(file=fp, **console_options)
+    recorder = Recorder() if record else None
+    worker_stats = Stats(trace_memory) if stats else None
+    output = Output(
+        console,
+        recorder,
+        stats=worker_stats,
+        **output_options,
+    )
+    matched = search_file(path, output, regex, invert, quiet, reader_options, max_count)
+
+    return (
+        fp.getvalue(),
+        [] if recorder is None else recorder.writes,
+        matched,
+        None if worker_stats is None else worker_stats.result(),
+    )
+
+
+def _search_matches(task: tuple[Path, dict[str, Any]], **kwargs: Any) -> bool:
+    """
+    Search a file (given with the options to read it with) in a worker
+    process, only to find whether it has a match.
+    """
+    path, reader_options = task
+    return _search(path, reader_options=reader_options, **kwargs)[2]
+
+
+def _is_workbook(task: tuple[Path, dict[str, Any]]) -> bool:
+    return task[0].suffix.lower() == ".xlsx"
+
+
+def _sheet_tasks(
+    task: tuple[Path, dict[str, Any]],
+) -> list[tuple[Path, dict[str, Any]]]:
+    """
+    Split the search task for an Excel file into a task for each sheet (the
+    task for any other file is left alone). This is done in a worker process,
+    because finding the names of the sheets may mean opening the workbook
+    (which parses all its shared strings).
+    """
+    if not _is_workbook(task):
+        return [task]
+
+    path, reader_options = task
+    cache = reader_options.get("cache")
+    workbook = Workbook(path, None if cache is None else cache.workbook(path))
+    try:
+        names = excel_sheet_names(
+            workbook.sheet_names(),
+            reader_options["sheet_name"],
+            reader_options["sheet_id"],
+        )
+    except ValueError:
+        # A missing sheet. Let the search report it (or not), exactly as a
+        # serial search would.
+        return [task]
+    return [
+        (path, reader_options | dict(sheet_name=(name,), sheet_id=None))
+        for name in names
+    ]
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    """
+    Stop the workers of a process pool, even those still searching, and
+    cancel the tasks not yet started. (Unlike multiprocessing.Pool.terminate,
+    this cannot hang if a worker is stopped while it is sending a result.)
+    """
+    terminate_workers = getattr(executor, "terminate_workers", None)
+    if terminate_workers is not None:
+        # Python 3.14 and later.
+        terminate_workers()
+        return
+
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+@contextmanager
+def worker_environment(jobs: int) -> Iterator[None]:
+    """
+    Limit the number of threads Polars uses in each worker process, so the
+    workers do not (together) use more threads than there are CPUs.
+    """
+    if "POLARS_MAX_THREADS" in os.environ:
+        yield
+        return
+
+    # Worker processes are spawned (not forked), so they read this when they
+    # import Polars.
+    os.environ["POLARS_MAX_THREADS"] = str(max(1, (os.cpu_count() or 1) // jobs))
+    try:
+        yield
+    finally:
+        del os.environ["POLARS_MAX_THREADS"]
+
+
+def search_parallel(
+    tasks: Iterable[tuple[Path, dict[str, Any]]],
+    jobs: int,
+    output: Output,
+    regex: re.Pattern,
+    invert: bool,
+    quiet: bool,
+    max_count: int | None = None,
+    sheets: bool = False,
+) -> bool:
+    """
+    Search files (each given with the options to read it with) using a pool of
+    worker processes, adding their matches to the output in the order the
+    files were given, exactly as a serial search would. If 'sheets' is true,
+    the sheets of Excel files are searched in parallel too. Return True if
+    there was a match.
+
+    If 'tasks' is a list, the largest files are searched first. Otherwise
+    (e.g., for the files found by a directory walk) each is searched as soon
+    as it is produced.
+    """
+    console = output.console
+    # Workers print to a console that produces the same text as ours.
+    console_options = None
+    if console is not None and not isinstance(console, TextConsole):
+        console_options = dict(
+            highlight=False,
+            width=console.width,
+            force_terminal=console.is_terminal,
+            color_system=console.color_system,
+        )
+
+    output_options = dict(
+        format_=output.format_,
+        count=output.count,
+        only_filename=output.only_filename,
+        width=output.width,
+        filenames=output.filenames,
+        **output.kwargs,
+    )
+
+    if output.only_filename and not output.count:
+        # A file name must be printed once, not once per matching sheet.
+        sheets = False
+
+    if isinstance(tasks, list):
+        # Search the largest files first, so a large file near the end of the
+        # list does not leave the other workers idle while it is searched.
+        order = sorted(
+            range(len(tasks)), key=lambda i: _size(tasks[i][0]), reverse=True
+        )
+        workers = max(1, min(jobs, len(tasks)))
+    else:
+        order = None
+        workers = jobs
+
+    search_options = dict(
+        console_options=console_options,
+        output_options=output_options,
+        record=output.writer is not None,
+        regex=regex,
+        invert=invert,
+        quiet=quiet,
+        max_count=max_count,
+        stats=output.stats is not None,
+        trace_memory=output.stats is not None and output.stats.trace_memory,
+    )
+
+    ordered = tasks if order is None else [tasks[index] for index in order]
+    any_match = False
+
+    with (
+        worker_environment(jobs),
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor,
+    ):
+        if quiet:
+            # There is no output, so stop as soon as any file has a match.
+            if sheets:
+                # The sheets of each workbook are found by a worker.
+                ordered = chain.from_iterable(executor.map(_sheet_tasks, ordered))
+            futures = [
+                executor.submit(_search_matches, task, **search_options)
+                for task in ordered
+            ]
+            for future in as_completed(futures):
+                if future.result():
+                    _terminate(executor)
+                    return True
+            return False
+
+        def submit(task: tuple[Path, dict[str, Any]]) -> Future:
+            path, reader_options = task
+            return executor.submit(
+                _search, path, reader_options=reader_options, **search_options
+            )
+
+        # The futures of the searches of each file (keyed by its index in the
+        # order the files were given), and the futures giving the sheet tasks
+        # of the workbooks whose sheets are not yet known.
+        searches: dict[int, list[Future]] = {}
+        listings: dict[Future, int] = {}
+
+        for index, task in (
+            enumerate(ordered) if order is None else zip(order, ordered)
+        ):
+            if sheets and _is_workbook(task):
+                listings[executor.submit(_sheet_tasks, task)] = index
+            else:
+                searches[index] = [submit(task)]
+
+        for index in range(len(searches) + len(listings)):
+            while index not in searches:
+                # Search the sheets of each workbook as soon as they are known.
+                done, _ = wait(listings, return_when=FIRST_COMPLETED)
+                for future in done:
+                    searches[listings.pop(future)] = [
+                        submit(sheet_task) for sheet_task in future.result()
+                    ]
+
+            for future in searches.pop(index):
+                text, writes, matched, stats = future.result()
+                if stats is not None:
+                    assert output.stats is not None
+                    output.stats.merge(stats)
+                output.write(text)
+                for df, name, append in writes:
+                    assert output.writer is not None
+                    output.writer.write(df, name, append)
+                if matched:
+                    any_match = True
+
+    return any_match
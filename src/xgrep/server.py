@@ -0,0 +1,238 @@
+import io
+import os
+import importlib
+import sys
+import json
+import socket
+import tempfile
+import traceback
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+# The environment variable giving the server's socket.
+SOCKET_ENVVAR = "XGREP_SOCKET"
+
+# The modules a server imports before it starts, so that no search need wait
+# for them to be imported.
+WARM_MODULES = (
+    "polars",
+    "rich.console",
+    "rich.table",
+    "xlsxwriter",
+    "xgrep.frames",
+    "xgrep.index",
+    "xgrep.output",
+    "xgrep.parallel",
+    "xgrep.walk",
+)
+
+
+def default_socket() -> Path:
+    """
+    Get the path of the server's socket, if none is given in XGREP_SOCKET.
+    """
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return Path(directory) / f"xgrep-{user}.sock"
+
+
+def socket_path() -> Path:
+    return Path(os.environ.get(SOCKET_ENVVAR) or default_socket())
+
+
+def _send(conn: socket.socket, **message: Any) -> None:
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+class _Stream(io.TextIOBase):
+    """
+    A text stream that sends what is written to it to a client, as output for
+    its standard out (or standard error).
+    """
+
+    def __init__(self, conn: socket.socket, name: str, terminal: bool) -> None:
+        self._conn = conn
+        self._name = name
+        self._terminal = terminal
+
+    encoding = "utf-8"
+    errors = "strict"
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        # So that output is formatted (e.g., in color) as it would be for the
+        # client's terminal.
+        return self._terminal
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            # Tells click this is not a binary stream.
+            raise TypeError("A text stream cannot write bytes.")
+        if text:
+            _send(self._conn, **{self._name: text})
+        return len(text)
+
+
+def _run(
+    conn: socket.socket, request: dict[str, Any], main: Callable, cache: Any
+) -> int:
+    """
+    Run a command for a client, in the client's directory and environment,
+    sending it the output. Return the exit status.
+    """
+    saved = (
+        sys.stdin,
+        sys.stdout,
+        sys.stderr,
+        sys.argv,
+        dict(os.environ),
+        os.getcwd(),
+        tracemalloc.is_tracing(),
+    )
+    stdout_terminal, stderr_terminal = request["terminal"]
+    try:
+        # The client's standard input, if it is read (e.g., by -f -).
+        sys.stdin = io.StringIO(request.get("stdin", ""))
+        sys.stdout = _Stream(conn, "stdout", stdout_terminal)
+        sys.stderr = _Stream(conn, "stderr", stderr_terminal)
+        sys.argv = ["xgrep", *request["args"]]
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        try:
+            main(obj=dict(cache=cache))
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except (BrokenPipeError, ConnectionResetError):
+            # The client has gone (e.g., its output was piped to 'head').
+            raise
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+    finally:
+        sys.stdin, sys.stdout, sys.stderr, sys.argv = saved[:4]
+        os.environ.clear()
+        os.environ.update(saved[4])
+        os.chdir(saved[5])
+        if tracemalloc.is_tracing() and not saved[6]:
+            # Started by --stats-memory.
+            tracemalloc.stop()
+
+
+def serve(path: Path, max_size: int | None) -> None:
+    """
+    Run searches sent by clients (see request) on a Unix socket, one at a
+    time, until told to stop. Excel sheets are cached in memory, so repeated
+    searches of the same files need not parse them again.
+    """
+    from xgrep.cache import MemoryCache
+    from xgrep.cli import main
+
+    # Import everything a search may need now, not during the first search.
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+    cache = MemoryCache(max_size)
+
+    if path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            try:
+                client.connect(str(path))
+            except ConnectionRefusedError:
+                # Left behind by a server that did not stop cleanly.
+                path.unlink()
+            else:
+                raise FileExistsError(f"A server is already running on {str(path)!r}.")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(path))
+        try:
+            os.chmod(path, 0o600)
+            server.listen()
+            while True:
+                conn, _ = server.accept()
+                with conn:
+                    try:
+                        request = json.loads(conn.makefile("rb").readline())
+                        command = request.get("command", "search")
+                        if command == "search":
+                            _send(conn, exit=_run(conn, request, main, cache))
+                        elif command == "status":
+                            _send(conn, status=dict(pid=os.getpid(), **cache.stats()))
+                        elif command == "stop":
+                            _send(conn, exit=0)
+                            return
+                    except (OSError, ValueError):
+                        # The client has gone, or sent something unreadable.
+                        pass
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def request(path: Path, command: str = "search", **message: Any) -> Any:
+    """
+    Send a request to a server. For a search, write its output to standard
+    out and standard error, and return its exit status. Otherwise return the
+    server's reply. Raise OSError if no server is running.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(str(path))
+        _send(conn, command=command, **message)
+        for line in conn.makefile("rb"):
+            reply = json.loads(line)
+            if "stdout" in reply:
+                sys.stdout.write(reply["stdout"])
+            elif "stderr" in reply:
+                sys.stderr.write(reply["stderr"])
+            elif "exit" in reply:
+                sys.stdout.flush()
+                return reply["exit"]
+            else:
+                return reply
+    raise ConnectionResetError("The server closed the connection.")
+
+
+def reads_stdin(args: list[str]) -> bool:
+    """
+    Whether xgrep run with some arguments may read standard input: if a
+    pattern file (-f) is '-'. The arguments are parsed by xgrep's own parser
+    (without converting any values), so a '-' that is a filename or the value
+    of another option (e.g., of -u) is not taken to be one.
+    """
+    import click
+    from xgrep.cli import cli
+
+    parser = cli.make_parser(click.Context(cli, resilient_parsing=True))
+    try:
+        options, _, _ = parser.parse_args(list(args))
+    except click.UsageError:
+        # The error is reported by the server.
+        return False
+    return "-" in (options.get("pattern_files") or ())
+
+
+def run_remotely(path: Path, args: list[str]) -> int:
+    """
+    Have a server run xgrep with some arguments, exactly as it would be run
+    here (with our standard input, if it is read). Return the exit status.
+    """
+    stdin = {"stdin": sys.stdin.read()} if reads_stdin(args) else {}
+    env = dict(os.environ)
+    if sys.stdout.isatty() and "COLUMNS" not in env:
+        # So rich tables are as wide as our terminal.
+        env["COLUMNS"] = str(os.get_terminal_size(sys.stdout.fileno()).columns)
+    return request(
+        path,
+        args=args,
+        cwd=os.getcwd(),
+        env=env,
+        terminal=[sys.stdout.isatty(), sys.stderr.isatty()],
+        **stdin,
+    )
@@ -0,0 +1,222 @@
+import sys
+import json
+import click
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter, process_time
+from typing import Any, ContextManager, Iterator
+
+try:
+    import resource
+except ImportError:
+    # Windows.
+    resource = None
+
+from xgrep.grid import Grid
+
+# The phases of searching a grid that are timed: reading it, matching it,
+# formatting its output, and writing its output.
+PHASES = ("read", "match", "format", "write")
+
+
+def max_rss(who: int | None = None) -> int | None:
+    """
+    Get the peak resident set size (in bytes) of this process (or of the
+    largest of its finished child processes, if 'who' is
+    resource.RUSAGE_CHILDREN), or None if it cannot be found.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # The size is in bytes on macOS, but in kilobytes on Linux.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _unit() -> dict[str, Any]:
+    return dict(
+        rows=0, cells=0, phases={phase: dict(wall=0.0, cpu=0.0) for phase in PHASES}
+    )
+
+
+def _add_unit(unit: dict[str, Any], other: dict[str, Any]) -> None:
+    unit["rows"] += other["rows"]
+    unit["cells"] += other["cells"]
+    for phase, times in other["phases"].items():
+        unit["phases"][phase]["wall"] += times["wall"]
+        unit["phases"][phase]["cpu"] += times["cpu"]
+
+
+class Stats:
+    """
+    Record the wall and CPU time spent reading, matching, formatting, and
+    writing the output for each grid (i.e., each file, or Excel sheet), and
+    the number of rows and cells that are scanned, for --stats.
+
+    CPU time includes the time of all the threads of the process (e.g., those
+    Polars uses), so may exceed wall time. The peak memory used by Python
+    objects is only found if 'trace_memory' is true, since tracing it (with
+    tracemalloc) slows everything down. Note that the rows of Excel output
+    are written to the workbook when the next sheet is started, so their
+    write time is included in that of the next grid (or in the time to close
+    the workbook, which is not part of any grid).
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self._wall = perf_counter()
+        self._cpu = process_time()
+        # Per (file, grid) statistics, keyed by file name and then by grid
+        # filename (which includes the sheet name, for Excel sheets).
+        self.files: dict[str, dict[str, dict[str, Any]]] = {}
+        # Times not spent on any grid (e.g., closing an Excel workbook).
+        self.other = _unit()
+        # The peak Python memory use of worker processes (see merge).
+        self._worker_python_peak = 0
+        # Whether Python memory use is traced (which makes everything slower).
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _unit(self, grid: Grid | None) -> dict[str, Any]:
+        if grid is None:
+            return self.other
+        return self.files.setdefault(grid.source or grid.filename, {}).setdefault(
+            grid.filename, _unit()
+        )
+
+    def _add(self, grid: Grid | None, phase: str, wall: float, cpu: float) -> None:
+        times = self._unit(grid)["phases"][phase]
+        times["wall"] += wall
+        times["cpu"] += cpu
+
+    @contextmanager
+    def phase(self, phase: str, grid: Grid | None = None) -> Iterator[None]:
+        """
+        Time a phase of the work on a grid.
+        """
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield
+        finally:
+            self._add(grid, phase, perf_counter() - wall, process_time() - cpu)
+
+    def read(self, grids: Iterator[Grid]) -> Iterator[Grid]:
+        """
+        Yield grids, timing how long each takes to read.
+        """
+        while True:
+            wall, cpu = perf_counter(), process_time()
+            grid = next(grids, None)
+            if grid is None:
+                return
+            self._add(grid, "read", perf_counter() - wall, process_time() - cpu)
+            yield grid
+
+    def scanned(self, grid: Grid) -> None:
+        """
+        Record that the rows (and the cells to be matched) of a grid have been
+        scanned.
+        """
+        unit = self._unit(grid)
+        unit["rows"] += grid.height
+        unit["cells"] += grid.height * (
+            len(grid.col_names) if grid.match_cols is None else len(grid.match_cols)
+        )
+
+    def result(self) -> dict[str, Any]:
+        """
+        Get the statistics recorded in a (worker) process, to be merged into
+        those of the main process.
+        """
+        return dict(
+            files=self.files,
+            python_peak=(
+                tracemalloc.get_traced_memory()[1]
+                if self.trace_memory and tracemalloc.is_tracing()
+                else 0
+            ),
+        )
+
+    def merge(self, result: dict[str, Any]) -> None:
+        """
+        Add the statistics recorded in a worker process.
+        """
+        for filename, grids in result["files"].items():
+            for name, other in grids.items():
+                _add_unit(
+                    self.files.setdefault(filename, {}).setdefault(name, _unit()), other
+                )
+        self._worker_python_peak = max(self._worker_python_peak, result["python_peak"])
+
+    def report(self) -> dict[str, Any]:
+        """
+        Get a report of the statistics, suitable for writing as JSON.
+        """
+
+        def summary(unit: dict[str, Any]) -> dict[str, Any]:
+            wall = sum(times["wall"] for times in unit["phases"].values())
+            return unit | dict(
+                wall=wall,
+                cpu=sum(times["cpu"] for times in unit["phases"].values()),
+                cells_per_second=unit["cells"] / wall if wall else None,
+            )
+
+        files = []
+        total = _unit()
+        _add_unit(total, self.other)
+        for filename, grids in self.files.items():
+            file_total = _unit()
+            for unit in grids.values():
+                _add_unit(file_total, unit)
+            _add_unit(total, file_total)
+            report = dict(file=filename) | summary(file_total)
+            if list(grids) != [filename]:
+                # Excel sheets.
+                report["sheets"] = [
+                    dict(sheet=name) | summary(unit) for name, unit in grids.items()
+                ]
+            files.append(report)
+
+        wall = perf_counter() - self._wall
+        python_peak = (
+            tracemalloc.get_traced_memory()[1]
+            if self.trace_memory and tracemalloc.is_tracing()
+            else None
+        )
+
+        return dict(
+            wall=wall,
+            cpu=process_time() - self._cpu,
+            rows=total["rows"],
+            cells=total["cells"],
+            cells_per_second=total["cells"] / wall if wall else None,
+            phases=total["phases"],
+            peak_rss=max_rss(),
+            peak_rss_workers=(
+                None if resource is None else max_rss(resource.RUSAGE_CHILDREN)
+            ),
+            python_peak=python_peak,
+            python_peak_workers=(
+                self._worker_python_peak if self.trace_memory else None
+            ),
+            memory_traced=self.trace_memory,
+            files=files,
+        )
+
+    def write(self, path: str) -> None:
+        """
+        Write the report as JSON to a file, or to standard error if 'path' is
+        '-'.
+        """
+        text = json.dumps(self.report(), indent=2)
+        if path == "-":
+            click.echo(text, err=True)
+        else:
+            Path(path).write_text(text + "\n")
+
+
+def timed(stats: Stats | None, phase: str, grid: Grid | None = None) -> ContextManager:
+    """
+    Time a phase, if statistics are being recorded.
+    """
+    return nullcontext() if stats is None else stats.phase(phase, grid)
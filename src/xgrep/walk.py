@@ -0,0 +1,201 @@
+import os
+import re
+import sys
+import queue
+import threading
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+
+from xgrep.grid import SUFFIXES, split_suffix
+
+T = TypeVar("T")
+
+
+def glob_regex(glob: str) -> str:
+    """
+    Translate a gitignore-style glob into a regex (string) that matches a
+    whole path. A '*' or '?' does not match a '/', but '**' matches any
+    number of directories.
+    """
+    result = []
+    i = 0
+    while i < len(glob):
+        char = glob[i]
+        if glob.startswith("**/", i):
+            # Zero or more directories.
+            result.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i):
+            result.append(".*")
+            i += 2
+        elif char == "*":
+            result.append("[^/]*")
+            i += 1
+        elif char == "?":
+            result.append("[^/]")
+            i += 1
+        elif char == "[" and (end := glob.find("]", i + 2)) != -1:
+            chars = glob[i + 1 : end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            result.append(f"[{chars}]")
+            i = end + 1
+        elif char == "\\" and i + 1 < len(glob):
+            result.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            result.append(re.escape(char))
+            i += 1
+    return "".join(result)
+
+
+class IgnoreRules:
+    """
+    Rules, in the format of a .gitignore file, for paths to ignore. Paths are
+    given relative to the directory being searched, using '/' as a separator.
+
+    As with git, the last rule that matches a path decides whether it is
+    ignored (a rule starting with '!' re-includes a path), a rule ending with
+    '/' only matches directories, and a rule is only matched against the full
+    path if it contains a '/' (otherwise it is matched against the name of
+    the file or directory). Files in an ignored directory are always ignored,
+    since the directory is not searched.
+    """
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip(" ")
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                # E.g., '\#file' or '\!file'.
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if "/" in line:
+                regex = glob_regex(line.lstrip("/"))
+            else:
+                # Match the name, at any depth.
+                regex = "(?:.*/)?" + glob_regex(line)
+            self.rules.append((re.compile(regex + r"\Z"), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, path: Path) -> "IgnoreRules":
+        with open(path) as fp:
+            return cls(fp)
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """
+        Is a (relative) path ignored?
+        """
+        result = False
+        for regex, negate, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.match(path):
+                result = not negate
+        return result
+
+
+def walk(
+    paths: Iterable[Path],
+    include: Iterable[str] = (),
+    exclude: Iterable[str] = (),
+    ignore: IgnoreRules | None = None,
+) -> Iterator[Path]:
+    """
+    Yield input files, searching directories recursively, as they are found.
+
+    Files that are given are always yielded. In directories, only files with
+    a suffix that can be read (see xgrep.grid.SUFFIXES, which includes those
+    of compressed CSV/TSV files) are yielded, and only if their name matches
+    one of the 'include' globs (if any are given), does not match any of the
+    'exclude' globs, and is not ignored by the 'ignore' rules. Directories
+    whose names match an 'exclude' glob, or that are ignored, are not
+    searched. Files in each directory are yielded in order of their names,
+    before those in its subdirectories.
+    """
+    include, exclude = tuple(include), tuple(exclude)
+
+    def wanted(name: str, relative: str, is_dir: bool) -> bool:
+        if any(fnmatchcase(name, glob) for glob in exclude):
+            return False
+        if ignore is not None and ignore.ignored(relative, is_dir):
+            return False
+        if is_dir:
+            return True
+        suffix, compression = split_suffix(Path(name))
+        return suffix + (compression or "") in SUFFIXES and (
+            not include or any(fnmatchcase(name, glob) for glob in include)
+        )
+
+    for path in paths:
+        if not path.is_dir():
+            yield path
+            continue
+
+        # A stack of (directory, path relative to 'path') to search.
+        stack = [(str(path), "")]
+        while stack:
+            directory, relative = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Could not read directory {directory!r}: {e}.", file=sys.stderr)
+                continue
+
+            subdirectories = []
+            for entry in entries:
+                entry_relative = relative + entry.name
+                # Symbolic links to directories are not followed (as with
+                # grep -r), which also avoids loops.
+                if entry.is_dir(follow_symlinks=False):
+                    if wanted(entry.name, entry_relative, True):
+                        subdirectories.append((entry.path, entry_relative + "/"))
+                elif entry.is_file() and wanted(entry.name, entry_relative, False):
+                    yield Path(entry.path)
+
+            # Reversed, so the stack pops them in order.
+            stack.extend(reversed(subdirectories))
+
+
+def prefetch(items: Iterable[T]) -> Iterator[T]:
+    """
+    Iterate over items that are produced in a background thread, so that (for
+    example) a slow directory walk runs while the files found so far are being
+    searched. An exception in the thread is raised in the caller.
+    """
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                results.put((item, None))
+        except BaseException as e:
+            results.put((None, e))
+        finally:
+            results.put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = results.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        # Stop the thread if our caller does not want any more items.
+        stop.set()
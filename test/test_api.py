@@ -0,0 +1,81 @@
+import polars as pl
+import pytest
+import xlsxwriter
+from io import BytesIO, StringIO
+
+from xgrep import MatchRecord, search
+
+DATA = "name,age\ncyril,32\nmaria,81\n"
+
+
+def buffer(data: str = DATA) -> tuple[str, StringIO]:
+    return "data.csv", StringIO(data)
+
+
+class TestSearch:
+    def test_records(self) -> None:
+        "Each matching cell must be given, in row order."
+        assert list(search("r|8", buffer())) == [
+            MatchRecord("data.csv", None, 2, 1, "name", (2, 3), ((2, 3),)),
+            MatchRecord("data.csv", None, 3, 1, "name", (2, 3), ((2, 3),)),
+            MatchRecord("data.csv", None, 3, 2, "age", (0, 1), ((0, 1),)),
+        ]
+
+    def test_spans(self) -> None:
+        "Every match in a cell must be given."
+        (record,) = search("a", buffer())
+        assert record.span == (1, 2)
+        assert record.spans == ((1, 2), (4, 5))
+
+    def test_no_header(self) -> None:
+        assert list(search("cyril", buffer(), header=False)) == [
+            MatchRecord("data.csv", None, 2, 1, None, (0, 5), ((0, 5),)),
+        ]
+
+    def test_invert(self) -> None:
+        "Rows with no matching cell must be given once each."
+        assert list(search("cyril", buffer(), invert=True)) == [
+            MatchRecord("data.csv", None, 3, None, None, None, None),
+        ]
+
+    @pytest.mark.parametrize("batch_size", (None, 1))
+    def test_max_count(self, batch_size) -> None:
+        records = search("r", buffer(), max_count=1, batch_size=batch_size)
+        assert [record.row for record in records] == [2]
+
+    def test_paths(self, tmp_path) -> None:
+        "Files must be searched in order, and Excel sheets must be named."
+        csv = tmp_path / "data.csv"
+        csv.write_text(DATA)
+        xlsx = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(xlsx) as workbook:
+            for name in "one", "two":
+                pl.DataFrame({"name": ["bob", "maria"]}).write_excel(
+                    workbook, worksheet=name
+                )
+        records = list(search("maria", str(xlsx), csv, sheet_id=0))
+        assert [(r.file, r.sheet, r.row) for r in records] == [
+            (str(xlsx), "one", 3),
+            (str(xlsx), "two", 3),
+            (str(csv), None, 3),
+        ]
+
+    def test_excel_buffer(self) -> None:
+        data = BytesIO()
+        with xlsxwriter.Workbook(data) as workbook:
+            pl.DataFrame({"name": ["maria"]}).write_excel(workbook, worksheet="one")
+        data.seek(0)
+        (record,) = search("maria", ("workbook.xlsx", data))
+        assert record == MatchRecord(
+            "workbook.xlsx", "one", 2, 1, "name", (0, 5), ((0, 5),)
+        )
+
+    def test_dataframes(self) -> None:
+        (df,) = search("mar", buffer(), dataframes=True)
+        assert df.to_dicts() == [
+            {"File": "data.csv", "Row": 3, "name": "maria", "age": "81"}
+        ]
+
+    def test_no_dataframe(self) -> None:
+        "No DataFrame must be given for a file with no match."
+        assert list(search("xxx", buffer(), dataframes=True)) == []
@@ -0,0 +1,226 @@
+import os
+import pickle
+import pytest
+import polars as pl
+import xlsxwriter
+from pathlib import Path
+from unittest.mock import patch
+
+from xgrep import grid
+from xgrep.cache import GridCache, MemoryCache, format_size, parse_size
+from xgrep.grid import grid_reader
+
+
+def make_workbook(path: Path, names: tuple[str, ...] = ("cyril", "maria")) -> Path:
+    with xlsxwriter.Workbook(path) as workbook:
+        for sheet in "one", "two":
+            pl.DataFrame(
+                {"name": [f"{sheet}-{name}" for name in names], "age": [32, 81]}
+            ).write_excel(workbook, worksheet=sheet)
+    return path
+
+
+def read(path: Path, cache: GridCache | MemoryCache, **kwargs) -> list[tuple]:
+    return [
+        (g.filename, g.col_names, g.rows)
+        for g in grid_reader(path, sheet_id=0, cache=cache, **kwargs)
+    ]
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    (
+        ("100", 100),
+        ("1K", 1024),
+        ("1.5M", 1536 * 1024),
+        ("2GB", 2 << 30),
+        ("2g", 2 << 30),
+    ),
+)
+def test_parse_size(size, expected):
+    assert parse_size(size) == expected
+
+
+@pytest.mark.parametrize("size", ("", "M", "abc", "-1K"))
+def test_parse_bad_size(size):
+    with pytest.raises(ValueError):
+        parse_size(size)
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    ((0, "0B"), (1023, "1023B"), (1024, "1.0K"), (5 << 20, "5.0M")),
+)
+def test_format_size(size, expected):
+    assert format_size(size) == expected
+
+
+class TestGridCache:
+    def test_hit(self, tmp_path) -> None:
+        "A second read must give the same grids, without opening the workbook."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        first = read(path, cache)
+
+        with patch.object(grid.fastexcel, "read_excel") as read_excel:
+            second = read(path, cache)
+            read_excel.assert_not_called()
+
+        assert first == second
+        assert cache.hits == 2
+        assert cache.misses == 2
+
+    def test_changed_file(self, tmp_path) -> None:
+        "A changed file must be read again."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        read(path, cache)
+        make_workbook(path, names=("bob", "alice"))
+        # Make sure the modification time differs, even if the size does not.
+        os.utime(path, ns=(0, 0))
+        assert read(path, cache)[0][2] == (("one-bob", 32), ("one-alice", 81))
+
+    @pytest.mark.parametrize("hash_content", (False, True))
+    def test_hash_content(self, tmp_path, hash_content) -> None:
+        """
+        A file whose content changes without its size or modification time
+        changing must only be identified as changed if its content is hashed.
+        """
+        path = tmp_path / "workbook.xlsx"
+        cache = GridCache(tmp_path / "cache", hash_content=hash_content)
+        path.write_bytes(b"before")
+        os.utime(path, ns=(0, 0))
+        before = cache._fingerprint(path)
+        path.write_bytes(b"after!")
+        os.utime(path, ns=(0, 0))
+        assert (cache._fingerprint(path) != before) == hash_content
+
+    def test_options_in_key(self, tmp_path) -> None:
+        "Sheets read with different options must be cached separately."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        with_header = read(path, cache)
+        without_header = read(path, cache, header=False)
+        assert with_header != without_header
+        assert read(path, cache, header=False) == without_header
+
+    def test_stats(self, tmp_path) -> None:
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        read(path, cache)
+        stats = cache.stats()
+        assert stats["sheets"] == 2
+        assert stats["workbooks"] == 1
+        assert stats["size"] > 0
+
+    def test_stats_no_directory(self, tmp_path) -> None:
+        "A cache directory that does not exist must be empty."
+        cache = GridCache(tmp_path / "cache")
+        assert cache.stats() == dict(sheets=0, workbooks=0, size=0)
+
+    def test_clear(self, tmp_path) -> None:
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        read(path, cache)
+        assert cache.clear() == 3
+        assert cache.stats()["size"] == 0
+
+    def test_evict_least_recently_used(self, tmp_path) -> None:
+        "The least recently used entries must be evicted first."
+        old = make_workbook(tmp_path / "old.xlsx")
+        new = make_workbook(tmp_path / "new.xlsx")
+        cache = GridCache(tmp_path / "cache")
+        read(old, cache)
+        for entry in cache.entries():
+            os.utime(entry.path, ns=(0, 0))
+        read(new, cache)
+        new_size = cache.stats()["size"] // 2
+
+        cache.evict(new_size)
+        assert cache.stats()["workbooks"] == 1
+
+        with patch.object(grid.fastexcel, "read_excel") as read_excel:
+            read(new, cache)
+            read_excel.assert_not_called()
+
+    def test_max_size(self, tmp_path) -> None:
+        "The cache must not grow beyond its maximum size."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache", max_size=0)
+        first = read(path, cache)
+        # Only the entry written most recently is kept.
+        assert len(list(cache.entries())) == 1
+        assert read(path, cache) == first
+
+    def test_evict_when_too_large(self, tmp_path) -> None:
+        """
+        The cache directory must only be scanned for entries to evict when the
+        first entry is stored, and when the cache has grown too large.
+        """
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = GridCache(tmp_path / "cache", max_size=10**9)
+        with patch.object(
+            GridCache, "evict", autospec=True, wraps=GridCache.evict
+        ) as evict:
+            read(path, cache)
+            read(make_workbook(tmp_path / "other.xlsx"), cache)
+        assert evict.call_count == 1
+
+        cache.max_size = cache.stats()["size"]
+        with patch.object(
+            GridCache, "evict", autospec=True, wraps=GridCache.evict
+        ) as evict:
+            read(make_workbook(tmp_path / "third.xlsx"), cache)
+        assert evict.called
+        assert cache.stats()["size"] <= cache.max_size
+
+
+class TestMemoryCache:
+    def test_hit(self, tmp_path) -> None:
+        "A second read must give the same grids, without opening the workbook."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = MemoryCache()
+        first = read(path, cache)
+
+        with patch.object(grid.fastexcel, "read_excel") as read_excel:
+            second = read(path, cache)
+            read_excel.assert_not_called()
+
+        assert first == second
+        assert cache.hits == 2
+        assert cache.misses == 2
+        assert cache.stats()["sheets"] == 2
+        assert cache.stats()["workbooks"] == 1
+
+    def test_changed_file(self, tmp_path) -> None:
+        "A changed file must be read again, and its old entries dropped."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = MemoryCache()
+        read(path, cache)
+        make_workbook(path, names=("bob", "alice"))
+        os.utime(path, ns=(0, 0))
+        assert read(path, cache)[0][2] == (("one-bob", 32), ("one-alice", 81))
+        assert cache.stats()["sheets"] == 2
+
+    def test_max_size(self, tmp_path) -> None:
+        "The least recently used sheets must be dropped first."
+        old = make_workbook(tmp_path / "old.xlsx")
+        new = make_workbook(tmp_path / "new.xlsx")
+        cache = MemoryCache()
+        read(old, cache)
+        cache.max_size = cache.size
+        read(new, cache)
+        assert cache.size <= cache.max_size
+
+        with patch.object(grid.fastexcel, "read_excel") as read_excel:
+            read(new, cache)
+            read_excel.assert_not_called()
+
+    def test_pickle(self, tmp_path) -> None:
+        "A pickled cache (e.g., sent to a worker process) must be empty."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        cache = MemoryCache(max_size=100)
+        read(path, cache)
+        copy = pickle.loads(pickle.dumps(cache))
+        assert copy.max_size == 100
+        assert copy.stats()["sheets"] == 0
@@ -1,6 +1,13 @@
+import os
+import sys
+import pytest
+import subprocess
+import polars as pl
+import xlsxwriter
 from click.testing import CliRunner
+from unittest.mock import patch
 
-from xgrep.cli import cli
+from xgrep.cli import cache, cli, main
 
 
 class TestCli:
@@ -21,3 +28,656 @@ class TestCli:
         result = runner.invoke(cli, ["pattern"])
         assert result.exit_code == 2
         assert "Missing argument 'FILENAMES...'" in result.output
+
+
+class TestPatterns:
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,3.2\nmaria,81\nbob,7\n")
+        return path
+
+    def test_regexps(self, path):
+        "Rows matching any -e pattern must be output."
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--format", "csv", "-e", "cyr", "-e", "^b.b$", str(path)]
+        )
+        assert result.exit_code == 0
+        assert result.output == "name,age\ncyril,3.2\nbob,7\n"
+
+    def test_pattern_file(self, path, tmp_path):
+        "Patterns must be read from a -f file, and combined with -e patterns."
+        patterns = tmp_path / "patterns.txt"
+        patterns.write_text("cyr\nmar\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-c", "-f", str(patterns), "-e", "bob", str(path)])
+        assert result.exit_code == 0
+        assert result.output == "3\n"
+
+    def test_empty_pattern_file(self, path, tmp_path):
+        "An empty -f file must match nothing."
+        patterns = tmp_path / "patterns.txt"
+        patterns.write_text("")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-c", "-f", str(patterns), str(path)])
+        assert result.exit_code == 1
+
+    def test_fixed_strings(self, path):
+        "With -F, regex characters in patterns must be literal."
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-c", "-F", "-e", "3.2", "-e", "b.b", str(path)])
+        assert result.output == "1\n"
+
+    def test_no_files(self):
+        "With -e, the first argument must not be taken to be the pattern."
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-e", "cyril"])
+        assert result.exit_code == 2
+        assert "Missing argument 'FILENAMES...'" in result.output
+
+    def test_missing_file(self):
+        "With -e, the first argument must be checked like any other filename."
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-e", "cyril", "/no/such/file.csv"])
+        assert result.exit_code == 2
+        assert "'/no/such/file.csv' does not exist" in result.output
+
+
+class TestColumns:
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = tmp_path / "file.csv"
+        path.write_text("name,age,city\ncyril,32,paris\nmaria,81,cyrilton\n")
+        return path
+
+    @pytest.mark.parametrize(
+        "options", (["--cols", "city"], ["--cr", "^ci"], ["--cl", "C"])
+    )
+    def test_selected(self, path, options):
+        "Only the selected columns must be matched and shown."
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--format", "csv", "--ec", *options, "cyril", str(path)]
+        )
+        assert result.exit_code == 0
+        assert result.output == "city (C)\ncyrilton\n"
+
+    def test_show_all_cols(self, path):
+        "With --show-all-cols, all the columns of matching rows must be shown."
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--format", "csv", "--cols", "city", "--sac", "cyril", str(path)]
+        )
+        assert result.exit_code == 0
+        assert result.output == "name,age,city\nmaria,81,cyrilton\n"
+
+    def test_bad_letters(self, path):
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--cl", "A:3", "cyril", str(path)])
+        assert result.exit_code == 2
+        assert "Invalid Excel column label '3'" in result.output
+
+
+class TestJobs:
+    @pytest.mark.parametrize(
+        "options",
+        (
+            ["--format", "csv", "--rn"],
+            ["--format", "rich"],
+            ["-c"],
+            ["--only-filename"],
+        ),
+    )
+    def test_same_output(self, tmp_path, options):
+        """
+        Searching files in parallel must give the same output as searching
+        them one at a time.
+        """
+        filenames = []
+        for i in range(4):
+            path = tmp_path / f"file-{i}.csv"
+            path.write_text("name,age\n" + f"cyril,{i}\n" * (i + 1) + "maria,81\n")
+            filenames.append(str(path))
+
+        runner = CliRunner()
+        serial = runner.invoke(cli, options + ["cyril|8", *filenames])
+        parallel = runner.invoke(cli, options + ["-j", "3", "cyril|8", *filenames])
+        assert serial.exit_code == parallel.exit_code == 0
+        assert serial.output == parallel.output
+
+    @pytest.mark.parametrize(
+        "options",
+        (
+            ["--format", "csv", "--rn"],
+            ["-c"],
+            ["--only-filename"],
+            ["-q"],
+        ),
+    )
+    def test_parallel_sheets(self, tmp_path, options):
+        """
+        Searching the sheets of a workbook in parallel must give the same
+        output as searching them one at a time. The workbook's sheets must be
+        found by a worker, not by opening it in the main process.
+        """
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            for i in range(3):
+                pl.DataFrame(
+                    {"name": ["cyril"] * (i + 1) + ["maria"], "age": [i] * (i + 2)}
+                ).write_excel(workbook, worksheet=f"sheet-{i}")
+        csv = tmp_path / "file.csv"
+        csv.write_text("name,age\ncyril,1\n")
+        filenames = [str(path), str(csv)]
+
+        runner = CliRunner()
+        serial = runner.invoke(cli, options + ["cyril|1", *filenames])
+        with patch("xgrep.parallel.Workbook") as workbook:
+            parallel = runner.invoke(
+                cli, options + ["-j", "2", "--parallel-sheets", "cyril|1", *filenames]
+            )
+        workbook.assert_not_called()
+        assert serial.exit_code == parallel.exit_code == 0
+        assert serial.output == parallel.output
+
+
+class TestBatchSize:
+    @pytest.mark.parametrize("batch_size", ("1", "2", "3"))
+    @pytest.mark.parametrize(
+        "options",
+        (
+            ["--format", "csv"],
+            ["--format", "csv", "-n"],
+            ["-c"],
+            ["-c", "-v"],
+            ["--format", "csv", "-n", "-v"],
+        ),
+    )
+    def test_same_output(self, tmp_path, batch_size, options):
+        """
+        The output (including row numbers and counts) must not depend on the
+        batch size, with blank lines and stray quotes in the file.
+        """
+        path = tmp_path / "file.csv"
+        path.write_text('a,b\n1,2\n\n\n3,cat\n5,"c\nat"\n\n4,6" cat\n')
+        runner = CliRunner()
+        args = [*options, "cat", str(path)]
+        expected = runner.invoke(cli, args)
+        result = runner.invoke(cli, ["--batch-size", batch_size, *args])
+        assert result.exit_code == expected.exit_code == 0
+        assert result.output == expected.output
+
+
+class TestEarlyTermination:
+    def test_only_filename(self, tmp_path):
+        """
+        A matching file's name must only be printed once, even if it has many
+        matches.
+        """
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\nmaria,81\n")
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--only-filename", "--batch-size", "1", "[a-z]", str(path)]
+        )
+        assert result.exit_code == 0
+        assert result.output == f"{path}\n"
+
+    def test_quiet_stops_at_first_match(self, tmp_path):
+        """
+        With --quiet, files after the first one with a match must not be read.
+        """
+        good = tmp_path / "good.csv"
+        good.write_text("name,age\ncyril,32\n")
+        # A file that cannot be read, but that must not be.
+        bad = tmp_path / "bad.csv"
+        bad.write_text("name,age\ncyril,32,extra,fields\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-q", "cyril", str(good), str(bad)])
+        assert result.exit_code == 0
+        assert result.output == ""
+
+    def test_quiet_no_match(self, tmp_path):
+        "With --quiet and no match, the exit status must be 1."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-q", "maria", str(path)])
+        assert result.exit_code == 1
+        assert result.output == ""
+
+    @pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+    def test_quiet_jobs_stops_at_first_match(self, tmp_path):
+        """
+        With --quiet and --jobs, the search must end as soon as a file has a
+        match, without waiting for workers still searching other files.
+        """
+        good = tmp_path / "good.csv"
+        good.write_text("name,age\ncyril,32\n")
+        # A worker reading this waits forever, since nothing writes to it.
+        fifo = tmp_path / "fifo.csv"
+        os.mkfifo(fifo)
+        script = "import sys\nfrom xgrep.cli import main\nsys.exit(main())\n"
+        result = subprocess.run(
+            [sys.executable, "-c", script, "-q", "-j", "2", "cyril"]
+            + [str(fifo), str(good)],
+            capture_output=True,
+            timeout=60,
+        )
+        assert result.returncode == 0
+
+    @pytest.mark.parametrize("batch_size", ([], ["--batch-size", "1"]))
+    @pytest.mark.parametrize("jobs", ([], ["-j", "2"]))
+    def test_invert(self, tmp_path, batch_size, jobs):
+        """
+        With --invert, -q and --only-filename must give the same answer as a
+        full search: a file every row of which matches has no match.
+        """
+        every = tmp_path / "every.csv"
+        every.write_text("name\ncat\ncatfish\n")
+        some = tmp_path / "some.csv"
+        some.write_text("name\ncat\ndog\n")
+        runner = CliRunner()
+        args = [*batch_size, *jobs, "-v", "cat"]
+
+        for options in ["-q"], ["--only-filename"], []:
+            result = runner.invoke(cli, [*options, *args, str(every)])
+            assert result.exit_code == 1
+            assert result.output == ""
+
+        result = runner.invoke(cli, ["-q", *args, str(every), str(some)])
+        assert result.exit_code == 0
+        result = runner.invoke(cli, ["--only-filename", *args, str(every), str(some)])
+        assert result.exit_code == 0
+        assert result.output == f"{some}\n"
+
+    def test_count_invert(self, tmp_path):
+        "With -c and --invert, a file every row of which matches has a count of 0."
+        path = tmp_path / "file.csv"
+        path.write_text("name\ncat\ncatfish\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-c", "-v", "cat", str(path)])
+        assert result.exit_code == 1
+        assert result.output == "0\n"
+
+
+class TestRecursive:
+    def make_tree(self, tmp_path):
+        for name, text in (
+            ("b.csv", "name\ncyril\n"),
+            ("a/c.tsv", "name\ncyril\n"),
+            ("a/d.csv", "name\nmaria\n"),
+            ("a/notes.txt", "cyril\n"),
+        ):
+            path = tmp_path / name
+            path.parent.mkdir(exist_ok=True)
+            path.write_text(text)
+
+    def test_directory_without_recursive(self, tmp_path):
+        runner = CliRunner()
+        result = runner.invoke(cli, ["cyril", str(tmp_path)])
+        assert result.exit_code == -1
+        assert "Use --recursive (-r) to search directories" in result.output
+
+    def test_count(self, tmp_path):
+        "Files in a directory must be searched in order, with their names shown."
+        self.make_tree(tmp_path)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-r", "-c", "cyril", str(tmp_path)])
+        assert result.exit_code == 0
+        assert result.output == (
+            f"{tmp_path / 'b.csv'}:1\n" f"{tmp_path / 'a' / 'c.tsv'}:1\n"
+        )
+
+    def test_include_exclude(self, tmp_path):
+        self.make_tree(tmp_path)
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["-r", "--include", "*.csv", "--exclude", "b.*", "-c", ".", str(tmp_path)],
+        )
+        assert result.exit_code == 0
+        assert result.output == f"{tmp_path / 'a' / 'd.csv'}:1\n"
+
+    def test_ignore_file(self, tmp_path):
+        self.make_tree(tmp_path)
+        ignore_file = tmp_path / "ignore"
+        ignore_file.write_text("a/\n")
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            [
+                "-r",
+                "--ignore-file",
+                str(ignore_file),
+                "--only-filename",
+                ".",
+                str(tmp_path),
+            ],
+        )
+        assert result.exit_code == 0
+        assert result.output == f"{tmp_path / 'b.csv'}\n"
+
+    def test_jobs(self, tmp_path):
+        "Searching a directory in parallel must give the same output."
+        self.make_tree(tmp_path)
+        runner = CliRunner()
+        serial = runner.invoke(cli, ["-r", "--format", "csv", ".", str(tmp_path)])
+        parallel = runner.invoke(
+            cli, ["-r", "-j", "2", "--format", "csv", ".", str(tmp_path)]
+        )
+        assert serial.exit_code == parallel.exit_code == 0
+        assert serial.output == parallel.output
+
+
+class TestExcelOutput:
+    @pytest.mark.parametrize("options", ([], ["--batch-size", "1"], ["-j", "2"]))
+    def test_constant_memory(self, tmp_path, options):
+        "Constant memory mode must write the same values to the workbook."
+        filenames = []
+        for name in "a", "b":
+            path = tmp_path / f"{name}.csv"
+            path.write_text("name,age\ncyril,32\nmaria,81\nbob,7\n")
+            filenames.append(str(path))
+
+        sheets = []
+        for constant_memory in [], ["--constant-memory"]:
+            out = tmp_path / f"out{len(sheets)}.xlsx"
+            runner = CliRunner()
+            result = runner.invoke(
+                cli,
+                ["--format", "excel", "-o", str(out), "-b", "--rn", *constant_memory]
+                + options
+                + ["r", *filenames],
+            )
+            assert result.exit_code == 0
+            sheets.append(pl.read_excel(out, sheet_id=0))
+
+        normal, constant = sheets
+        assert list(normal) == list(constant)
+        for name in normal:
+            assert normal[name].rows() == constant[name].rows()
+
+    def test_no_matches(self, tmp_path):
+        "If nothing matches, no workbook must be made."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        out = tmp_path / "out.xlsx"
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--format", "excel", "-o", str(out), "maria", str(path)]
+        )
+        assert result.exit_code == 1
+        assert not out.exists()
+
+
+class TestFrameOutput:
+    @pytest.mark.parametrize("options", ([], ["--batch-size", "1"], ["-j", "2"]))
+    def test_parquet(self, tmp_path, options):
+        "The matching rows of all files must be written to one typed file."
+        filenames = []
+        for name in "a", "b":
+            path = tmp_path / f"{name}.csv"
+            path.write_text("name,age\ncyril,32\nmaria,81\nbob,7\n")
+            filenames.append(str(path))
+        out = tmp_path / "out.parquet"
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["--format", "parquet", "-o", str(out), "-b", "--rn", *options]
+            + ["r", *filenames],
+        )
+        assert result.exit_code == 0
+        df = pl.read_parquet(out)
+        assert df.schema["Row"] == pl.Int64
+        assert df.rows() == [
+            ("a.csv", 2, "cyril", "32"),
+            ("a.csv", 3, "maria", "81"),
+            ("b.csv", 2, "cyril", "32"),
+            ("b.csv", 3, "maria", "81"),
+        ]
+
+    def test_typed_columns(self, tmp_path):
+        """
+        Columns must keep their types from an Excel sheet, and files with
+        different columns must all be written.
+        """
+        workbook_path = tmp_path / "a.xlsx"
+        with xlsxwriter.Workbook(workbook_path) as workbook:
+            pl.DataFrame({"name": ["cyril", "maria"], "age": [32, 81]}).write_excel(
+                workbook
+            )
+        csv_path = tmp_path / "b.csv"
+        csv_path.write_text("name,city\ncyril,lima\n")
+        out = tmp_path / "out.parquet"
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["--format", "parquet", "-o", str(out), "-b", "cyril"]
+            + [str(workbook_path), str(csv_path)],
+        )
+        assert result.exit_code == 0
+        df = pl.read_parquet(out)
+        assert df.schema["age"] == pl.Int64
+        assert df.rows() == [
+            ("a.xlsx+Sheet1", "cyril", 32, None),
+            ("b.csv", "cyril", None, "lima"),
+        ]
+
+    def test_no_out(self, tmp_path):
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--format", "ndjson", "cyril", str(path)])
+        assert result.exit_code == -1
+        assert "--out" in result.output
+
+    def test_no_pyarrow(self, tmp_path):
+        "Without pyarrow, asking for Parquet output must give an error."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        out = tmp_path / "out.parquet"
+        runner = CliRunner()
+        with patch.dict(sys.modules, {"pyarrow": None}):
+            result = runner.invoke(
+                cli, ["--format", "parquet", "-o", str(out), "cyril", str(path)]
+            )
+        assert result.exit_code == -1
+        assert "xgrep[arrow]" in result.output
+        assert not out.exists()
+
+
+class TestCache:
+    def test_cached_search(self, tmp_path):
+        "A search using the cache must give the same output as one without."
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            pl.DataFrame({"name": ["cyril", "maria"], "age": [32, 81]}).write_excel(
+                workbook
+            )
+
+        runner = CliRunner()
+        args = ["--format", "csv", "cyril", str(path)]
+        uncached = runner.invoke(cli, args)
+        cache_args = ["--cache-dir", str(tmp_path / "cache")]
+        first = runner.invoke(cli, cache_args + args)
+        second = runner.invoke(cli, cache_args + args)
+        assert uncached.exit_code == first.exit_code == second.exit_code == 0
+        assert uncached.output == first.output == second.output
+
+        result = runner.invoke(cache, ["stats", *cache_args])
+        assert result.exit_code == 0
+        assert "Sheets: 1\n" in result.output
+
+        result = runner.invoke(cache, ["clear", *cache_args])
+        assert result.exit_code == 0
+        assert result.output == "Removed 2 cache entries.\n"
+
+    def test_bad_cache_size(self, tmp_path):
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--cache-size", "lots", "x", __file__])
+        assert result.exit_code == 2
+        assert "Could not parse size" in result.output
+
+
+class TestMain:
+    def test_command(self, tmp_path):
+        "A command name followed by one of its subcommands must run the command."
+        with (
+            patch(
+                "sys.argv", ["xgrep", "cache", "stats", "--cache-dir", str(tmp_path)]
+            ),
+            patch("xgrep.cli.cli") as cli_,
+            pytest.raises(SystemExit) as e,
+        ):
+            main()
+        assert e.value.code == 0
+        cli_.assert_not_called()
+
+    def test_pattern(self, tmp_path):
+        "A command name that is not followed by a subcommand is a pattern."
+        path = tmp_path / "file.csv"
+        with (
+            patch("sys.argv", ["xgrep", "cache", str(path)]),
+            patch("xgrep.cli.cli") as cli_,
+        ):
+            main()
+        cli_.assert_called_once_with()
+
+
+class TestMaxCount:
+    def test_batches(self, tmp_path):
+        "Batches after the one with the last row wanted must not be read."
+        path = tmp_path / "file.csv"
+        # The last row cannot be read, but it must not be.
+        path.write_text("name,age\ncyril,32\nmaria,81\ncyril,7\nbob,1,extra\n")
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["-m", "2", "--batch-size", "1", "--format", "csv", "--rn", "cyril|8"]
+            + [str(path)],
+        )
+        assert result.exit_code == 0
+        assert result.output == "Row,name,age\n2,cyril,32\n3,maria,81\n"
+
+    @pytest.mark.parametrize("jobs", ("1", "2"))
+    def test_sheets(self, tmp_path, jobs):
+        "The rows of all the sheets of a workbook must be counted together."
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            for i in range(3):
+                pl.DataFrame({"name": ["cyril", "cyril"]}).write_excel(
+                    workbook, worksheet=f"sheet-{i}"
+                )
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["-j", jobs, "--ps", "-m", "3", "-c", "cyril", str(path)]
+        )
+        assert result.exit_code == 0
+        assert result.output == "2\n1\n"
+
+    @pytest.mark.parametrize("batch_size", ("1", "2", "4"))
+    def test_invert_batches(self, tmp_path, batch_size):
+        """
+        With --invert, only the rows of batches that are output must be
+        counted, whether or not the batches have a matching cell.
+        """
+        path = tmp_path / "file.csv"
+        path.write_text("name\ncat\ncat\ndog\ncat\ncow\ncatfish\nemu\nyak\n")
+        runner = CliRunner()
+        args = ["-v", "-m", "3", "--format", "csv", "cat", str(path)]
+        batched = runner.invoke(cli, ["--batch-size", batch_size, *args])
+        assert batched.exit_code == 0
+        assert batched.output == runner.invoke(cli, args).output
+        assert batched.output == "name\ndog\ncow\nemu\n"
+
+    def test_zero(self, tmp_path):
+        "As with grep, -m 0 must find nothing."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["-m", "0", "cyril", str(path)])
+        assert result.exit_code == 1
+        assert result.output == ""
+
+
+class TestOnlyMatching:
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = tmp_path / "file.csv"
+        path.write_text('id,notes\n1,"see T-12, T-345"\n2,none\n3,T-6\n')
+        return str(path)
+
+    def test_matches(self, path):
+        "Each match must be output on its own row."
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["--only-matching", "--format", "csv", "-n", r"T-\d+", path]
+        )
+        assert result.exit_code == 0
+        assert result.output == "Row,Match\n2,T-12\n2,T-345\n4,T-6\n"
+
+    def test_invert(self, path):
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--only-matching", "-v", "T", path])
+        assert result.exit_code == -1
+        assert "--only-matching and --invert" in result.output
+
+
+class TestImports:
+    """
+    Test that the heavy dependencies are only imported when they are needed.
+    """
+
+    # Run xgrep in a new process, and print the heavy modules it imported.
+    SCRIPT = """
+import sys
+from xgrep.cli import main
+sys.argv = ["xgrep", *sys.argv[1:]]
+try:
+    main()
+except SystemExit:
+    pass
+print(
+    "Imported:",
+    *(m for m in ("polars", "rich", "xlsxwriter") if m in sys.modules),
+    file=sys.stderr,
+)
+"""
+
+    def imported(self, *args: str) -> set[str]:
+        result = subprocess.run(
+            [sys.executable, "-c", self.SCRIPT, *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return set(result.stderr.splitlines()[-1].split()[1:])
+
+    def test_help(self):
+        assert self.imported("--help") == set()
+
+    def test_usage_error(self):
+        assert self.imported("--no-such-option") == set()
+
+    @pytest.mark.parametrize(
+        "options",
+        (
+            ["-q"],
+            ["-c"],
+            ["--only-filename"],
+            ["-c", "--format", "tsv"],
+            ["--format", "csv"],
+        ),
+    )
+    def test_text_output(self, tmp_path, options):
+        "Output that is only text must not import rich or xlsxwriter."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        assert self.imported(*options, "cyril", str(path)) == {"polars"}
+
+    def test_rich(self, tmp_path):
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        assert self.imported("cyril", str(path)) == {"polars", "rich"}
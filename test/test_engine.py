@@ -0,0 +1,366 @@
+import re
+import sys
+from datetime import date, datetime
+import pytest
+import polars as pl
+
+from xgrep.engine import (
+    SPAN,
+    Literals,
+    any_match,
+    can_match_empty,
+    contains,
+    deduplicated,
+    literal_set,
+    low_cardinality,
+    literal_strings,
+    match_mask,
+    match_spans,
+    polars_pattern,
+    re_contains,
+    stringify,
+)
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    (
+        ("abc", "abc"),
+        ("a|b", "a|b"),
+        ("[]a]", "[]a]"),
+        (r"\$", r"\$"),
+        ("[$]", "[$]"),
+        ("a$", r"a(?:\n?\z)"),
+        ("(a$|b$)", r"(a(?:\n?\z)|b(?:\n?\z))"),
+    ),
+)
+def test_translated(pattern, expected):
+    assert polars_pattern(re.compile(pattern)) == expected
+
+
+def test_ignore_case():
+    assert polars_pattern(re.compile("abc", re.I)) == "(?i)abc"
+
+
+@pytest.mark.parametrize(
+    "pattern", ("i.", "I", "[h-j]", "[^a-z]", r"\w+x", "s", "k", "(?:i|z)")
+)
+def test_ignore_case_dotless_i(pattern):
+    """
+    Ignoring case, Python takes 'İ' and 'ı' to be equal to 'i', and 'ſ' and
+    'K' to be equal to 's' and 'k'. Polars must match the same values.
+    """
+    values = ["İx", "ıx", "ix", "Ix", "ſ", "K", "x", "é"]
+    regex = re.compile(pattern, re.I)
+    translated = polars_pattern(regex)
+    assert translated is not None
+    assert contains(pl.Series(values), translated).to_list() == [
+        regex.search(value) is not None for value in values
+    ]
+
+
+@pytest.mark.parametrize(
+    "pattern, flags",
+    (
+        ("ı", re.I),
+        ("é", re.I),
+        (r"\xe9", re.I),
+        ("(?-i:i)", re.I),
+        ("(?i:i)", 0),
+    ),
+)
+def test_ignore_case_unsupported(pattern, flags):
+    "Patterns that Polars cannot match as Python would must not be used."
+    assert polars_pattern(re.compile(pattern, flags)) is None
+
+
+def test_multiline_dollar():
+    assert polars_pattern(re.compile("a$", re.M)) == "(?m)a$"
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    (
+        r"(a)\1",
+        "a(?=b)",
+        "(?<!a)b",
+        "a{,3}",
+        r"\<a",
+        "[a[b]",
+        "[[:alpha:]]",
+        "[a&&b]",
+        "a$b",
+    ),
+)
+def test_unsupported(pattern):
+    assert polars_pattern(re.compile(pattern)) is None
+
+
+@pytest.mark.parametrize(
+    "pattern, flags",
+    (
+        (r"\s", 0),
+        (r"\S", 0),
+        (r"^\w+$", 0),
+        (r"^\W+$", 0),
+        (r"^[\w.]+$", 0),
+        (r"^[^\s]+$", 0),
+        (r"^[\W\d]+$", 0),
+        (r"\w+x", re.I),
+        (r"^\W+$", re.I),
+        (r"^[\s]+$", re.I),
+    ),
+)
+def test_unicode_classes(pattern, flags):
+    "Python's '\\w' and '\\s' must be matched with the same characters by Polars."
+    values = ["\x1c", "e\u0301", "a\u200cb", "x\u0301", "", "a b", "ſx", "\u0345", "é."]
+    regex = re.compile(pattern, flags)
+    translated = polars_pattern(regex)
+    assert translated is not None
+    assert contains(pl.Series(values), translated).to_list() == [
+        regex.search(value) is not None for value in values
+    ]
+
+
+def test_unicode_classes_all_characters():
+    "Every character must be matched by '\\w' and '\\s' as Python matches it."
+    values = pl.Series(
+        [chr(code) for code in range(sys.maxunicode + 1) if not 0xD800 <= code < 0xE000]
+    )
+    for pattern in (r"\w", r"\s"):
+        regex = re.compile(pattern)
+        assert contains(values, polars_pattern(regex)).to_list() == [
+            regex.search(value) is not None for value in values
+        ]
+
+
+@pytest.mark.parametrize("pattern", (r"x\b", r"\B", r"\bx", r"[\w]", r"[^\W]"))
+def test_unicode_classes_unsupported(pattern):
+    """
+    Word boundaries (which Rust finds with its own '\\w', and Python's '\\B' does
+    not match an empty value) and '\\w' in a class ignoring case cannot be
+    matched by Polars as Python would.
+    """
+    flags = re.I if "[" in pattern else 0
+    assert polars_pattern(re.compile(pattern, flags)) is None
+
+
+def test_unsupported_flags():
+    assert polars_pattern(re.compile("abc", re.ASCII)) is None
+
+
+def test_bytes():
+    assert polars_pattern(re.compile(b"abc")) is None
+
+
+def test_stringify_strings():
+    series = pl.Series(["a", None])
+    assert stringify(series).to_list() == ["a", "None"]
+
+
+def test_stringify_non_strings():
+    series = pl.Series([1.0, None, 3.5])
+    assert stringify(series).to_list() == ["1.0", "None", "3.5"]
+
+
+@pytest.mark.parametrize(
+    "values",
+    (
+        [1, 2, None],
+        [0.0, -0.0, None, float("nan"), 1.5],
+        [True, False, None],
+        [datetime(2024, 1, 2, 3, 4), None],
+        [date(2024, 1, 2), None],
+    ),
+)
+def test_stringify_low_cardinality(values):
+    "Each distinct value must be turned into the same string as str() gives."
+    series = pl.Series("x", values * 100)
+    strings = stringify(series)
+    assert strings.name == "x"
+    assert strings.to_list() == [str(value) for value in series.to_list()]
+
+
+def test_mask():
+    df = pl.DataFrame({"name": ["cyril", "maria"], "age": [32, 81]})
+    mask = match_mask(df, "r|8")
+    assert mask.columns == ["name", "age"]
+    assert mask.rows() == [(True, False), (True, True)]
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3))
+def test_any_match(chunk_size):
+    df = pl.DataFrame({"name": ["cyril", "maria", "bob"], "age": [32, 81, 8]})
+    assert any_match(df, "^8$", chunk_size=chunk_size)
+    assert not any_match(df, "^3$", chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    (
+        ("abc", ["abc"]),
+        ("cat|dog", ["cat", "dog"]),
+        (r"d\.g|a\|b", ["d.g", "a|b"]),
+        ("a|", ["a", ""]),
+        ("a.c", None),
+        ("(cat|dog)", None),
+        (r"\d", None),
+        ("a\\", None),
+    ),
+)
+def test_literal_strings(pattern, expected):
+    assert literal_strings(pattern) == expected
+
+
+def test_literal_set():
+    assert literal_set(re.compile("cat|dog")) == Literals(["cat", "dog"], False)
+    assert literal_set(re.compile("cat|dog", re.I)) == Literals(["cat", "dog"], True)
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    (
+        re.compile("a+|b"),
+        re.compile("cat", re.M),
+        re.compile("café", re.I),
+        re.compile(b"cat"),
+    ),
+)
+def test_no_literal_set(pattern):
+    assert literal_set(pattern) is None
+
+
+def test_contains_literals():
+    series = pl.Series(["a cat", "a dog", "a cow", "CAT"])
+    assert contains(series, Literals(["cat", "dog"], False)).to_list() == [
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_contains_literals_ignore_case():
+    """
+    Ignoring case must match the same values as Python's re.IGNORECASE,
+    including non-ASCII characters that are equal to an ASCII letter.
+    """
+    values = ["CAT", "ſkip", "Kelvin", "pİn", "pın", "pin", "skİp", "péin"]
+    regex = re.compile("cat|skip|kelvin|pin", re.I)
+    literals = literal_set(regex)
+    assert literals is not None
+    assert contains(pl.Series(values), literals).to_list() == [
+        bool(regex.search(value)) for value in values
+    ]
+
+
+def test_mask_literals():
+    df = pl.DataFrame({"name": ["cyril", "maria"], "age": [32, 81]})
+    mask = match_mask(df, Literals(["ril", "81"], False))
+    assert mask.rows() == [(True, False), (False, True)]
+    assert any_match(df, Literals(["32"], False))
+    assert not any_match(df, Literals(["33", "xyz"], False))
+
+
+def test_low_cardinality():
+    assert low_cardinality(pl.Series(["open", "closed"] * 5_000))
+    assert not low_cardinality(pl.Series([str(n) for n in range(10_000)]))
+
+
+def test_deduplicated():
+    "Each distinct value must be matched once, giving the same result."
+    values = pl.Series(["open", "closed", "pending"] * 1_000)
+    calls = []
+
+    def match(unique: pl.Series) -> pl.Series:
+        calls.append(len(unique))
+        return unique.str.contains("en")
+
+    assert deduplicated(values, match).equals(values.str.contains("en"))
+    assert calls == [3]
+
+
+@pytest.mark.parametrize(
+    "values",
+    (
+        ["open", "closed", "pending"] * 1_000,
+        [f"row {n}" for n in range(3_000)],
+    ),
+)
+def test_contains_deduplicated(values):
+    "Matching each distinct value once must not change which values match."
+    series = pl.Series("state", values)
+    regex = re.compile("en|1")
+    expected = [regex.search(value) is not None for value in values]
+    assert contains(series, "en|1").to_list() == expected
+    assert contains(series, Literals(["en", "1"], False)).to_list() == expected
+    result = re_contains(series, regex)
+    assert result.name == "state"
+    assert result.to_list() == expected
+
+
+def test_re_contains_once():
+    "A Python regex must only be run once on each value of a repetitive column."
+
+    class Counting:
+        def __init__(self, pattern: str) -> None:
+            self.regex = re.compile(pattern)
+            self.calls = 0
+
+        def search(self, value: str) -> re.Match | None:
+            self.calls += 1
+            return self.regex.search(value)
+
+    pattern = Counting("clo")
+    values = pl.Series(["open", "closed"] * 5_000)
+    assert re_contains(values, pattern).sum() == 5_000
+    assert pattern.calls == 2
+
+
+def test_spans():
+    "Every match in each value must be found, each distinct value only once."
+    series = pl.Series(["wö wöö", "x", "wö wöö", ""])
+    spans = match_spans(series, re.compile("wö+"))
+    assert spans.to_list() == [
+        [dict(start=0, end=2), dict(start=3, end=6)],
+        [],
+        [dict(start=0, end=2), dict(start=3, end=6)],
+        [],
+    ]
+    assert match_spans(series.clear(), re.compile("x")).dtype == pl.List(SPAN)
+
+
+@pytest.mark.parametrize(
+    "pattern, flags",
+    (
+        ("wö+", 0),
+        ("a+b|b", 0),
+        ("K", re.IGNORECASE),
+        (r"^\w|\w$", re.MULTILINE),
+        # Python's '$' does not match a final newline, and Python and Rust go on
+        # differently after an empty match.
+        ("b$", 0),
+        ("a*", 0),
+        (r"\d*", 0),
+        (r"[a-z]* ?", 0),
+    ),
+)
+def test_spans_polars(pattern, flags):
+    "Matching with Polars must give the same offsets as with Python's re module."
+    series = pl.Series(
+        ["wö wöö", "xaabaab", "kelvin K", "ab\nb\n", "", "baab", "12 34", "abc def"]
+    )
+    regex = re.compile(pattern, flags)
+    assert polars_pattern(regex) is not None
+    assert match_spans(series, regex, polars_pattern(regex)).to_list() == [
+        [dict(start=m.start(), end=m.end()) for m in regex.finditer(value)]
+        for value in series
+    ]
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    (("a+", False), ("a|b", False), ("a*", True), (r"\d*\b", True), ("^", True)),
+)
+def test_can_match_empty(pattern, expected):
+    assert can_match_empty(re.compile(pattern)) == expected
@@ -1,6 +1,12 @@
 import pytest
+import polars as pl
 
-from xgrep.excel import int_to_excel_column
+from xgrep.excel import (
+    ExcelWriter,
+    excel_column_numbers,
+    excel_column_to_int,
+    int_to_excel_column,
+)
 
 
 def test_zero():
@@ -24,3 +30,70 @@ def test_zero():
 )
 def test_label(number, expected):
     assert int_to_excel_column(number) == expected
+
+
+@pytest.mark.parametrize("number", (1, 26, 27, 52, 26 * 26 + 1, 26 * 26 * 26))
+def test_label_to_int(number):
+    assert excel_column_to_int(int_to_excel_column(number)) == number
+
+
+def test_lower_case_label():
+    assert excel_column_to_int("ab") == 28
+
+
+@pytest.mark.parametrize("label", ("", "1", "A1", "É"))
+def test_invalid_label(label):
+    with pytest.raises(ValueError):
+        excel_column_to_int(label)
+
+
+def test_column_numbers():
+    assert excel_column_numbers("A, C:E,D") == {1, 3, 4, 5}
+
+
+def test_reversed_range():
+    with pytest.raises(ValueError):
+        excel_column_numbers("C:A")
+
+
+def make_writer(path, save_empty_output=False, constant_memory=False):
+    return ExcelWriter(
+        path,
+        save_empty_output,
+        ":",
+        drop_filenames=False,
+        quiet=True,
+        constant_memory=constant_memory,
+    )
+
+
+class TestExcelWriter:
+    def test_nothing_written(self, tmp_path):
+        "If nothing is written, no workbook must be made (or left in place)."
+        path = tmp_path / "out.xlsx"
+        path.write_text("old output")
+        writer = make_writer(path)
+        writer.write(pl.DataFrame({"name": []}), "file.csv")
+        writer.close()
+        assert not path.exists()
+
+    def test_save_empty_output(self, tmp_path):
+        path = tmp_path / "out.xlsx"
+        writer = make_writer(path, save_empty_output=True)
+        writer.close()
+        assert path.exists()
+
+    @pytest.mark.parametrize("constant_memory", (False, True))
+    def test_batches(self, tmp_path, constant_memory):
+        "Batches of rows must be written to the same sheet, in order."
+        path = tmp_path / "out.xlsx"
+        writer = make_writer(path, constant_memory=constant_memory)
+        writer.write(pl.DataFrame({"name": [], "age": []}), "a.csv")
+        writer.write(pl.DataFrame({"name": ["cyril"], "age": ["32"]}), append=True)
+        writer.write(pl.DataFrame({"name": ["maria"], "age": ["81"]}), append=True)
+        writer.write(pl.DataFrame({"city": ["lima"]}), "b.csv")
+        writer.close()
+        sheets = pl.read_excel(path, sheet_id=0)
+        assert list(sheets) == ["a.csv", "b.csv"]
+        assert sheets["a.csv"].rows() == [("cyril", 32), ("maria", 81)]
+        assert sheets["b.csv"].rows() == [("lima",)]
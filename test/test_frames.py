@@ -0,0 +1,116 @@
+import pytest
+import polars as pl
+from unittest.mock import patch
+
+from xgrep.frames import FRAME_FORMATS, FrameWriter
+
+READERS = dict(arrow=pl.read_ipc, ndjson=pl.read_ndjson, parquet=pl.read_parquet)
+
+
+def write(path, format_, *dfs, save_empty_output=False) -> None:
+    writer = FrameWriter(path, format_, save_empty_output, quiet=True)
+    for df in dfs:
+        writer.write(df, "file.csv")
+    writer.close()
+
+
+class TestFrameWriter:
+    @pytest.mark.parametrize("format_", FRAME_FORMATS)
+    def test_append(self, tmp_path, format_):
+        "All DataFrames must be written to the file, keeping their types."
+        path = tmp_path / f"out.{format_}"
+        dfs = (
+            pl.DataFrame({"File": ["a.csv"], "Row": [2], "name": ["cyril"]}),
+            pl.DataFrame({"File": [], "Row": [], "name": []}),
+            pl.DataFrame({"File": ["b.csv"] * 2, "Row": [3, 4], "name": ["a", "b"]}),
+        )
+        write(path, format_, *dfs)
+        assert READERS[format_](path).to_dicts() == [
+            dict(File="a.csv", Row=2, name="cyril"),
+            dict(File="b.csv", Row=3, name="a"),
+            dict(File="b.csv", Row=4, name="b"),
+        ]
+
+    @pytest.mark.parametrize("format_", ("arrow", "parquet"))
+    def test_missing_columns(self, tmp_path, format_):
+        "Columns missing from a later DataFrame must be null."
+        path = tmp_path / f"out.{format_}"
+        write(
+            path,
+            format_,
+            pl.DataFrame({"File": ["a.csv"], "Row": [2]}),
+            pl.DataFrame({"File": ["b.csv"]}),
+        )
+        assert READERS[format_](path).rows() == [("a.csv", 2), ("b.csv", None)]
+
+    @pytest.mark.parametrize("format_", ("arrow", "parquet"))
+    def test_extra_columns(self, tmp_path, format_):
+        """
+        The file must have the columns of all the DataFrames, with types that
+        can hold all their values.
+        """
+        path = tmp_path / f"out.{format_}"
+        write(
+            path,
+            format_,
+            pl.DataFrame({"name": ["cyril"], "age": [32]}),
+            pl.DataFrame({"name": ["maria"], "age": [81]}),
+            pl.DataFrame({"city": ["lima"], "age": ["old"]}),
+            pl.DataFrame({"name": ["bob"]}),
+            pl.DataFrame({"name": ["eve"], "zip": [1]}),
+        )
+        # The part files are not left behind.
+        assert list(tmp_path.iterdir()) == [path]
+        df = READERS[format_](path)
+        assert df.schema == pl.Schema(
+            dict(name=pl.String, age=pl.String, city=pl.String, zip=pl.Int64)
+        )
+        assert df.rows() == [
+            ("cyril", "32", None, None),
+            ("maria", "81", None, None),
+            (None, "old", "lima", None),
+            ("bob", None, None, None),
+            ("eve", None, None, 1),
+        ]
+
+    @pytest.mark.parametrize("format_", ("arrow", "parquet"))
+    def test_written_once(self, tmp_path, format_):
+        """
+        If all the DataFrames have the same columns, the rows must not be
+        written again. Otherwise, each row must be written again only once.
+        """
+        path = tmp_path / f"out.{format_}"
+        dfs = [pl.DataFrame({"name": ["cyril"], "age": [32]})] * 3
+        with patch.object(
+            FrameWriter, "_write_batches", autospec=True
+        ) as write_batches:
+            write(path, format_, *dfs)
+        write_batches.assert_not_called()
+
+        dfs += [pl.DataFrame({f"column {i}": [i]}) for i in range(3)]
+        writer = FrameWriter(path, format_, False, quiet=True)
+        with patch.object(
+            FrameWriter,
+            "_write_batches",
+            autospec=True,
+            wraps=FrameWriter._write_batches,
+        ) as write_batches:
+            for df in dfs:
+                writer.write(df)
+            writer.close()
+        assert write_batches.call_count == 4
+        assert len(READERS[format_](path)) == 6
+
+    @pytest.mark.parametrize("format_", FRAME_FORMATS)
+    def test_nothing_written(self, tmp_path, format_):
+        "If nothing is written, no file must be made (or left in place)."
+        path = tmp_path / f"out.{format_}"
+        path.write_text("old output")
+        write(path, format_, pl.DataFrame({"name": []}))
+        assert not path.exists()
+
+    @pytest.mark.parametrize("format_", FRAME_FORMATS)
+    def test_save_empty_output(self, tmp_path, format_):
+        path = tmp_path / f"out.{format_}"
+        write(path, format_, save_empty_output=True)
+        assert path.exists()
@@ -1,9 +1,20 @@
 import pytest
+import polars as pl
+import xlsxwriter
 from unittest.mock import patch
 from io import StringIO
 from pathlib import Path
 
-from xgrep.grid import grid_reader
+import re
+from xgrep import grid
+from xgrep.grid import (
+    COMPRESSIONS,
+    ColumnSelector,
+    excel_sheet_names,
+    grid_reader,
+    read_records,
+    split_suffix,
+)
 
 
 class CSV:
@@ -58,3 +69,307 @@ class TestGrid:
         "Test that the grid can read CSV and TSV data"
         g = basic_grid(data)
         assert g.rows == (data[1], data[2])
+
+    def test_columnar(self) -> None:
+        "Rows and columns must be available from the grid's DataFrame."
+        g = basic_grid(BASIC_CSV)
+        assert g.col_names == list(BASIC_CSV[0])
+        assert g.height == 2
+        assert g.row(1) == BASIC_CSV[2]
+        assert g.column(0).to_list() == [BASIC_CSV[1][0], BASIC_CSV[2][0]]
+
+
+_QUOTED_DATA = (
+    ("name", "note"),
+    ("cyril", '"two\nlines"'),
+    ("maria", "one line"),
+    ("bob", '"a ""quote"""'),
+)
+
+QUOTED_CSV = CSV(_QUOTED_DATA, sep=",")
+
+
+class TestBatches:
+    """
+    Test reading CSV/TSV files in batches.
+    """
+
+    def test_read_records(self) -> None:
+        "A quoted newline must not end a record."
+        fp = StringIO(QUOTED_CSV())
+        assert read_records(fp, 2) == 'name,note\ncyril,"two\nlines"\n'
+        assert read_records(fp, 5) == 'maria,one line\nbob,"a ""quote"""\n'
+        assert read_records(fp, 1) == ""
+
+    def test_read_records_stray_quote(self) -> None:
+        "A quote that does not start a value must not start a quoted value."
+        fp = StringIO('name,note\ncyril,6" tall\nmaria,"a\n""b"""\n\nbob,x\n')
+        assert read_records(fp, 2) == 'name,note\ncyril,6" tall\n'
+        assert read_records(fp, 2) == 'maria,"a\n""b"""\n\n'
+        assert read_records(fp, 2) == "bob,x\n"
+
+    @pytest.mark.parametrize("batch_size", (1, 2, 3))
+    @pytest.mark.parametrize("columns", (None, ColumnSelector(numbers=frozenset({2}))))
+    def test_batches_blank_lines(self, batch_size, columns) -> None:
+        "Blank lines must be rows of empty values, as in a whole file."
+        text = 'a,b\n1,2\n\n\n3,"c\nat"\n\n4,5"\n'
+        whole = list(grid_reader(StringIO(text), filename="t.csv", columns=columns))
+        grids = list(
+            grid_reader(
+                StringIO(text),
+                filename="t.csv",
+                batch_size=batch_size,
+                columns=columns,
+            )
+        )
+        rows = [row for grid in grids for row in grid.rows]
+        assert rows == list(whole[0].rows)
+        assert len(rows) == 6
+
+    @pytest.mark.parametrize("batch_size", (1, 2, 3, 4))
+    def test_batches(self, batch_size) -> None:
+        "Batches must hold all the rows, and know their offsets."
+        grids = list(
+            grid_reader(
+                StringIO(QUOTED_CSV()), filename="test.csv", batch_size=batch_size
+            )
+        )
+        assert [grid.offset for grid in grids] == list(range(0, 3, batch_size))
+        assert all(grid.col_names == ["name", "note"] for grid in grids)
+        rows = [row for grid in grids for row in grid.rows]
+        assert rows == [
+            ("cyril", "two\nlines"),
+            ("maria", "one line"),
+            ("bob", 'a "quote"'),
+        ]
+
+    def test_batches_skip_no_header(self) -> None:
+        "Skipped rows must only be skipped in the first batch."
+        grids = list(
+            grid_reader(
+                StringIO(BASIC_CSV()),
+                filename="test.csv",
+                header=False,
+                skip=1,
+                batch_size=1,
+            )
+        )
+        assert [grid.offset for grid in grids] == [0, 1]
+        assert [grid.rows for grid in grids] == [(BASIC_CSV[1],), (BASIC_CSV[2],)]
+
+
+class TestExcelSheetNames:
+    SHEETS = ["one", "two", "three"]
+
+    def test_default(self) -> None:
+        "With no sheet name or id, the first sheet must be read."
+        assert excel_sheet_names(self.SHEETS) == ["one"]
+
+    def test_all(self) -> None:
+        "Sheet id 0 must select all sheets."
+        assert excel_sheet_names(self.SHEETS, sheet_id=0) == self.SHEETS
+
+    def test_names(self) -> None:
+        "Sheets must be selected by name, in the order given."
+        assert excel_sheet_names(self.SHEETS, sheet_name=("three", "one")) == [
+            "three",
+            "one",
+        ]
+
+    def test_ids(self) -> None:
+        "Sheets must be selected by (1-based) id, in the order given."
+        assert excel_sheet_names(self.SHEETS, sheet_id=(3, 1)) == ["three", "one"]
+
+    def test_missing_name(self) -> None:
+        with pytest.raises(ValueError, match="no matching sheet found"):
+            excel_sheet_names(self.SHEETS, sheet_name=("four",))
+
+    def test_missing_id(self) -> None:
+        with pytest.raises(ValueError, match="no matching sheet found"):
+            excel_sheet_names(self.SHEETS, sheet_id=(4,))
+
+
+class TestExcelSheets:
+    @pytest.fixture
+    def workbook(self, tmp_path) -> Path:
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            for sheet in "one", "two", "three":
+                pl.DataFrame({"name": [f"{sheet}-cyril"], "age": [32]}).write_excel(
+                    workbook, worksheet=sheet
+                )
+        return path
+
+    def test_all_sheets(self, workbook) -> None:
+        "All sheets must be read, in order, with their names."
+        grids = list(grid_reader(workbook, sheet_id=0, sheet_separator="+"))
+        assert [g.filename for g in grids] == [
+            f"{workbook}+one",
+            f"{workbook}+two",
+            f"{workbook}+three",
+        ]
+        assert [g.rows for g in grids] == [
+            (("one-cyril", 32),),
+            (("two-cyril", 32),),
+            (("three-cyril", 32),),
+        ]
+
+    def test_sheets_read_lazily(self, workbook) -> None:
+        "A sheet must not be read until its grid is needed."
+        with patch.object(
+            grid, "read_excel_sheet", wraps=grid.read_excel_sheet
+        ) as read_excel_sheet:
+            grids = grid_reader(workbook, sheet_id=0)
+            g = next(grids)
+            assert g.rows == (("one-cyril", 32),)
+            assert read_excel_sheet.call_count == 1
+
+
+class TestColumns:
+    """
+    Test reading (or only matching) selected columns.
+    """
+
+    DATA = "name,age,city\ncyril,32,paris\nmaria,81,lima\n"
+
+    def test_indices(self) -> None:
+        selector = ColumnSelector(
+            names=frozenset(["name"]),
+            regexes=(re.compile("^ci"),),
+            numbers=frozenset([2, 9]),
+        )
+        assert selector.indices(["name", "age", "city", "other"]) == [0, 1, 2]
+        assert ColumnSelector().indices(["name", "age"]) == []
+
+    @pytest.mark.parametrize("batch_size", (None, 1))
+    def test_csv(self, batch_size) -> None:
+        "Only the selected columns must be read."
+        grids = list(
+            grid_reader(
+                StringIO(self.DATA),
+                filename="data.csv",
+                columns=ColumnSelector(names=frozenset(["city", "name"])),
+                batch_size=batch_size,
+            )
+        )
+        assert [g.col_names for g in grids] == [["name", "city"]] * len(grids)
+        assert sum((g.rows for g in grids), ()) == (
+            ("cyril", "paris"),
+            ("maria", "lima"),
+        )
+        assert all(g.col_indices == [0, 2] for g in grids)
+        assert all(g.match_cols is None for g in grids)
+
+    def test_csv_skip_no_header(self) -> None:
+        g = next(
+            grid_reader(
+                StringIO(self.DATA),
+                filename="data.csv",
+                header=False,
+                skip=1,
+                columns=ColumnSelector(numbers=frozenset([2])),
+            )
+        )
+        assert g.col_names == ["column_2"]
+        assert g.rows == (("32",), ("81",))
+        assert g.col_index(0) == 1
+
+    def test_all_cols(self) -> None:
+        "With all_cols, all columns must be read, but only some matched."
+        g = next(
+            grid_reader(
+                StringIO(self.DATA),
+                filename="data.csv",
+                columns=ColumnSelector(names=frozenset(["city"])),
+                all_cols=True,
+            )
+        )
+        assert g.col_names == ["name", "age", "city"]
+        assert g.col_indices is None
+        assert g.match_cols == [2]
+
+    def test_no_columns(self, capsys) -> None:
+        "A file with none of the selected columns must be skipped."
+        grids = grid_reader(
+            StringIO(self.DATA),
+            filename="data.csv",
+            columns=ColumnSelector(names=frozenset(["nope"])),
+        )
+        assert list(grids) == []
+        assert capsys.readouterr().err == "No selected columns found in 'data.csv'.\n"
+
+    def test_excel(self, tmp_path) -> None:
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            df = pl.DataFrame({"name": ["cyril"], "age": [32], "city": ["paris"]})
+            df.write_excel(workbook)
+        g = next(grid_reader(path, columns=ColumnSelector(numbers=frozenset([2, 3]))))
+        assert g.col_names == ["age", "city"]
+        assert g.rows == ((32, "paris"),)
+        assert g.col_indices == [1, 2]
+
+
+def has_zstd() -> bool:
+    try:
+        from compression import zstd  # noqa: F401
+    except ImportError:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+class TestCompressed:
+    """
+    Test reading compressed CSV/TSV files.
+    """
+
+    DATA = "name,age\ncyril,32\nmaria,81\nbob,7\n"
+
+    def write(self, tmp_path, compression: str, text: str = DATA) -> Path:
+        if compression == ".zst" and not has_zstd():
+            pytest.skip("No zstd module is available.")
+        path = tmp_path / f"data.csv{compression}"
+        with COMPRESSIONS[compression](path, "wt") as fp:
+            fp.write(text)
+        return path
+
+    def test_split_suffix(self) -> None:
+        assert split_suffix(Path("data.CSV.GZ")) == (".csv", ".gz")
+        assert split_suffix(Path("data.tsv")) == (".tsv", None)
+        assert split_suffix(Path("data.gz")) == ("", ".gz")
+
+    @pytest.mark.parametrize("compression", COMPRESSIONS)
+    @pytest.mark.parametrize("batch_size", (None, 1, 2))
+    def test_read(self, tmp_path, compression, batch_size) -> None:
+        path = self.write(tmp_path, compression)
+        grids = list(grid_reader(path, batch_size=batch_size))
+        assert [row for g in grids for row in g.rows] == [
+            ("cyril", "32"),
+            ("maria", "81"),
+            ("bob", "7"),
+        ]
+        assert grids[0].filename == str(path)
+
+    @pytest.mark.parametrize("compression", COMPRESSIONS)
+    def test_columns(self, tmp_path, compression) -> None:
+        "Columns must be selectable, even in a stream that cannot seek."
+        path = self.write(tmp_path, compression)
+        grids = grid_reader(
+            path, batch_size=2, columns=ColumnSelector(names=frozenset(["age"]))
+        )
+        assert [row for g in grids for row in g.rows] == [("32",), ("81",), ("7",)]
+
+    def test_tsv(self, tmp_path) -> None:
+        path = tmp_path / "data.tsv.gz"
+        with COMPRESSIONS[".gz"](path, "wt") as fp:
+            fp.write("name\tage\ncyril\t32\n")
+        assert next(grid_reader(path)).rows == (("cyril", "32"),)
+
+    def test_compressed_excel(self, tmp_path) -> None:
+        "Compressed Excel files cannot be read."
+        path = tmp_path / "workbook.xlsx.gz"
+        path.touch()
+        with pytest.raises(ValueError, match="Unknown file suffix: '.xlsx.gz'"):
+            next(grid_reader(path))
@@ -0,0 +1,291 @@
+import os
+import re
+import random
+import pytest
+import polars as pl
+import xlsxwriter
+from click.testing import CliRunner
+from pathlib import Path
+
+from xgrep.cli import cli, index
+from xgrep.index import TrigramIndex, fold, regex_query, series_trigrams, trigrams
+
+
+def satisfied(query, text_trigrams: set[str]) -> bool:
+    if query is True:
+        return True
+    if isinstance(query, str):
+        return query in text_trigrams
+    op, *queries = query
+    results = (satisfied(q, text_trigrams) for q in queries)
+    return all(results) if op == "and" else any(results)
+
+
+def make_index(tmp_path: Path, *paths: Path, **options) -> TrigramIndex:
+    trigram_index = TrigramIndex(tmp_path / "index.db", create=True)
+    trigram_index.options = dict(header=True, skip=0) | options
+    for path in paths:
+        trigram_index.add(path)
+    return trigram_index
+
+
+def make_workbook(path: Path) -> Path:
+    with xlsxwriter.Workbook(path) as workbook:
+        pl.DataFrame({"name": ["cyril", "maria"], "age": [32, 81]}).write_excel(
+            workbook, worksheet="people"
+        )
+        pl.DataFrame({"city": ["paris", "lima"], "size": [1.5, 2.0]}).write_excel(
+            workbook, worksheet="cities"
+        )
+    return path
+
+
+READER_OPTIONS = dict(header=True, skip=0, sheet_name=None, sheet_id=0)
+
+
+class TestFold:
+    def test_ascii(self) -> None:
+        assert fold("Hello, World!") == "hello, world!"
+
+    def test_special(self) -> None:
+        "Characters equal to ASCII letters when ignoring case must be folded."
+        assert fold("İıſK") == "iisk"
+
+    def test_other(self) -> None:
+        "Other non-ASCII characters must not be changed."
+        assert fold("ÉÀ") == "ÉÀ"
+
+
+def test_trigrams():
+    assert trigrams("abcd") == {"abc", "bcd"}
+    assert trigrams("ab") == set()
+
+
+def test_series_trigrams():
+    "Trigrams must be found in the text that str() gives for each value."
+    series = pl.Series([1.5, None])
+    assert series_trigrams(series) == {"1.5", "non", "one"}
+
+
+class TestRegexQuery:
+    @pytest.mark.parametrize(
+        "pattern, expected",
+        (
+            ("abc", "abc"),
+            ("ABC", "abc"),
+            ("abcd", ("and", "abc", "bcd")),
+            ("abc|xyz", ("or", "abc", "xyz")),
+            ("^abc$", "abc"),
+            ("abc+d", "abc"),
+        ),
+    )
+    def test_query(self, pattern, expected) -> None:
+        assert regex_query(re.compile(pattern)) == expected
+
+    @pytest.mark.parametrize(
+        "pattern",
+        ("ab", "a.c", "x*", r"\d+", r"(\w+)\1", "abc|x", "[a-z]{5}"),
+    )
+    def test_no_query(self, pattern) -> None:
+        "Patterns with no required trigrams must give a query of True."
+        assert regex_query(re.compile(pattern)) is True
+
+    def test_non_ascii_ignore_case(self) -> None:
+        "Non-ASCII characters must not be used in a query when ignoring case."
+        assert regex_query(re.compile("éab", re.I)) is True
+        assert regex_query(re.compile("éab")) == "éab"
+
+    def test_many_alternatives(self) -> None:
+        "A large alternation must not give a deeply nested query."
+        strings = [f"s{i:05d}" for i in range(5000)]
+        query = regex_query(re.compile("|".join(strings)))
+        assert satisfied(query, trigrams(strings[-1]))
+        assert not satisfied(query, trigrams("x99999"))
+
+    def test_bytes(self) -> None:
+        assert regex_query(re.compile(b"abc")) is True
+
+    def test_sound(self) -> None:
+        """
+        Text containing a match for a regex must always satisfy its query.
+        """
+        rng = random.Random(0)
+        alphabet = "abcAB-1ſKı"
+        parts = (".", "[{0}z]", "({0}|zz)", "{0}+", "{0}?", "(?i:{1})", "{0}{{1,2}}")
+        tested = 0
+        for _ in range(5000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12)))
+            start = rng.randrange(len(text))
+            end = rng.randint(start + 1, len(text))
+            pattern = "".join(
+                (
+                    re.escape(char)
+                    if rng.random() < 0.5
+                    else rng.choice(parts).format(
+                        re.escape(char), re.escape(char.swapcase())
+                    )
+                )
+                for char in text[start:end]
+            )
+            regex = re.compile(pattern, re.I if rng.random() < 0.3 else 0)
+            if regex.search(text):
+                tested += 1
+                assert satisfied(regex_query(regex), trigrams(fold(text))), pattern
+        assert tested > 4000
+
+
+class TestTrigramIndex:
+    def test_missing(self, tmp_path) -> None:
+        with pytest.raises(FileNotFoundError):
+            TrigramIndex(tmp_path / "index.db")
+
+    def test_csv(self, tmp_path) -> None:
+        "A CSV file that cannot match must be filtered out."
+        good = tmp_path / "good.csv"
+        good.write_text("name,age\ncyril,32\n")
+        bad = tmp_path / "bad.csv"
+        bad.write_text("name,age\nmaria,81\n")
+        trigram_index = make_index(tmp_path, good, bad)
+        result = trigram_index.filter([good, bad], re.compile("cyr"), READER_OPTIONS)
+        assert [path for path, _ in result] == [good]
+
+    def test_header_not_indexed(self, tmp_path) -> None:
+        "Header values are not matched, so must not be indexed."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        trigram_index = make_index(tmp_path, path)
+        assert (
+            list(trigram_index.filter([path], re.compile("nam"), READER_OPTIONS)) == []
+        )
+
+    def test_different_options(self, tmp_path) -> None:
+        "The index must not be used with options other than those it was made with."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        trigram_index = make_index(tmp_path, path)
+        options = READER_OPTIONS | dict(header=False)
+        assert list(trigram_index.filter([path], re.compile("nam"), options)) == [
+            (path, options)
+        ]
+
+    def test_changed(self, tmp_path) -> None:
+        "A file that has changed since it was indexed must not be filtered out."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        trigram_index = make_index(tmp_path, path)
+        path.write_text("name,age\nmaria,81\n")
+        os.utime(path, ns=(0, 0))
+        assert not trigram_index.up_to_date(path)
+        result = trigram_index.filter([path], re.compile("mar"), READER_OPTIONS)
+        assert [path for path, _ in result] == [path]
+
+    def test_not_indexed(self, tmp_path) -> None:
+        "A file that is not in the index must not be filtered out."
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        trigram_index = make_index(tmp_path)
+        result = trigram_index.filter([path], re.compile("xyz"), READER_OPTIONS)
+        assert [path for path, _ in result] == [path]
+
+    def test_excel_sheets(self, tmp_path) -> None:
+        "Only the sheets of a workbook that could match must be read."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        trigram_index = make_index(tmp_path, path)
+        ((result_path, options),) = trigram_index.filter(
+            [path], re.compile("lima"), READER_OPTIONS
+        )
+        assert result_path == path
+        assert options["sheet_name"] == ("cities",)
+        assert options["sheet_id"] is None
+
+    def test_excel_all_sheets(self, tmp_path) -> None:
+        "If all sheets could match, the options must not be changed."
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        trigram_index = make_index(tmp_path, path)
+        assert list(
+            trigram_index.filter([path], re.compile("lima|cyril"), READER_OPTIONS)
+        ) == [(path, READER_OPTIONS)]
+
+    def test_excel_missing_sheet(self, tmp_path) -> None:
+        """
+        If a requested sheet does not exist, the file must be read (so that
+        the missing sheet is reported).
+        """
+        path = make_workbook(tmp_path / "workbook.xlsx")
+        trigram_index = make_index(tmp_path, path)
+        options = READER_OPTIONS | dict(sheet_name=("nope",), sheet_id=None)
+        assert list(trigram_index.filter([path], re.compile("xyz"), options)) == [
+            (path, options)
+        ]
+
+    def test_remove(self, tmp_path) -> None:
+        path = tmp_path / "file.csv"
+        path.write_text("name,age\ncyril,32\n")
+        trigram_index = make_index(tmp_path, path)
+        assert trigram_index.paths() == [path.resolve()]
+        assert trigram_index.remove(path)
+        assert trigram_index.paths() == []
+        assert not trigram_index.remove(path)
+
+
+class TestCli:
+    @pytest.mark.parametrize(
+        "options",
+        (
+            ["--format", "csv", "--rn"],
+            ["-c"],
+            ["--only-filename"],
+            ["-i", "--format", "csv"],
+            ["-v", "--format", "csv"],
+            ["--sheet-id", "2", "--format", "csv"],
+        ),
+    )
+    @pytest.mark.parametrize("pattern", ("cyril", "LIMA", "xyz", "1.5|81", "a"))
+    def test_same_output(self, tmp_path, options, pattern):
+        "Searching with an index must give the same output as without."
+        paths = [str(make_workbook(tmp_path / "workbook.xlsx"))]
+        for name, text in ("a", "name,age\ncyril,32\n"), ("b", "city\nlima\n"):
+            path = tmp_path / f"{name}.csv"
+            path.write_text(text)
+            paths.append(str(path))
+
+        runner = CliRunner()
+        index_path = str(tmp_path / "index.db")
+        result = runner.invoke(index, ["build", "--index", index_path, *paths])
+        assert result.exit_code == 0
+        assert result.output == "Indexed 3 files.\n"
+
+        without = runner.invoke(cli, options + [pattern, *paths])
+        with_index = runner.invoke(
+            cli, ["--index", index_path, *options, pattern, *paths]
+        )
+        assert without.exit_code == with_index.exit_code
+        assert without.output == with_index.output
+
+    def test_update(self, tmp_path):
+        "Only new and changed files must be indexed by an update."
+        paths = []
+        for name in "a", "b":
+            path = tmp_path / f"{name}.csv"
+            path.write_text("name,age\ncyril,32\n")
+            paths.append(path)
+
+        runner = CliRunner()
+        index_path = str(tmp_path / "index.db")
+        runner.invoke(index, ["build", "--index", index_path, str(paths[0])])
+
+        result = runner.invoke(
+            index, ["update", "--index", index_path, *map(str, paths)]
+        )
+        assert result.output == "Indexed 1 file, removed 0.\n"
+
+        paths[0].write_text("name,age\nmaria,81\n")
+        os.utime(paths[0], ns=(0, 0))
+        paths[1].unlink()
+        result = runner.invoke(index, ["update", "--index", index_path])
+        assert result.output == "Indexed 1 file, removed 1.\n"
+
+        result = runner.invoke(
+            cli, ["--index", index_path, "-c", "maria", str(paths[0])]
+        )
+        assert result.output == "1\n"
@@ -1,9 +1,11 @@
 import pytest
 from io import StringIO
 from itertools import product
+from unittest.mock import PropertyMock, patch
 
-from xgrep.grid import grid_reader
-from xgrep.match import Match
+from xgrep.engine import match_spans
+from xgrep.grid import Grid, grid_reader
+from xgrep.match import Match, grid_matches
 
 
 class CSV:
@@ -88,6 +90,13 @@ class TestMatch:
         m = Match(g, "cyril|maria")
         assert m.format(format_=data.format_, count=True) == "2"
 
+    @pytest.mark.parametrize("data", (BASIC_CSV, BASIC_TSV))
+    def test_inverted_count(self, data) -> None:
+        "An inverted match must count the rows that do not match."
+        g = basic_grid(data, header=False)
+        m = Match(g, "cyril", invert=True)
+        assert m.format(format_=data.format_, count=True) == "2"
+
     @pytest.mark.parametrize("data", (BASIC_CSV, BASIC_TSV))
     def test_cyril_only_matching_cols(self, data) -> None:
         "We must be able to match a cell and ask to not receive non-matching cols."
@@ -282,3 +291,245 @@ class TestMatchWithRowHeaderClash:
         assert m.format(format_="csv", row_numbers=True) == (
             "Row (3),Row,Row (2),name,age\n3,2,4,maria,81"
         )
+
+
+class TestMatchEngines:
+    """
+    Test that matching with Polars and matching cell by cell give the same
+    results.
+    """
+
+    @pytest.mark.parametrize(
+        "data, vectorize", product((BASIC_CSV, BASIC_TSV), (True, False))
+    )
+    def test_colored_only_matching_cols(self, data, vectorize) -> None:
+        "Both engines must color matches and find matching columns."
+        g = basic_grid(data, header=False)
+        m = Match(g, "r|8", vectorize=vectorize)
+        assert (
+            m.format(format_=data.format_, color="red", unmatched=".")
+            == f"cy[red]r[/red]il{data.sep}.\nma[red]r[/red]ia{data.sep}[red]8[/red]1"
+        )
+
+    @pytest.mark.parametrize("data", (BASIC_CSV, BASIC_TSV))
+    def test_fallback(self, data) -> None:
+        "A pattern that Polars cannot handle must be matched cell by cell."
+        g = basic_grid(data, header=False)
+        m = Match(g, "y(?=r)")
+        assert m._polars_pattern is None
+        assert m.format(format_=data.format_) == data[1]
+
+    @pytest.mark.parametrize(
+        "data, vectorize", product((BASIC_CSV, BASIC_TSV), (True, False))
+    )
+    def test_literals_colored(self, data, vectorize) -> None:
+        "The literal string that matched each cell must be colored."
+        g = basic_grid(data, header=False)
+        m = Match(g, "ri|8|yr", vectorize=vectorize)
+        assert (m._literals is not None) == vectorize
+        assert (
+            m.format(format_=data.format_, color="red", unmatched=".")
+            == f"c[red]yr[/red]il{data.sep}.\nma[red]ri[/red]a{data.sep}[red]8[/red]1"
+        )
+
+    @pytest.mark.parametrize("data", (BASIC_CSV, BASIC_TSV))
+    def test_invert(self, data) -> None:
+        "Inverted matching must give the same result with both engines."
+        g = basic_grid(data, header=False)
+        vectorized = Match(g, "cyril", invert=True)
+        by_cell = Match(g, "cyril", invert=True, vectorize=False)
+        assert vectorized.format(format_=data.format_, row_numbers=True) == (
+            by_cell.format(format_=data.format_, row_numbers=True)
+        )
+
+
+class TestMatchColumns:
+    """
+    Test matching only some columns.
+    """
+
+    @pytest.mark.parametrize("vectorize", (True, False))
+    def test_match_cols(self, vectorize) -> None:
+        "Cells in columns that are not selected must not match."
+        g = basic_grid(BASIC_CSV)
+        g.match_cols = [1]
+        m = Match(g, "r|8", vectorize=vectorize)
+        assert m.format(format_="csv", only_matching_cols=True) == "age\n81"
+        assert grid_matches(g, "8", vectorize=vectorize)
+        assert not grid_matches(g, "r", vectorize=vectorize)
+
+    def test_input_col_labels(self) -> None:
+        "Columns must be labelled with their position in the input."
+        g = basic_grid(BASIC_CSV)
+        g.col_indices = [3, 7]
+        m = Match(g, "cyril")
+        assert m.format(format_="csv", excel_cols=True) == "name (D),age (H)\ncyril,32"
+
+
+class TestGridMatches:
+    """
+    Test finding whether there is any match in a grid.
+    """
+
+    @pytest.mark.parametrize(
+        "data, vectorize", product((BASIC_CSV, BASIC_TSV), (True, False))
+    )
+    def test_match(self, data, vectorize) -> None:
+        g = basic_grid(data)
+        assert grid_matches(g, "mar", vectorize=vectorize)
+
+    @pytest.mark.parametrize(
+        "data, vectorize", product((BASIC_CSV, BASIC_TSV), (True, False))
+    )
+    def test_no_match(self, data, vectorize) -> None:
+        g = basic_grid(data)
+        assert not grid_matches(g, "name", vectorize=vectorize)
+
+
+class TestCsvBatches:
+    """
+    Test formatting CSV/TSV output in batches of rows.
+    """
+
+    @pytest.mark.parametrize("batch_size", (1, 2, 3))
+    def test_batches(self, batch_size) -> None:
+        "The header must only be in the first batch."
+        g = basic_grid(BASIC_CSV)
+        m = Match(g, "r")
+        batches = list(m.csv_batches(row_numbers=True, batch_size=batch_size))
+        assert len(batches) == (2 if batch_size == 1 else 1)
+        assert "".join(batches) == "Row,name,age\n2,cyril,32\n3,maria,81\n"
+
+    def test_no_rows(self) -> None:
+        g = basic_grid(BASIC_CSV)
+        assert list(Match(g, "xxx").csv_batches()) == []
+
+
+class TestColumnar:
+    """
+    Test that matching and formatting never make Python tuples for rows.
+    """
+
+    @pytest.mark.parametrize(
+        "data, vectorize", product((BASIC_CSV, BASIC_TSV), (True, False))
+    )
+    def test_no_rows(self, data, vectorize) -> None:
+        g = basic_grid(data)
+        with patch.object(Grid, "rows", new_callable=PropertyMock) as rows:
+            rows.side_effect = AssertionError("Grid rows were made.")
+            m = Match(g, "cyril", vectorize=vectorize)
+            assert grid_matches(g, "cyril", vectorize=vectorize)
+            assert m.format(format_=data.format_, row_numbers=True) == (
+                f"Row{data.sep}name{data.sep}age\n2{data.sep}cyril{data.sep}32"
+            )
+
+
+class TestMaxCount:
+    """
+    Test keeping only the first rows selected for output.
+    """
+
+    @pytest.mark.parametrize(
+        "max_count, expected",
+        (
+            (0, ""),
+            (1, "Row,name,age\n2,cyril,32"),
+            (5, "Row,name,age\n2,cyril,32\n3,maria,81"),
+        ),
+    )
+    def test_max_count(self, max_count, expected) -> None:
+        g = basic_grid(BASIC_CSV)
+        m = Match(g, "r", max_count=max_count)
+        assert m.count() == min(max_count, 2)
+        assert m.format(format_="csv", row_numbers=True) == expected
+
+    @pytest.mark.parametrize("vectorize", (True, False))
+    def test_blocks(self, vectorize) -> None:
+        "Rows after the last one kept must not be matched."
+        g = basic_grid(BASIC_CSV)
+        with patch("xgrep.match.MATCH_BLOCK_SIZE", 1):
+            m = Match(g, "cyril", vectorize=vectorize, max_count=1)
+        assert m.grid.height == 1
+        assert m.format(format_="csv") == "name,age\ncyril,32"
+
+    def test_invert(self) -> None:
+        g = basic_grid(BASIC_CSV)
+        m = Match(g, "xxx", invert=True, max_count=1)
+        assert m.count() == 1
+        assert m.format(format_="csv") == "name,age\ncyril,32"
+
+
+class TestAllMatches:
+    """
+    Test that every match in a cell is found, not just the first.
+    """
+
+    DATA = CSV((("id", "notes"), ("1", "T-12 and T-345"), ("2", "none")), sep=",")
+
+    @pytest.mark.parametrize("vectorize", (True, False))
+    def test_colored(self, vectorize) -> None:
+        g = basic_grid(self.DATA)
+        m = Match(g, r"T-\d+", vectorize=vectorize)
+        assert m.format(format_="csv", color="red") == (
+            "id,notes\n1,[red]T-12[/red] and [red]T-345[/red]"
+        )
+
+    def test_empty_matches(self) -> None:
+        "Empty matches must not be colored."
+        g = basic_grid(self.DATA)
+        m = Match(g, "n*", vectorize=False)
+        assert m.format(format_="csv", color="red") == (
+            "id,notes\n1,T-12 a[red]n[/red]d T-345\n2,[red]n[/red]o[red]n[/red]e"
+        )
+
+    @pytest.mark.parametrize("invert", (True, False))
+    def test_only_matched_cells_searched(self, monkeypatch, invert) -> None:
+        "Only the matched cells must be searched for matches to highlight."
+        searched = []
+
+        def spans(values, *args):
+            searched.extend(values)
+            return match_spans(values, *args)
+
+        monkeypatch.setattr("xgrep.match.match_spans", spans)
+        g = basic_grid(self.DATA)
+        m = Match(g, r"T-\d+", invert=invert)
+        m.format(format_="csv", color="red")
+        m.format(format_="csv", only_matching=True)
+        assert searched == ([] if invert else ["T-12 and T-345"] * 2)
+
+    @pytest.mark.parametrize("vectorize", (True, False))
+    def test_only_matching(self, vectorize) -> None:
+        "Each match must be output on its own row, in row and column order."
+        g = basic_grid(self.DATA)
+        m = Match(g, r"T-\d+|2", vectorize=vectorize)
+        assert m.format(format_="csv", only_matching=True) == (
+            "Match\nT-12\nT-345\n2"
+        )
+        assert m.format(
+            format_="csv", only_matching=True, row_numbers=True, col_numbers=True
+        ) == (
+            "Row,Column,Match\n2,notes (2),T-12\n2,notes (2),T-345\n3,id (1),2"
+        )
+
+    def test_only_matching_batches(self) -> None:
+        "The matches of a batch of rows must all be in the same batch."
+        g = basic_grid(self.DATA)
+        m = Match(g, r"T-\d+|2")
+        assert list(m.csv_batches(only_matching=True, batch_size=1)) == [
+            "Match\nT-12\nT-345\n",
+            "2\n",
+        ]
+
+    def test_cells(self) -> None:
+        g = basic_grid(self.DATA)
+        m = Match(g, r"T-\d+")
+        assert m.cells().to_dicts() == [
+            dict(
+                row=2,
+                col=1,
+                start=0,
+                end=4,
+                spans=[dict(start=0, end=4), dict(start=9, end=14)],
+            )
+        ]
@@ -0,0 +1,75 @@
+import pytest
+from io import StringIO
+from rich.console import Console
+
+from xgrep.grid import grid_reader
+from xgrep.match import Match
+from xgrep.output import Output
+
+DATA = "name,age\ncyril,32\nmaria,81\nbob,8\n"
+
+
+def run(pattern: str, batch_size: int | None, invert: bool = False, **kwargs) -> str:
+    fp = StringIO()
+    options = dict(
+        format_="csv",
+        count=False,
+        only_filename=False,
+        width=None,
+        filenames=False,
+    )
+    options.update(kwargs)
+    output = Output(Console(file=fp, highlight=False), None, **options)
+    for grid in grid_reader(StringIO(DATA), filename="test.csv", batch_size=batch_size):
+        output.add(Match(grid, pattern, invert))
+    output.flush()
+    return fp.getvalue()
+
+
+class TestOutput:
+    @pytest.mark.parametrize("batch_size", (None, 1, 2, 3))
+    def test_csv(self, batch_size) -> None:
+        "The header must only be written once, and row numbers must be correct."
+        assert run("8", batch_size, row_numbers=True) == (
+            "Row,name,age\n3,maria,81\n4,bob,8\n"
+        )
+
+    @pytest.mark.parametrize("batch_size", (1, 2, 3))
+    @pytest.mark.parametrize("count", (False, True))
+    def test_invert(self, batch_size, count) -> None:
+        """
+        With --invert, batches with no matching cell must be output, and the
+        header must be written before the first row, as without batches.
+        """
+        for pattern in "cyril", "r", "i":
+            assert run(pattern, batch_size, True, count=count) == run(
+                pattern, None, True, count=count
+            )
+        assert run("cyril", 1, True) == "name,age\nmaria,81\nbob,8\n"
+
+    @pytest.mark.parametrize("batch_size", (None, 1, 2, 3))
+    def test_count(self, batch_size) -> None:
+        "The count must be printed once, for the whole file."
+        assert run("i", batch_size, count=True, filenames=True) == "test.csv:2\n"
+
+    def test_no_match(self) -> None:
+        "If nothing matches, there must be no output."
+        assert run("xxx", 1, count=True) == ""
+
+    def test_long_lines(self) -> None:
+        "CSV output must not be wrapped, or have text taken as markup."
+        fp = StringIO()
+        output = Output(
+            Console(file=fp, width=20, highlight=False),
+            None,
+            format_="csv",
+            count=False,
+            only_filename=False,
+            width=None,
+            filenames=False,
+            color="red",
+        )
+        data = "name,note\ncyril," + "x" * 50 + "[bold]\n"
+        for grid in grid_reader(StringIO(data), filename="test.csv"):
+            output.add(Match(grid, "cyril"))
+        assert fp.getvalue() == "name,note\ncyril," + "x" * 50 + "[bold]\n"
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import pytest
+import subprocess
+import polars as pl
+import xlsxwriter
+
+from xgrep.server import reads_stdin, request
+
+
+def command(tmp_path) -> list[str]:
+    """
+    Get a command that runs xgrep, as its console script does (so its usage
+    messages are the same).
+    """
+    script = tmp_path / "xgrep"
+    script.write_text("from xgrep.cli import main\nmain()\n")
+    return [sys.executable, str(script)]
+
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    Run a server, and yield its socket.
+    """
+    socket = tmp_path / "xgrep.sock"
+    process = subprocess.Popen(
+        [*command(tmp_path), "server", "start", "--socket", str(socket)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    for _ in range(200):
+        if socket.exists():
+            break
+        if process.poll() is not None:
+            pytest.fail(f"The server did not start: {process.stderr.read()}")
+        time.sleep(0.05)
+    yield socket
+    if process.poll() is None:
+        process.kill()
+    process.wait()
+    process.stderr.close()
+
+
+def xgrep(
+    tmp_path, *args: str, socket=None, input: str | None = None
+) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    if socket is not None:
+        env["XGREP_SOCKET"] = str(socket)
+    return subprocess.run(
+        [*command(tmp_path), *args],
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        env=env,
+        input=input,
+    )
+
+
+class TestServer:
+    @pytest.mark.parametrize(
+        "options",
+        (
+            [],
+            ["-c"],
+            ["--format", "csv", "--rn"],
+            ["--no-such-option"],
+        ),
+    )
+    def test_same_output(self, tmp_path, server, options) -> None:
+        "A search done by the server must give the same output as a normal one."
+        with xlsxwriter.Workbook(tmp_path / "workbook.xlsx") as workbook:
+            for name in "one", "two":
+                pl.DataFrame({"name": ["cyril", "bob"]}).write_excel(
+                    workbook, worksheet=name
+                )
+        (tmp_path / "data.csv").write_text("name,age\ncyril,32\n")
+        args = [*options, "cyril", "workbook.xlsx", "data.csv"]
+
+        expected = xgrep(tmp_path, *args)
+        for _ in range(2):
+            # The second search uses the cached sheets.
+            result = xgrep(tmp_path, "--server", *args, socket=server)
+            assert result.returncode == expected.returncode
+            assert result.stdout == expected.stdout
+            assert result.stderr == expected.stderr
+
+    @pytest.mark.parametrize("option", (["-f", "-"], ["-f-"], ["--file=-"]))
+    def test_stdin(self, tmp_path, server, option) -> None:
+        "A pattern file read from standard input must be sent to the server."
+        (tmp_path / "data.csv").write_text("name\ncyril\ndog\n")
+        args = [*option, "data.csv", "-c"]
+
+        result = xgrep(tmp_path, "--server", *args, socket=server, input="dog\n")
+        assert result.returncode == 0
+        assert result.stdout == "1\n"
+        assert result.stdout == xgrep(tmp_path, *args, input="dog\n").stdout
+
+    def test_status_and_stop(self, tmp_path, server) -> None:
+        path = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(path) as workbook:
+            pl.DataFrame({"name": ["cyril"]}).write_excel(workbook, worksheet="one")
+        xgrep(tmp_path, "--server", "cyril", str(path), socket=server)
+        status = request(server, "status")["status"]
+        assert status["sheets"] == 1
+        assert status["misses"] == 1
+
+        assert request(server, "stop") == 0
+        for _ in range(200):
+            if not server.exists():
+                break
+            time.sleep(0.05)
+        assert not server.exists()
+
+    def test_no_server(self, tmp_path) -> None:
+        "With no server running, the search must be done as usual."
+        (tmp_path / "data.csv").write_text("name,age\ncyril,32\n")
+        result = xgrep(
+            tmp_path, "--server", "-c", "cyril", "data.csv", socket=tmp_path / "none"
+        )
+        assert result.returncode == 0
+        assert result.stdout == "1\n"
+
+
+@pytest.mark.parametrize(
+    ("args", "expected"),
+    (
+        (["-f", "-", "data.csv"], True),
+        (["-if-", "data.csv"], True),
+        (["--file=-", "data.csv"], True),
+        (["-f", "patterns.txt", "data.csv"], False),
+        (["--", "-", "data.csv"], False),
+        (["--fixed-strings", "cyril", "data.csv"], False),
+        (["-f", "patterns.txt", "-f", "-", "data.csv"], True),
+        (["cyril", "-"], False),
+        (["-u", "-", "cyril", "data.csv"], False),
+        (["--ss", "-", "cyril", "data.csv"], False),
+        (["-e", "-", "data.csv"], False),
+        (["-ff-", "data.csv"], False),
+        (["--no-such-option", "-f", "-", "data.csv"], False),
+    ),
+)
+def test_reads_stdin(args, expected) -> None:
+    assert reads_stdin(args) == expected
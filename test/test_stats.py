@@ -0,0 +1,153 @@
+import sys
+import json
+import pytest
+import polars as pl
+import xlsxwriter
+from click.testing import CliRunner
+from io import StringIO
+from unittest.mock import patch
+
+from xgrep.cli import cli, main
+from xgrep.grid import grid_reader
+from xgrep.stats import PHASES, Stats, timed
+
+DATA = "name,age\ncyril,32\nmaria,81\n"
+
+
+def read(stats: Stats, **kwargs) -> list:
+    return list(stats.read(grid_reader(StringIO(DATA), filename="data.csv", **kwargs)))
+
+
+class TestStats:
+    def test_read(self) -> None:
+        "Each grid's read time, rows, and cells must be recorded."
+        stats = Stats(trace_memory=False)
+        for grid in read(stats, batch_size=1):
+            stats.scanned(grid)
+        unit = stats.files["data.csv"]["data.csv"]
+        assert unit["rows"] == 2
+        assert unit["cells"] == 4
+        assert unit["phases"]["read"]["wall"] > 0
+
+    def test_match_cols(self) -> None:
+        "Only the cells in the columns to be matched must be counted."
+        stats = Stats(trace_memory=False)
+        (grid,) = read(stats)
+        grid.match_cols = [1]
+        stats.scanned(grid)
+        assert stats.files["data.csv"]["data.csv"]["cells"] == 2
+
+    def test_timed(self) -> None:
+        stats = Stats(trace_memory=False)
+        (grid,) = read(stats)
+        with timed(stats, "match", grid):
+            pass
+        with timed(stats, "write"):
+            pass
+        with timed(None, "write"):
+            pass
+        assert stats.files["data.csv"]["data.csv"]["phases"]["match"]["wall"] > 0
+        assert stats.other["phases"]["write"]["wall"] > 0
+
+    def test_merge(self) -> None:
+        "Statistics from a worker process must be added to those of a file."
+        stats = Stats(trace_memory=False)
+        worker = Stats(trace_memory=False)
+        for s in stats, worker:
+            for grid in read(s):
+                s.scanned(grid)
+        stats.merge(worker.result())
+        assert stats.files["data.csv"]["data.csv"]["rows"] == 4
+
+    def test_report(self) -> None:
+        stats = Stats(trace_memory=False)
+        for grid in read(stats):
+            stats.scanned(grid)
+        report = json.loads(json.dumps(stats.report()))
+        assert set(report["phases"]) == set(PHASES)
+        assert report["rows"] == 2
+        assert report["cells"] == 4
+        (file_report,) = report["files"]
+        assert file_report["file"] == "data.csv"
+        assert "sheets" not in file_report
+        assert file_report["wall"] == pytest.approx(
+            sum(times["wall"] for times in file_report["phases"].values())
+        )
+
+
+class TestCli:
+    def make_files(self, tmp_path) -> list[str]:
+        csv = tmp_path / "data.csv"
+        csv.write_text(DATA)
+        xlsx = tmp_path / "workbook.xlsx"
+        with xlsxwriter.Workbook(xlsx) as workbook:
+            for name in "one", "two":
+                pl.DataFrame({"name": ["cyril", "bob"]}).write_excel(
+                    workbook, worksheet=name
+                )
+        return [str(csv), str(xlsx)]
+
+    @pytest.mark.parametrize("jobs", ("1", "2"))
+    def test_report(self, tmp_path, jobs) -> None:
+        "The report must be written, without changing the normal output."
+        filenames = self.make_files(tmp_path)
+        path = tmp_path / "stats.json"
+        runner = CliRunner()
+        without = runner.invoke(cli, ["--format", "csv", "cyril", *filenames])
+        result = runner.invoke(
+            cli,
+            ["-j", jobs, f"--stats={path}", "--format", "csv", "cyril", *filenames],
+        )
+        assert result.exit_code == 0
+        assert result.output == without.output
+        report = json.loads(path.read_text())
+        assert report["rows"] == 6
+        assert [file["file"] for file in report["files"]] == filenames
+        assert [sheet["sheet"] for sheet in report["files"][1]["sheets"]] == [
+            f"{filenames[1]}+one",
+            f"{filenames[1]}+two",
+        ]
+
+    def test_standard_error(self, tmp_path) -> None:
+        "With no path, the report must be written to standard error."
+        filenames = self.make_files(tmp_path)
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(cli, ["--stats", "-c", "cyril", *filenames])
+        assert result.exit_code == 0
+        assert json.loads(result.stderr)["rows"] == 6
+
+    @pytest.mark.parametrize("stats_memory", (False, True))
+    def test_memory(self, tmp_path, stats_memory) -> None:
+        "Python memory use must only be traced if --stats-memory is given."
+        filenames = self.make_files(tmp_path)
+        path = tmp_path / "stats.json"
+        runner = CliRunner()
+        options = ["--stats-memory"] if stats_memory else []
+        with patch("tracemalloc.start") as start:
+            result = runner.invoke(
+                cli, [f"--stats={path}", *options, "-c", "cyril", *filenames]
+            )
+        assert result.exit_code == 0
+        assert start.called == stats_memory
+        report = json.loads(path.read_text())
+        assert report["memory_traced"] == stats_memory
+        if not stats_memory:
+            assert report["python_peak"] is None
+
+    def test_main(self) -> None:
+        "A bare --stats must not take the pattern as its path."
+        with (
+            patch(
+                "sys.argv", ["xgrep", "--stats", "cyril", "file.csv", "--", "--stats"]
+            ),
+            patch("xgrep.cli.cli"),
+        ):
+            main()
+            assert sys.argv == [
+                "xgrep",
+                "--stats=-",
+                "cyril",
+                "file.csv",
+                "--",
+                "--stats",
+            ]
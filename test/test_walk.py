@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+import pytest
+from pathlib import Path
+
+from xgrep.walk import IgnoreRules, glob_regex, prefetch, walk
+
+
+def make_tree(root: Path, *names: str) -> None:
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("name\ncyril\n")
+
+
+def relative(root: Path, paths) -> list[str]:
+    return [path.relative_to(root).as_posix() for path in paths]
+
+
+@pytest.mark.parametrize(
+    "glob, path, expected",
+    (
+        ("*.csv", "a.csv", True),
+        ("*.csv", "dir/a.csv", False),
+        ("**/*.csv", "a.csv", True),
+        ("**/*.csv", "dir/sub/a.csv", True),
+        ("dir/**", "dir/sub/a.csv", True),
+        ("a?.csv", "ab.csv", True),
+        ("a?.csv", "a/.csv", False),
+        ("[!a]*.csv", "b.csv", True),
+        ("[!a]*.csv", "a.csv", False),
+        (r"\*.csv", "*.csv", True),
+        (r"\*.csv", "a.csv", False),
+    ),
+)
+def test_glob_regex(glob, path, expected):
+    assert bool(re.match(glob_regex(glob) + r"\Z", path)) == expected
+
+
+class TestIgnoreRules:
+    def test_name(self) -> None:
+        "A rule without a '/' must match a name at any depth."
+        rules = IgnoreRules(["*.tsv"])
+        assert rules.ignored("a.tsv", False)
+        assert rules.ignored("dir/a.tsv", False)
+        assert not rules.ignored("a.csv", False)
+
+    def test_anchored(self) -> None:
+        "A rule with a '/' must be matched against the whole path."
+        rules = IgnoreRules(["/a.csv", "dir/b.csv"])
+        assert rules.ignored("a.csv", False)
+        assert not rules.ignored("sub/a.csv", False)
+        assert rules.ignored("dir/b.csv", False)
+        assert not rules.ignored("sub/dir/b.csv", False)
+
+    def test_directory_only(self) -> None:
+        rules = IgnoreRules(["build/"])
+        assert rules.ignored("build", True)
+        assert not rules.ignored("build", False)
+
+    def test_negation(self) -> None:
+        "The last matching rule must decide whether a path is ignored."
+        rules = IgnoreRules(["*.csv", "!keep.csv"])
+        assert rules.ignored("a.csv", False)
+        assert not rules.ignored("keep.csv", False)
+
+    def test_comments_and_blank_lines(self) -> None:
+        rules = IgnoreRules(["# A comment.\n", "\n", r"\#a.csv"])
+        assert rules.ignored("#a.csv", False)
+        assert not rules.ignored("# A comment.", False)
+
+
+class TestWalk:
+    def test_order(self, tmp_path) -> None:
+        """
+        Files must be found in name order, with the files in a directory
+        before those in its subdirectories.
+        """
+        make_tree(tmp_path, "b.csv", "a/z.csv", "a/b/c.tsv", "a/y.xlsx", "c/x.csv")
+        assert relative(tmp_path, walk([tmp_path])) == [
+            "b.csv",
+            "a/y.xlsx",
+            "a/z.csv",
+            "a/b/c.tsv",
+            "c/x.csv",
+        ]
+
+    def test_suffixes(self, tmp_path) -> None:
+        "Only files that can be read must be found in directories."
+        make_tree(tmp_path, "a.csv", "b.txt", "c.xls")
+        assert relative(tmp_path, walk([tmp_path])) == ["a.csv"]
+
+    def test_files(self, tmp_path) -> None:
+        "Files that are given must always be yielded."
+        make_tree(tmp_path, "b.txt", "a.csv")
+        paths = [tmp_path / "b.txt", tmp_path / "a.csv"]
+        assert list(walk(paths, exclude=["*.csv"])) == paths
+
+    def test_include_exclude(self, tmp_path) -> None:
+        make_tree(tmp_path, "a.csv", "b.tsv", "c.csv", "skip/d.csv")
+        paths = walk([tmp_path], include=["*.csv"], exclude=["c.*", "skip"])
+        assert relative(tmp_path, paths) == ["a.csv"]
+
+    def test_ignore(self, tmp_path) -> None:
+        make_tree(tmp_path, "a.csv", "b.tsv", "build/c.csv", "d/keep.tsv")
+        rules = IgnoreRules(["build/", "*.tsv", "!keep.tsv"])
+        assert relative(tmp_path, walk([tmp_path], ignore=rules)) == [
+            "a.csv",
+            "d/keep.tsv",
+        ]
+
+    def test_symlinks_not_followed(self, tmp_path) -> None:
+        "Symbolic links to directories must not be followed."
+        make_tree(tmp_path, "a/b.csv")
+        os.symlink(tmp_path / "a", tmp_path / "a" / "loop")
+        assert relative(tmp_path, walk([tmp_path])) == ["a/b.csv"]
+
+
+class TestPrefetch:
+    def test_items(self) -> None:
+        assert list(prefetch(iter(range(100)))) == list(range(100))
+
+    def test_error(self) -> None:
+        "An exception raised while producing items must be raised by the caller."
+
+        def items():
+            yield 1
+            raise ValueError("Oops")
+
+        result = prefetch(items())
+        assert next(result) == 1
+        with pytest.raises(ValueError, match="Oops"):
+            next(result)
+
+    def test_stop(self) -> None:
+        "Items must stop being produced when the caller stops."
+        gate = threading.Event()
+        more = threading.Event()
+
+        def items():
+            yield 0
+            gate.wait()
+            yield 1
+            more.set()
+            yield 2
+
+        result = prefetch(items())
+        assert next(result) == 0
+        result.close()
+        gate.set()
+        assert not more.wait(0.2)